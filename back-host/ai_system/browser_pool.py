@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # optional: without it drivers are only recycled by page count
+    psutil = None
+
+# --- BROWSER POOL SETTINGS (one pool per Celery worker process) ---
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_PAGES_PER_DRIVER = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1024"))  # chromedriver + every Chrome process under it
+PAGE_LOAD_TIMEOUT = int(os.getenv("BROWSER_PAGE_LOAD_TIMEOUT", "30"))
+RENDER_WAIT = float(os.getenv("BROWSER_RENDER_WAIT", "3"))
+CHECKOUT_TIMEOUT = float(os.getenv("BROWSER_CHECKOUT_TIMEOUT", "60"))
+
+
+def create_driver():
+    # Imported here so only processes that actually open a browser load Selenium
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+
+class PooledDriver:
+    """A WebDriver plus the bookkeeping the pool needs to decide when to recycle it."""
+
+    def __init__(self, factory):
+        self.driver = factory()
+        self.pages = 0
+
+    def is_healthy(self):
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def rss_mb(self):
+        """
+        Resident memory of the driver's process tree (chromedriver, the browser, its renderers).
+        What leaks across navigations lives there, not in the current page's JS heap.
+        Shared pages are counted once per process, so this errs on the high side.
+        """
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        if psutil is None or process is None:
+            return 0
+        try:
+            root = psutil.Process(process.pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for proc in tree:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass  # exited between listing and reading
+        return total / (1024 * 1024)
+
+    def worn_out(self, max_pages, max_rss_mb):
+        return self.pages >= max_pages or self.rss_mb() >= max_rss_mb
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of headless browsers. Drivers are created lazily, handed out with
+    checkout(), health-checked on the way out and recycled after N pages or a memory ceiling.
+    """
+
+    def __init__(self, size=POOL_SIZE, factory=create_driver,
+                 max_pages=MAX_PAGES_PER_DRIVER, max_rss_mb=MAX_RSS_MB):
+        self.size = size
+        self.factory = factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _acquire(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser available after {timeout}s (pool size {self.size})")
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    return PooledDriver(self.factory)
+                if pooled.is_healthy():
+                    return pooled
+                pooled.quit()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, pooled, broken):
+        try:
+            if broken or self._closed or pooled.worn_out(self.max_pages, self.max_rss_mb):
+                pooled.quit()
+            else:
+                # Drop page state so the next checkout starts clean
+                pooled.driver.delete_all_cookies()
+                pooled.driver.get("about:blank")
+                self._idle.put(pooled)
+        except Exception:
+            pooled.quit()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        pooled = self._acquire(timeout)
+        broken = False
+        try:
+            yield pooled.driver
+            pooled.pages += 1
+        except Exception:
+            broken = not pooled.is_healthy()
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-scoped pool; each forked Celery worker process builds its own."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def scrape_dynamic(url, wait=RENDER_WAIT):
+    """Renders url in a pooled browser and returns the rendered HTML."""
+    with get_pool().checkout() as driver:
+        driver.get(url)
+        time.sleep(wait)
+        return driver.page_source
@@ -1,94 +1,165 @@
 import os
 from typing import List
 from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import ScrapeWebsiteTool, SeleniumScrapingTool
 from crewai.tools import tool
+from ai_system.scraping import scrape_context
+from ai_system.streaming import stream_html, add_usage
+from ai_system.ollama_router import get_router, LLAMA3_MODEL, DEEPSEEK_MODEL
+import metrics
 
 # --- ROBUST UNIVERSAL SCRAPER TOOL ---
-@tool("scraper")
-def scraper(urls: List[str]): 
-    """
-    Scrapes content from multiple URLs. Handles both Static and Dynamic content.
-    """
-    results = []
-    static_tool = ScrapeWebsiteTool()
-    dynamic_tool = SeleniumScrapingTool()
-
-    for url in urls:
-        try:
-            # Try fast static scrape first
-            content = static_tool._run(website_url=url)
-            
-            # Switch to Selenium if content is too thin or blocked
-            if not content or len(content) < 800 or any(x in content.lower() for x in ["maintenance", "access denied", "robot"]):
-                content = dynamic_tool._run(website_url=url)
-            
-            results.append(f"### DATA FROM {url} ###\n{content[:5000]}") # Limit per-site noise
-        except Exception as e:
-            results.append(f"### ERROR SCRAPING {url} ###\n{str(e)}")
-            
-    return "\n\n".join(results)
-
-def run_crewai_process(title, description, urls, brain_vm_ip):
-    llama3 = LLM(
-        model="ollama/llama3", 
-        base_url=f"http://{brain_vm_ip}:11434",
+def make_scraper(description):
+    """The scraper tool, bound to the mask description so it can budget by relevance."""
+    @tool("scraper")
+    def scraper(urls: List[str]): 
+        """
+        Scrapes content from multiple URLs. Handles both Static and Dynamic content.
+        """
+        return scrape_context(urls, description)[0]
+    return scraper
+
+CODER_ROLE = 'HTML Generator'
+CODER_BACKSTORY = "HTML expert who builds components using ONLY the data given, never invents content."
+
+def make_llm(model, base_url):
+    return LLM(
+        model=f"ollama/{model}", 
+        base_url=base_url,
         temperature=0.3
     )
-    deepseek = LLM(
-        model="ollama/deepseek-coder-v2:16b", 
-        base_url=f"http://{brain_vm_ip}:11434",
-        temperature=0.3
+
+def coding_description(title, description):
+    return (
+        f"Using ONLY the data from the previous task, create HTML for: {title}\n"
+        f"User requirements: {description}\n"
+        f"Generate complete HTML with internal CSS. Use real data only, no placeholders."
     )
 
+def build_scraping_task(title, description, urls, llm, on_scraped=None, scraped=None):
     # --- AGENTS ---
     analyst = Agent(
         role='Data Extractor',
         goal=f'Scrape URLs and extract key content for {title}',
         backstory="Expert web scraper who uses tools to get real data and summarizes it clearly.",
-        tools=[scraper],
-        llm=llama3,
+        tools=[make_scraper(description)] if scraped is None else [],
+        llm=llm,
         verbose=True,
         max_iter=5,
         allow_delegation=False
     )
 
-    coder = Agent(
-        role='HTML Generator',
-        goal=f'Generate HTML for {title} using provided data',
-        backstory="HTML expert who builds components using ONLY the data given, never invents content.",
-        llm=deepseek,
-        verbose=True,
-        allow_delegation=False
-    )
-
     # --- TASKS ---
-    scraping_task = Task(
-        description=(
+    if scraped is None:
+        scraping_steps = (
             f"1. Call scraper tool: Action Input: {{'urls': {urls}}}\n"
             f"2. After tool returns data, extract key information about: {description}\n"
+        )
+    else:
+        scraping_steps = (
+            f"1. Read the SCRAPED DATA below (already fetched from {urls}).\n"
+            f"2. Extract key information about: {description}\n"
+        )
+
+    scraping_task = Task(
+        description=(
+            scraping_steps +
             f"3. Provide Final Answer with the extracted key points in a clear structured format."
+            + (f"\n\nSCRAPED DATA:\n{scraped}" if scraped is not None else "")
         ),
         expected_output='Clear summary of key information extracted from the URLs',
-        agent=analyst
+        agent=analyst,
+        callback=on_scraped
+    )
+    return analyst, scraping_task
+
+def build_coding_task(title, description, llm, scraping_task):
+    coder = Agent(
+        role=CODER_ROLE,
+        goal=f'Generate HTML for {title} using provided data',
+        backstory=CODER_BACKSTORY,
+        llm=llm,
+        verbose=True,
+        allow_delegation=False
     )
 
     coding_task = Task(
-        description=(
-            f"Using ONLY the data from the previous task, create HTML for: {title}\n"
-            f"User requirements: {description}\n"
-            f"Generate complete HTML with internal CSS. Use real data only, no placeholders."
-        ),
+        description=coding_description(title, description),
         expected_output='Complete standalone HTML code with embedded CSS',
         agent=coder,
         context=[scraping_task]
     )
+    return coder, coding_task
+
+def add_crew_usage(usage, crew):
+    crew_usage = getattr(crew, "usage_metrics", None)
+    if crew_usage is not None:
+        prompt_tokens = getattr(crew_usage, "prompt_tokens", 0)
+        completion_tokens = getattr(crew_usage, "completion_tokens", 0)
+        add_usage(usage, prompt_tokens, completion_tokens, calls=getattr(crew_usage, "successful_requests", 0))
+        metrics.record_llm("crew", prompt_tokens, completion_tokens)
+
+def run_crewai_process(title, description, urls, router=None, on_scraped=None, on_html=None, scraped=None, usage=None):
+    """
+    Returns the raw output of the HTML step. When on_html is given, the HTML step is
+    streamed straight from Ollama and on_html(partial_html) is called as it grows.
+    Pass scraped (output of scrape_context) when the pipeline already fetched the urls;
+    the analyst then works from it instead of calling the scraper tool.
+    Each model runs on the Ollama backend the router picks, with failover.
+    Token counts are added to usage (a dict) when one is passed.
+    """
+    router = router or get_router()
 
     # --- 5. EXECUTION ---
-    crew = Crew(
-        agents=[analyst, coder],
-        tasks=[scraping_task, coding_task],
-        process=Process.sequential
-    )
+    if on_html is None:
+        def full_crew(llama3_url, deepseek_url):
+            analyst, scraping_task = build_scraping_task(
+                title, description, urls, make_llm(LLAMA3_MODEL, llama3_url), on_scraped, scraped
+            )
+            coder, coding_task = build_coding_task(
+                title, description, make_llm(DEEPSEEK_MODEL, deepseek_url), scraping_task
+            )
+            crew = Crew(
+                agents=[analyst, coder],
+                tasks=[scraping_task, coding_task],
+                process=Process.sequential
+            )
+            with metrics.span("llm_crew"):
+                output = crew.kickoff().raw
+            add_crew_usage(usage, crew)
+            return output
+
+        # One lease for the whole crew: it sends one request at a time, alternating both
+        # models, so it takes one slot on one box (nested leases could deadlock two crews
+        # each holding a slot while waiting for a second). It can't wait for a phase either.
+        return router.run(DEEPSEEK_MODEL, lambda url: full_crew(url, url), phased=False)
+
+    # Streaming: the crew only extracts, the coder prompt is streamed token by token
+    def extract(llama3_url):
+        analyst, scraping_task = build_scraping_task(
+            title, description, urls, make_llm(LLAMA3_MODEL, llama3_url), on_scraped, scraped
+        )
+        crew = Crew(
+            agents=[analyst],
+            tasks=[scraping_task],
+            process=Process.sequential
+        )
+        output = crew.kickoff().raw
+        add_crew_usage(usage, crew)
+        return output
+
+    with metrics.span("llm_llama3"):
+        extracted = router.run(LLAMA3_MODEL, extract)
 
-    return crew.kickoff()
\ No newline at end of file
+    messages = [
+        {"role": "system", "content": f"You are an {CODER_ROLE}. {CODER_BACKSTORY}"},
+        {"role": "user", "content": (
+            f"{coding_description(title, description)}\n"
+            f"Expected output: Complete standalone HTML code with embedded CSS, in a ```html code block.\n\n"
+            f"DATA:\n{extracted}"
+        )},
+    ]
+    with metrics.span("llm_deepseek"):
+        return router.run(
+            DEEPSEEK_MODEL,
+            lambda deepseek_url: stream_html(deepseek_url, DEEPSEEK_MODEL, messages, on_html=on_html, usage=usage)
+        )
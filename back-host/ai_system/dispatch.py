@@ -0,0 +1,22 @@
+from celery_config import celery_app
+
+# --- THIN TASK CLIENT ---
+# The API enqueues pipeline work by task name, so it never imports ai_system.worker
+# (and with it CrewAI, Selenium and the LLM clients). Only Celery workers load those.
+RUN_MASK_PROCESSING = "run_mask_processing"
+
+
+def mask_processing(job_id, title, description, urls, pipeline_mode=None):
+    """Signature of the pipeline entry task; .set()/group() it like a task's .s()."""
+    return celery_app.signature(RUN_MASK_PROCESSING, kwargs={
+        "job_id": job_id,
+        "title": title,
+        "description": description,
+        "urls": urls,
+        "pipeline_mode": pipeline_mode,
+    })
+
+
+def run_mask_processing(task_id=None, **kwargs):
+    """Same as run_mask_processing.delay(**kwargs), by name; returns the AsyncResult."""
+    return mask_processing(**kwargs).apply_async(task_id=task_id)
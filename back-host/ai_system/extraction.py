@@ -0,0 +1,164 @@
+import hashlib
+import math
+import os
+import re
+
+from bs4 import BeautifulSoup
+
+# --- EXTRACTION SETTINGS ---
+# Token counts are estimated at ~4 chars/token; close enough for llama3 budgeting.
+JOB_TOKEN_BUDGET = int(os.getenv("EXTRACT_JOB_TOKEN_BUDGET", "6000"))
+MIN_URL_SHARE = float(os.getenv("EXTRACT_MIN_URL_SHARE", "0.3"))  # part of the budget split evenly, whatever the relevance
+CHARS_PER_TOKEN = 4
+
+NOISE_TAGS = ["script", "style", "noscript", "template", "svg", "canvas", "iframe",
+              "nav", "footer", "header", "aside", "form", "button", "select"]
+NOISE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog"}
+NOISE_HINT = re.compile(
+    r"(^|[-_ ])(nav|navbar|menu|footer|sidebar|breadcrumbs?|cookie|consent|share|social|"
+    r"subscribe|newsletter|advert|ads?|promo|popup|modal|related|comments?)($|[-_ ])",
+    re.I,
+)
+# Never noise, whatever their class says (<body class="has-sidebar">, <main class="menu-open">)
+CONTENT_TAGS = {"html", "body", "main", "article"}
+NOISE_MAX_SHARE = 0.5  # a "noisy" element holding more of the page's text than this is a wrapper, not a region
+BLOCK_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "th", "pre", "blockquote", "dt", "dd", "figcaption"]
+STOPWORDS = set("""
+a an and are as at be by for from has have in into is it its of on or that the their this to was were will
+with what which who how about show display list make create using use into your you our all any each
+""".split())
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _norm(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _is_noise(tag):
+    if tag.name in CONTENT_TAGS:
+        return False
+    if tag.get("role") in NOISE_ROLES or tag.get("aria-hidden") == "true":
+        return True
+    hints = " ".join(tag.get("class") or []) + " " + (tag.get("id") or "")
+    return bool(NOISE_HINT.search(hints))
+
+
+def _main_root(soup):
+    """<main>/<article>/[role=main] when the page has one, else the densest container."""
+    for candidate in (soup.find("main"), soup.find(attrs={"role": "main"}), soup.find("article")):
+        if candidate and len(candidate.get_text(" ", strip=True)) > 200:
+            return candidate
+    body = soup.body or soup
+    best, best_len = body, 0
+    for div in body.find_all(["div", "section"], recursive=True):
+        text_len = len(div.get_text(" ", strip=True))
+        link_len = sum(len(a.get_text(" ", strip=True)) for a in div.find_all("a"))
+        score = text_len - 2 * link_len
+        if score > best_len:
+            best, best_len = div, score
+    # Only narrow down when one container clearly holds most of the page
+    return best if best_len > 0.5 * len(body.get_text(" ", strip=True)) else body
+
+
+def extract_page(html):
+    """
+    Returns (visible_text, blocks): the full visible text (for the thin-page check)
+    and the main-content text blocks in document order, boilerplate removed.
+    """
+    soup = BeautifulSoup(html or "", "html.parser")
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    visible_text = _norm(soup.get_text(" "))
+
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    total = len(_norm(soup.get_text(" ")))
+    for tag in soup.find_all(True):
+        if not tag.decomposed and _is_noise(tag):
+            if len(_norm(tag.get_text(" "))) > NOISE_MAX_SHARE * total:
+                continue  # a page wrapper that merely carries a state class; its noisy children still go
+            tag.decompose()
+
+    root = _main_root(soup)
+    blocks, seen = [], set()
+    for el in root.find_all(BLOCK_TAGS):
+        # Skip wrappers whose text is already covered by a nested block
+        if el.find(BLOCK_TAGS):
+            continue
+        text = _norm(el.get_text(" "))
+        if len(text) < 3 or text in seen:
+            continue
+        seen.add(text)
+        blocks.append(text)
+
+    # Pages built from bare divs/spans: fall back to the root's lines
+    if not blocks:
+        blocks = [line for line in (_norm(l) for l in root.get_text("\n").split("\n")) if len(line) > 2]
+    return visible_text, blocks
+
+
+def content_hash(content):
+    """Hash of extracted page text that ignores case and whitespace-only changes."""
+    return hashlib.sha256(_norm(content or "").lower().encode("utf-8")).hexdigest()
+
+
+def _terms(text):
+    return {w for w in re.findall(r"[a-z0-9]{3,}", (text or "").lower()) if w not in STOPWORDS}
+
+
+def _score(block, terms):
+    if not terms:
+        return 1.0
+    hits = len(_terms(block) & terms)
+    return hits / math.sqrt(max(1, estimate_tokens(block))) + 0.01
+
+
+def build_context(pages, description, budget=JOB_TOKEN_BUDGET):
+    """
+    pages: [(url, [blocks])] in input order. Drops blocks repeated across urls, then
+    spends the job's token budget on each url in proportion to its relevance to the
+    description, keeping the most relevant blocks (in original order) per url.
+    Returns ([(url, text)], stats).
+    """
+    terms = _terms(description)
+    seen, scored = set(), []
+    for url, blocks in pages:
+        kept = []
+        for i, block in enumerate(blocks):
+            key = hashlib.sha1(block.lower().encode("utf-8")).digest()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append((i, block, _score(block, terms)))
+        scored.append((url, kept))
+
+    # Relevance of a url = sum of its best few block scores
+    relevance = [sum(sorted((s for _, _, s in kept), reverse=True)[:10]) for _, kept in scored]
+    floor = MIN_URL_SHARE / max(1, len(scored))
+    total = sum(relevance) or 1.0
+    shares = [floor + (1 - MIN_URL_SHARE) * r / total for r in relevance]
+
+    out, spent = [], 0
+    for (url, kept), share in zip(scored, shares):
+        allowance = int(budget * share)
+        chosen, used = [], 0
+        for i, block, _ in sorted(kept, key=lambda k: k[2], reverse=True):
+            cost = estimate_tokens(block)
+            if used + cost > allowance:
+                continue
+            chosen.append((i, block))
+            used += cost
+        spent += used
+        out.append((url, "\n".join(block for _, block in sorted(chosen))))
+
+    stats = {
+        "blocks_in": sum(len(blocks) for _, blocks in pages),
+        "blocks_deduped": sum(len(blocks) for _, blocks in pages) - sum(len(kept) for _, kept in scored),
+        "tokens_extracted": sum(estimate_tokens(b) for _, blocks in pages for b in blocks),
+        "tokens_out": spent,
+        "budget": budget,
+    }
+    return out, stats
@@ -0,0 +1,93 @@
+import os
+
+import requests
+
+import metrics
+from ai_system.ollama_router import get_router, LLAMA3_MODEL, DEEPSEEK_MODEL
+from ai_system.streaming import stream_html, add_usage, STREAM_TIMEOUT
+from ai_system.model_phase import KEEP_ALIVE
+
+# --- PIPELINE MODE ---
+# "crew": CrewAI agents (analyst + coder). "fast": two fixed-prompt Ollama calls, no agent loop.
+# masks.pipeline_mode overrides this per mask.
+PIPELINE_MODES = ("crew", "fast")
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "crew")
+
+
+def resolve_mode(mask_mode=None):
+    mode = mask_mode or PIPELINE_MODE
+    return mode if mode in PIPELINE_MODES else "crew"
+
+
+def chat(base_url, model, messages, temperature=0.3, timeout=STREAM_TIMEOUT, usage=None):
+    """One non-streaming /api/chat call; returns the reply text."""
+    response = requests.post(
+        f"{base_url}/api/chat",
+        json={
+            "model": model, "messages": messages, "stream": False,
+            "options": {"temperature": temperature}, "keep_alive": KEEP_ALIVE,
+        },
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    body = response.json()
+    if body.get("error"):
+        raise RuntimeError(f"Ollama error: {body['error']}")
+    add_usage(usage, body.get("prompt_eval_count"), body.get("eval_count"))
+    metrics.record_llm(model, body.get("prompt_eval_count"), body.get("eval_count"), body.get("eval_duration"))
+    return body.get("message", {}).get("content", "")
+
+
+def summary_messages(title, description, context):
+    return [
+        {"role": "system", "content": (
+            "You extract facts from scraped web pages. Use ONLY the data given; "
+            "never invent content. Answer with a clear structured list of key points."
+        )},
+        {"role": "user", "content": (
+            f"Widget: {title}\n"
+            f"Extract key information about: {description}\n\n"
+            f"SCRAPED DATA:\n{context}"
+        )},
+    ]
+
+
+def html_messages(title, description, summary):
+    return [
+        {"role": "system", "content": (
+            "You are an HTML Generator. HTML expert who builds components using ONLY the data given, "
+            "never invents content."
+        )},
+        {"role": "user", "content": (
+            f"Using ONLY the data below, create HTML for: {title}\n"
+            f"User requirements: {description}\n"
+            f"Generate complete HTML with internal CSS. Use real data only, no placeholders.\n"
+            f"Expected output: Complete standalone HTML code with embedded CSS, in a ```html code block.\n\n"
+            f"DATA:\n{summary}"
+        )},
+    ]
+
+
+def run_fast_process(title, description, context, router=None, on_scraped=None, on_html=None, usage=None):
+    """
+    Same contract as run_crewai_process(scraped=context), without the agent loop:
+    one llama3 call summarizes the already-extracted context, one deepseek call writes the HTML.
+    """
+    router = router or get_router()
+
+    with metrics.span("llm_llama3"):
+        summary = router.run(
+            LLAMA3_MODEL,
+            lambda url: chat(url, LLAMA3_MODEL, summary_messages(title, description, context), usage=usage)
+        )
+    if on_scraped:
+        on_scraped(summary)
+
+    messages = html_messages(title, description, summary)
+    with metrics.span("llm_deepseek"):
+        if on_html is None:
+            return router.run(DEEPSEEK_MODEL, lambda url: chat(url, DEEPSEEK_MODEL, messages, usage=usage))
+        return router.run(
+            DEEPSEEK_MODEL,
+            lambda url: stream_html(url, DEEPSEEK_MODEL, messages, on_html=on_html, usage=usage)
+        )
@@ -0,0 +1,115 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+# --- FETCH ENGINE SETTINGS (override through env on the worker) ---
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "8"))
+PER_HOST_LIMIT = int(os.getenv("SCRAPER_PER_HOST_LIMIT", "2"))
+FETCH_TIMEOUT = float(os.getenv("SCRAPER_FETCH_TIMEOUT", "15"))
+BATCH_DEADLINE = float(os.getenv("SCRAPER_BATCH_DEADLINE", "90"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+_session = None
+_session_lock = threading.Lock()
+_host_locks = {}
+_host_locks_guard = threading.Lock()
+
+
+def get_session():
+    """One keep-alive session per worker process, shared by all fetch threads."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=MAX_CONCURRENCY, pool_maxsize=MAX_CONCURRENCY)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(HEADERS)
+                _session = session
+    return _session
+
+
+def _host_slot(url):
+    host = urlparse(url).netloc.lower()
+    with _host_locks_guard:
+        if host not in _host_locks:
+            _host_locks[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_locks[host]
+
+
+def page_text(html):
+    """Visible page text, whitespace-collapsed (same shape as ScrapeWebsiteTool)."""
+    text = BeautifulSoup(html, "html.parser").get_text(" ")
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\s+\n\s+", "\n", text).strip()
+
+
+def fetch_page(url, etag=None, last_modified=None, timeout=FETCH_TIMEOUT):
+    """
+    Conditional GET. Returns (status, html, etag, last_modified);
+    on a 304 html is None and the caller keeps what it already has.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    with _host_slot(url):
+        response = get_session().get(url, headers=headers, timeout=timeout)
+
+    if response.status_code == 304:
+        return 304, None, etag, last_modified
+    response.raise_for_status()
+    response.encoding = response.apparent_encoding
+    return (
+        response.status_code,
+        response.text,
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+    )
+
+
+def fetch_static(url, timeout=FETCH_TIMEOUT):
+    """Plain HTTP fetch, returns the visible page text."""
+    return page_text(fetch_page(url, timeout=timeout)[1])
+
+
+def fetch_many(urls, fetch_one, deadline=BATCH_DEADLINE):
+    """
+    Runs fetch_one(url) for every url on a bounded thread pool.
+    Results come back in input order; a failed or timed-out url yields its Exception instead.
+    """
+    if not urls:
+        return []
+
+    pool = ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(urls)), thread_name_prefix="scraper")
+    try:
+        futures = [pool.submit(fetch_one, url) for url in urls]
+        wait(futures, timeout=deadline)
+
+        results = []
+        for url, future in zip(urls, futures):
+            if not future.done():
+                future.cancel()
+                results.append(TimeoutError(f"Timed out after {deadline}s fetching {url}"))
+            elif future.exception() is not None:
+                results.append(future.exception())
+            else:
+                results.append(future.result())
+        return results
+    finally:
+        # Don't block the job on stragglers that already blew the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
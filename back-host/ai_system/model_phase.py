@@ -0,0 +1,129 @@
+import os
+import time
+import uuid
+
+import requests
+
+import metrics
+from db.redis_client import get_redis
+
+# --- MODEL PHASES (one model resident per Ollama box at a time) ---
+# llama3 and the 16B deepseek coder don't fit in VRAM together, so every switch costs a
+# multi-GB reload. Each backend runs in phases: while llama3 calls are running there,
+# deepseek calls wait (and vice versa), so concurrent jobs share one load per batch
+# instead of swapping twice per job. A phase stops admitting new calls once another
+# model has been waiting and the phase is older than PHASE_MAX_SECONDS. Once its last
+# call ends, a waiting model takes over right away if it is the only one waiting, else
+# when PHASE_MIN_BATCH calls want it or the oldest has waited PHASE_MAX_WAIT seconds,
+# and the previous model is unloaded explicitly. Calls ask Ollama to keep the model
+# loaded for KEEP_ALIVE between batches.
+PHASED = os.getenv("OLLAMA_PHASED", "1") == "1"
+PHASE_MAX_SECONDS = float(os.getenv("OLLAMA_PHASE_MAX_SECONDS", "120"))
+PHASE_MIN_BATCH = int(os.getenv("OLLAMA_PHASE_MIN_BATCH", "2"))
+PHASE_MAX_WAIT = float(os.getenv("OLLAMA_PHASE_MAX_WAIT", "15"))
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+UNLOAD_ON_SWITCH = os.getenv("OLLAMA_UNLOAD_ON_SWITCH", "1") == "1"
+UNLOAD_TIMEOUT = float(os.getenv("OLLAMA_UNLOAD_TIMEOUT", "30"))
+HOLD_TTL = 1800   # a crashed worker's hold/wait marker stops counting after this
+
+PHASE_PREFIX = "ollama:phase:"
+
+
+def unload_model(base_url, model):
+    """Ollama unloads a model on an empty generate with keep_alive=0."""
+    try:
+        requests.post(
+            f"{base_url}/api/generate", json={"model": model, "keep_alive": 0}, timeout=UNLOAD_TIMEOUT
+        ).raise_for_status()
+    except Exception as e:
+        print(f"[ollama] unloading {model} on {base_url} failed: {e}")
+
+
+class ModelPhases:
+    def __init__(self, redis_client=None, unload=unload_model, max_seconds=PHASE_MAX_SECONDS,
+                 min_batch=PHASE_MIN_BATCH, max_wait=PHASE_MAX_WAIT, clock=time.time):
+        self._redis = redis_client
+        self.unload = unload if UNLOAD_ON_SWITCH else None
+        self.max_seconds = max_seconds
+        self.min_batch = min_batch
+        self.max_wait = max_wait
+        self.clock = clock
+        self.switches = 0
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    def _members(self, key):
+        """{"model|token": since} of a holder/waiter zset."""
+        self.redis.zremrangebyscore(key, 0, self.clock() - HOLD_TTL)
+        return {m.decode(): since for m, since in self.redis.zrange(key, 0, -1, withscores=True)}
+
+    def current(self, url):
+        """(model, since) of the backend's phase, or (None, None)."""
+        state = self.redis.hgetall(PHASE_PREFIX + url)
+        if not state:
+            return None, None
+        return state[b"model"].decode(), float(state[b"since"])
+
+    def try_enter(self, url, model, token):
+        """
+        True if model may run on url now (the caller must leave() afterwards).
+        False means wait and ask again; the caller is then counted as waiting.
+        """
+        r = self.redis
+        lock = PHASE_PREFIX + "lock:" + url
+        if not r.set(lock, token, nx=True, px=2000):
+            return False
+        previous = None
+        try:
+            now = self.clock()
+            member = f"{model}|{token}"
+            holders = {m.split("|", 1)[0] for m in self._members(PHASE_PREFIX + "active:" + url)}
+            waiting = self._members(PHASE_PREFIX + "waiting:" + url)
+            waiting[member] = waiting.get(member, now)
+            phase, since = self.current(url)
+
+            if phase == model:
+                draining = any(not m.startswith(model + "|") for m in waiting) and now - since > self.max_seconds
+                admitted = not draining
+            elif phase is None:
+                admitted = True
+            elif phase not in holders:
+                # The current phase has no calls left: switch at once if no other model is waiting,
+                # else once this model's batch is worth a load
+                batch = [first for m, first in waiting.items() if m.startswith(model + "|")]
+                contended = len(batch) < len(waiting)
+                admitted = not contended or len(batch) >= self.min_batch or now - min(batch) >= self.max_wait
+            else:
+                admitted = False
+
+            if admitted and phase != model:
+                previous = phase
+                r.hset(PHASE_PREFIX + url, mapping={"model": model, "since": now})
+                self.switches += 1
+                metrics.MODEL_SWITCHES.labels(model=model).inc()
+
+            if admitted:
+                r.zadd(PHASE_PREFIX + "active:" + url, {member: now})
+                r.zrem(PHASE_PREFIX + "waiting:" + url, member)
+            else:
+                r.zadd(PHASE_PREFIX + "waiting:" + url, {member: now}, nx=True)  # keeps the first wait time
+        finally:
+            if r.get(lock) == token.encode():
+                r.delete(lock)
+
+        if previous and self.unload:
+            self.unload(url, previous)  # free the VRAM before the new model's first request loads it
+        return admitted
+
+    def leave(self, url, model, token):
+        self.redis.zrem(PHASE_PREFIX + "active:" + url, f"{model}|{token}")
+
+    def forget(self, url, model, token):
+        """Drops a waiting marker (the call went to another backend or gave up)."""
+        self.redis.zrem(PHASE_PREFIX + "waiting:" + url, f"{model}|{token}")
+
+
+def new_token():
+    return uuid.uuid4().hex
@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from db.redis_client import get_redis
+from ai_system.model_phase import ModelPhases, PHASED, new_token
+
+# --- OLLAMA BACKEND REGISTRY ---
+# OLLAMA_BACKENDS="http://10.0.0.5:11434|2,http://10.0.0.6:11434|4"  (url|max concurrent requests)
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "http://104.214.172.38:11434")
+DEFAULT_CONCURRENCY = int(os.getenv("OLLAMA_BACKEND_CONCURRENCY", "2"))
+PROBE_INTERVAL = float(os.getenv("OLLAMA_PROBE_INTERVAL", "15"))
+PROBE_TIMEOUT = float(os.getenv("OLLAMA_PROBE_TIMEOUT", "3"))
+ACQUIRE_TIMEOUT = float(os.getenv("OLLAMA_ACQUIRE_TIMEOUT", "900"))
+INFLIGHT_TTL = 3600  # a killed worker's slots free themselves after this
+
+# One zset per backend: lease token -> acquired at (stale entries are pruned on every acquire)
+INFLIGHT_PREFIX = "ollama:leases:"
+
+# Models the pipeline routes (extraction / HTML generation)
+LLAMA3_MODEL = "llama3"
+DEEPSEEK_MODEL = "deepseek-coder-v2:16b"
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+def model_key(name):
+    """'llama3' and 'llama3:latest' are the same model to Ollama."""
+    name = name.split("/", 1)[1] if name.startswith("ollama/") else name
+    return name if ":" in name else f"{name}:latest"
+
+
+def is_backend_failure(error):
+    """Errors that mean 'this box is down', as opposed to a bad prompt."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, NoBackendAvailable)):
+        return True
+    name = type(error).__name__.lower()
+    return "connection" in name or "timeout" in name or "connection refused" in str(error).lower()
+
+
+class Backend:
+    def __init__(self, url, max_concurrency):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.healthy = True
+        self.resident = set()
+        self.probed_at = 0.0
+
+    def __repr__(self):
+        return f"<Backend {self.url} healthy={self.healthy} resident={sorted(self.resident)}>"
+
+
+def parse_backends(spec):
+    backends = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        url, _, limit = item.partition("|")
+        backends.append(Backend(url, int(limit) if limit else DEFAULT_CONCURRENCY))
+    return backends
+
+
+class OllamaRouter:
+    """
+    Picks an Ollama box per request: healthy, under its concurrency limit, preferring
+    one that already has the model loaded, then the one with the shortest queue.
+    In-flight counts live in Redis so every worker process sees the same queue depth.
+    With phases, a box only takes calls for the model it is currently running (see model_phase).
+    """
+
+    def __init__(self, backends, probe_interval=PROBE_INTERVAL, redis_client=None, phases=None):
+        self.backends = backends
+        self.probe_interval = probe_interval
+        self._redis = redis_client
+        self.phases = phases
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    # --- health / residency probes ---
+    def probe(self, backend):
+        try:
+            requests.get(f"{backend.url}/api/tags", timeout=PROBE_TIMEOUT).raise_for_status()
+            ps = requests.get(f"{backend.url}/api/ps", timeout=PROBE_TIMEOUT)
+            models = ps.json().get("models", []) if ps.ok else []
+            backend.resident = {model_key(m.get("model") or m.get("name", "")) for m in models}
+            backend.healthy = True
+        except Exception:
+            backend.healthy = False
+            backend.resident = set()
+        backend.probed_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Re-probes backends whose last probe is older than probe_interval."""
+        now = time.monotonic()
+        for backend in self.backends:
+            if force or now - backend.probed_at >= self.probe_interval:
+                self.probe(backend)
+
+    def mark_down(self, backend):
+        backend.healthy = False
+        backend.probed_at = time.monotonic()  # retry it after the next interval
+
+    # --- queue depth ---
+    def in_flight(self, backend):
+        try:
+            key = INFLIGHT_PREFIX + backend.url
+            self.redis.zremrangebyscore(key, 0, time.time() - INFLIGHT_TTL)
+            return self.redis.zcard(key)
+        except Exception:
+            return 0
+
+    def _try_acquire(self, backend, token):
+        key = INFLIGHT_PREFIX + backend.url
+        try:
+            self.redis.zremrangebyscore(key, 0, time.time() - INFLIGHT_TTL)
+            self.redis.zadd(key, {token: time.time()})
+            rank = self.redis.zrank(key, token)
+        except Exception:
+            return True  # no Redis: fall back to no cross-process limit
+        # Oldest leases win, so two racing acquires can't both give up the last slot
+        if rank is None or rank >= backend.max_concurrency:
+            self._release(backend, token)
+            return False
+        return True
+
+    def _release(self, backend, token):
+        try:
+            self.redis.zrem(INFLIGHT_PREFIX + backend.url, token)
+        except Exception:
+            pass
+
+    # --- model phases ---
+    def _enter(self, backend, model, token, phased):
+        """Phase admission, then a concurrency slot; both or neither."""
+        if phased and self.phases:
+            try:
+                if not self.phases.try_enter(backend.url, model, token):
+                    return False
+            except Exception:
+                phased = False  # no Redis: run without phases
+        if self._try_acquire(backend, token):
+            return True
+        if phased and self.phases:
+            self._leave(backend, model, token)
+        return False
+
+    def _leave(self, backend, model, token):
+        try:
+            self.phases.leave(backend.url, model, token)
+        except Exception:
+            pass
+
+    def _forget(self, backends, model, token):
+        for backend in backends:
+            try:
+                self.phases.forget(backend.url, model, token)
+            except Exception:
+                pass
+
+    def candidates(self, model, exclude=()):
+        """Healthy backends ordered best-first for this model."""
+        with self._lock:
+            self.refresh()
+        wanted = model_key(model)
+        pool = [b for b in self.backends if b.healthy and b.url not in exclude]
+        return sorted(pool, key=lambda b: (wanted not in b.resident, self.in_flight(b) / b.max_concurrency))
+
+    @contextmanager
+    def lease(self, model, exclude=(), timeout=ACQUIRE_TIMEOUT, phased=True):
+        """
+        Holds one concurrency slot on the best backend; yields its base url.
+        phased=False skips phase admission, for callers that hold two models at once.
+        """
+        phased = phased and self.phases is not None
+        token = new_token()
+        deadline = time.monotonic() + timeout
+        pool = []
+        try:
+            while True:
+                pool = self.candidates(model, exclude)
+                chosen = next((b for b in pool if self._enter(b, model, token, phased)), None)
+                if chosen:
+                    break
+                if not pool:
+                    raise NoBackendAvailable(f"No healthy Ollama backend for {model}")
+                if time.monotonic() > deadline:
+                    raise NoBackendAvailable(f"Timed out waiting for an Ollama slot for {model}")
+                time.sleep(0.5)
+        finally:
+            if phased:
+                self._forget(pool, model, token)  # no longer waiting anywhere
+
+        try:
+            yield chosen.url
+            chosen.resident.add(model_key(model))
+        except Exception as e:
+            if is_backend_failure(e):
+                self.mark_down(chosen)
+            raise
+        finally:
+            self._release(chosen, token)
+            if phased:
+                self._leave(chosen, model, token)
+
+    def run(self, model, fn, phased=True):
+        """fn(base_url) on the best backend, failing over to the next one if the box is down."""
+        tried = []
+        while True:
+            url = None
+            try:
+                with self.lease(model, exclude=tried, phased=phased) as url:
+                    return fn(url)
+            except Exception as e:
+                if url is None or not is_backend_failure(e) or len(tried) + 1 >= len(self.backends):
+                    raise
+                tried.append(url)
+                print(f"[ollama] {url} failed for {model} ({e}); failing over")
+
+
+_router = None
+
+
+def get_router():
+    """Process-wide router built from OLLAMA_BACKENDS."""
+    global _router
+    if _router is None:
+        _router = OllamaRouter(parse_backends(OLLAMA_BACKENDS), phases=ModelPhases() if PHASED else None)
+    return _router
@@ -0,0 +1,254 @@
+import json
+import os
+import time
+import uuid
+
+from fastapi import HTTPException
+
+from db.redis_client import get_redis, CACHE_BACKEND
+
+# --- FAIR-SHARE DISPATCH ---
+# Jobs wait in Redis, one queue per (priority class, user), and are released to Celery
+# by deficit round robin: each visit a flow earns its class weight in credit and spends
+# one credit per job. While others are waiting a user gets at most USER_INFLIGHT jobs
+# running (idle workers are lent out past that unless SCHED_LEND_IDLE=0), the whole
+# deployment no more than GLOBAL_INFLIGHT, and past MAX_QUEUED waiting jobs new work
+# is refused with 429. Needs real Redis; with CACHE_BACKEND=local jobs go straight out.
+ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1" and CACHE_BACKEND != "local"
+USER_INFLIGHT = int(os.getenv("SCHED_USER_INFLIGHT", "2"))
+LEND_IDLE = os.getenv("SCHED_LEND_IDLE", "1") == "1"
+GLOBAL_INFLIGHT = int(os.getenv("SCHED_GLOBAL_INFLIGHT", "8"))
+MAX_QUEUED = int(os.getenv("SCHED_MAX_QUEUED", "500"))
+RETRY_AFTER_SECONDS = int(os.getenv("SCHED_RETRY_AFTER", "30"))
+INFLIGHT_TTL = int(os.getenv("SCHED_INFLIGHT_TTL", "7200"))  # a job never released frees its slot after this
+PRIORITY_WEIGHTS = {"interactive": 8, "normal": 4, "bulk": 1}
+
+PREFIX = "sched:"
+RING = PREFIX + "ring"            # list of flows ("priority:user") with queued work, in visiting order
+FLOWS = PREFIX + "flows"          # set mirror of RING for O(1) membership
+DEFICIT = PREFIX + "deficit"      # hash flow -> unspent credit
+TURN = PREFIX + "turn"            # hash flow -> credit left in a turn cut short by GLOBAL_INFLIGHT
+QUEUED = PREFIX + "queued"        # jobs waiting across all flows
+INFLIGHT = PREFIX + "inflight"    # zset job_id -> dispatch time
+JOB_USER = PREFIX + "job_user"    # hash job_id -> user, to release the right per-user slot
+LOCK = PREFIX + "lock"
+
+
+def _queue(flow):
+    return PREFIX + "queue:" + flow
+
+
+def _user_inflight(user):
+    return PREFIX + "inflight:" + user
+
+
+def send_to_celery(item):
+    from ai_system.dispatch import run_mask_processing
+    run_mask_processing(task_id=item["task_id"], **item["kwargs"])
+
+
+class FairScheduler:
+    def __init__(self, redis_client=None, dispatch=send_to_celery, clock=time.time):
+        self._redis = redis_client
+        self.dispatch = dispatch
+        self.clock = clock
+
+    @property
+    def redis(self):
+        return self._redis or get_redis()
+
+    # --- admission ---
+    def depth(self):
+        return int(self.redis.get(QUEUED) or 0)
+
+    def admit(self):
+        """Raises 429 with a Retry-After scaled by how far over the limit the queue is."""
+        depth = self.depth()
+        if depth >= MAX_QUEUED:
+            retry_after = min(600, RETRY_AFTER_SECONDS * max(1, depth // max(1, MAX_QUEUED // 2)))
+            raise HTTPException(
+                status_code=429,
+                detail="Generation queue is full, please retry later",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    # --- submit / release ---
+    def submit(self, user_id, job_id, kwargs, priority="normal", pump=True):
+        """Queues one run_mask_processing call; returns the Celery task id it will run under."""
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"unknown priority {priority!r}")
+        item = {"job_id": job_id, "user": str(user_id), "kwargs": kwargs, "task_id": str(uuid.uuid4())}
+        flow = f"{priority}:{user_id}"
+        r = self.redis
+        r.rpush(_queue(flow), json.dumps(item))
+        r.incr(QUEUED)
+        if r.sadd(FLOWS, flow):
+            r.rpush(RING, flow)
+        if pump:
+            self.safe_pump()
+        return item["task_id"]
+
+    def release(self, job_id):
+        """A dispatched job finished (either way): free its slots and let the next one out."""
+        r = self.redis
+        user = r.hget(JOB_USER, str(job_id))
+        if user is None:
+            return  # never went through the scheduler (coalesced, reused, or already released)
+        r.hdel(JOB_USER, str(job_id))
+        r.zrem(INFLIGHT, str(job_id))
+        r.zrem(_user_inflight(user.decode()), str(job_id))
+        self.safe_pump()
+
+    # --- dispatch ---
+    def _count(self, key):
+        # Drop slots held longer than INFLIGHT_TTL (worker died without releasing)
+        self.redis.zremrangebyscore(key, 0, self.clock() - INFLIGHT_TTL)
+        return self.redis.zcard(key)
+
+    def _send(self, item):
+        self.dispatch(item)
+        now = self.clock()
+        r = self.redis
+        r.zadd(INFLIGHT, {str(item["job_id"]): now})
+        r.zadd(_user_inflight(item["user"]), {str(item["job_id"]): now})
+        r.hset(JOB_USER, str(item["job_id"]), item["user"])
+        r.decr(QUEUED)
+
+    def _requeue_or_retire(self, flow, credit, interrupted=False):
+        """
+        Back on the ring while the flow has jobs, else out of FLOWS. The queue is WATCHed, so
+        a submit() landing between the length check and the removal retries the check instead
+        of leaving a queued job in a flow that is on neither RING nor FLOWS.
+        interrupted: the turn ended on GLOBAL_INFLIGHT with credit left. The flow stays at the
+        front and the next pump finishes the turn, so under a full deployment each freed slot
+        doesn't go to the next flow in turn (which would flatten the weights to 1:1).
+        """
+        queue = _queue(flow)
+
+        def step(pipe):
+            waiting = pipe.llen(queue)
+            pipe.multi()
+            if waiting and interrupted:
+                pipe.hset(TURN, flow, credit)
+                pipe.lpush(RING, flow)
+            elif waiting:
+                pipe.hset(DEFICIT, flow, credit)
+                pipe.rpush(RING, flow)
+            else:
+                # Idle flows don't bank credit
+                pipe.hdel(DEFICIT, flow)
+                pipe.hdel(TURN, flow)
+                pipe.srem(FLOWS, flow)
+
+        self.redis.transaction(step, queue)
+
+    def pump(self):
+        """Releases as many jobs as capacity allows, in deficit-round-robin order. Returns how many."""
+        r = self.redis
+        token = uuid.uuid4().hex
+        if not r.set(LOCK, token, nx=True, ex=30):
+            return 0  # another process is pumping; release() and the beat will pump again
+        sent, blocked, user_cap = 0, 0, USER_INFLIGHT
+        try:
+            while self._count(INFLIGHT) < GLOBAL_INFLIGHT:
+                ring_size = r.llen(RING)
+                if not ring_size:
+                    break
+                if blocked >= ring_size:
+                    # Every queued user is at their cap and workers are idle
+                    if not LEND_IDLE or user_cap > USER_INFLIGHT:
+                        break
+                    user_cap, blocked = GLOBAL_INFLIGHT, 0
+                flow = r.lpop(RING).decode()
+                queue = _queue(flow)
+                priority, user = flow.split(":", 1)
+
+                if self._count(_user_inflight(user)) >= user_cap:
+                    r.rpush(RING, flow)
+                    blocked += 1
+                    continue
+
+                turn = r.hget(TURN, flow)
+                if turn is not None:
+                    # Finishing an interrupted turn: its credit was already earned
+                    r.hdel(TURN, flow)
+                    credit = float(turn)
+                else:
+                    credit = float(r.hget(DEFICIT, flow) or 0) + PRIORITY_WEIGHTS[priority]
+                while credit >= 1 and self._count(INFLIGHT) < GLOBAL_INFLIGHT \
+                        and self._count(_user_inflight(user)) < user_cap:
+                    raw = r.lpop(queue)
+                    if raw is None:
+                        break
+                    item = json.loads(raw)
+                    try:
+                        self._send(item)
+                    except Exception:
+                        r.lpush(queue, raw)  # broker hiccup: keep its place, try on the next pump
+                        r.rpush(RING, flow)
+                        raise
+                    credit -= 1
+                    sent += 1
+                    blocked = 0
+
+                interrupted = credit >= 1 and self._count(INFLIGHT) >= GLOBAL_INFLIGHT
+                self._requeue_or_retire(flow, credit, interrupted)
+        finally:
+            if r.get(LOCK) == token.encode():
+                r.delete(LOCK)
+        return sent
+
+    def safe_pump(self):
+        # The job is safely queued either way; a failed pump is retried by the beat
+        try:
+            return self.pump()
+        except Exception as e:
+            print(f"[scheduler] pump failed: {e}")
+            return 0
+
+    def stats(self):
+        return {"queued": self.depth(), "inflight": self._count(INFLIGHT), "flows": self.redis.llen(RING)}
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler()
+    return _scheduler
+
+
+def admit():
+    if ENABLED:
+        get_scheduler().admit()
+
+
+def submit(user_id, job_id, kwargs, priority="normal"):
+    """Entry point for routes/tasks: fair-share queue when enabled, else straight to Celery."""
+    if ENABLED:
+        return get_scheduler().submit(user_id, job_id, kwargs, priority)
+    item = {"job_id": job_id, "kwargs": kwargs, "task_id": str(uuid.uuid4())}
+    send_to_celery(item)
+    return item["task_id"]
+
+
+def submit_many(entries, priority="bulk"):
+    """entries: [(user_id, job_id, kwargs)]; queued first, pumped once. Returns task ids in order."""
+    scheduler = get_scheduler()
+    task_ids = [scheduler.submit(user_id, job_id, kwargs, priority, pump=False) for user_id, job_id, kwargs in entries]
+    scheduler.safe_pump()
+    return task_ids
+
+
+def release(job_id):
+    if ENABLED:
+        try:
+            get_scheduler().release(job_id)
+        except Exception as e:
+            print(f"[scheduler] release of job {job_id} failed: {e}")
+
+
+def pump():
+    return get_scheduler().pump() if ENABLED else 0
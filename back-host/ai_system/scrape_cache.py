@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import time
+
+from db.redis_client import get_redis
+import metrics
+
+# --- SCRAPE CACHE SETTINGS ---
+# Within FRESH_TTL a cached page is served as-is. After that it is revalidated with
+# If-None-Match / If-Modified-Since until STALE_TTL, when Redis drops it entirely.
+# Pages that needed the browser are served for DYNAMIC_FRESH_TTL and then rendered again
+# directly: their static shell says nothing about what the scripts load.
+FRESH_TTL = int(os.getenv("SCRAPE_CACHE_FRESH_TTL", "900"))
+DYNAMIC_FRESH_TTL = int(os.getenv("SCRAPE_CACHE_DYNAMIC_TTL", "3600"))
+STALE_TTL = int(os.getenv("SCRAPE_CACHE_STALE_TTL", "86400"))
+
+KEY_PREFIX = "scrape:page:v2:"  # v2: content is extracted main-content blocks
+STATS_PREFIX = "scrape:stats:"
+STAT_NAMES = ("hit", "miss", "revalidated", "refetched")
+
+
+def _key(url):
+    return KEY_PREFIX + hashlib.sha256(url.strip().encode("utf-8")).hexdigest()
+
+
+def get(url):
+    try:
+        raw = get_redis().get(_key(url))
+    except Exception:
+        return None  # cache outage just means a fresh scrape
+    return json.loads(raw) if raw else None
+
+
+def _store(entry):
+    try:
+        get_redis().set(_key(entry["url"]), json.dumps(entry), ex=STALE_TTL)
+    except Exception:
+        pass
+    return entry
+
+
+def put(url, content, source, etag=None, last_modified=None):
+    """source is 'static' or 'dynamic' (rendered through the browser pool)."""
+    entry = {
+        "url": url,
+        "content": content,
+        "source": source,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": time.time(),
+    }
+    return _store(entry)
+
+
+def touch(entry):
+    """Server said 304: the stored copy is good for another FRESH_TTL."""
+    entry["fetched_at"] = time.time()
+    return _store(entry)
+
+
+def is_fresh(entry, ttl=FRESH_TTL):
+    return time.time() - entry["fetched_at"] < ttl
+
+
+def record(stat):
+    metrics.record_cache("scrape", stat)
+    try:
+        get_redis().incr(STATS_PREFIX + stat)
+    except Exception:
+        pass  # counters must never fail a scrape
+
+
+def stats():
+    """Counters shared by every worker; hit_rate counts 304 revalidations as hits."""
+    values = get_redis().mget([STATS_PREFIX + name for name in STAT_NAMES])
+    counts = {name: int(v or 0) for name, v in zip(STAT_NAMES, values)}
+    total = sum(counts.values())
+    counts["hit_rate"] = round((counts["hit"] + counts["revalidated"]) / total, 4) if total else 0.0
+    return counts
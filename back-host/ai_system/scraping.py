@@ -0,0 +1,84 @@
+from ai_system.fetcher import fetch_page, fetch_many
+from ai_system import scrape_cache
+from ai_system.extraction import extract_page, build_context, estimate_tokens
+from ai_system.browser_pool import scrape_dynamic
+import metrics
+
+# --- SCRAPING (no CrewAI here: the scrape/extract stages and refresh checks use it directly) ---
+def needs_browser(content):
+    """Static result is too thin or looks like a block/maintenance page."""
+    return not content or len(content) < 800 or any(x in content.lower() for x in ["maintenance", "access denied", "robot"])
+
+def scrape_one(url, fresh_ttl=scrape_cache.FRESH_TTL, dynamic_ttl=scrape_cache.DYNAMIC_FRESH_TTL):
+    """Main-content blocks of one page, joined by newlines (cached per url)."""
+    entry = scrape_cache.get(url)
+    dynamic = entry is not None and entry.get("source") == "dynamic"
+    if entry and scrape_cache.is_fresh(entry, dynamic_ttl if dynamic else fresh_ttl):
+        scrape_cache.record("hit")
+        metrics.SCRAPES.labels(source="cache").inc()
+        return entry["content"]
+
+    if dynamic:
+        # Rendered last time: the static shell would only be thin again, go straight to the browser
+        scrape_cache.record("refetched")
+        with metrics.span("scrape_dynamic"):
+            _text, blocks = extract_page(scrape_dynamic(url))
+        metrics.SCRAPES.labels(source="dynamic").inc()
+        content = "\n".join(blocks)
+        scrape_cache.put(url, content, "dynamic")
+        return content
+
+    # Try fast static scrape first (conditional when we hold a cached copy)
+    with metrics.span("scrape_static"):
+        status, html, etag, last_modified = fetch_page(
+            url,
+            etag=entry["etag"] if entry else None,
+            last_modified=entry["last_modified"] if entry else None,
+        )
+    if status == 304:
+        # Unchanged upstream: keep the cached text
+        scrape_cache.record("revalidated")
+        metrics.SCRAPES.labels(source="revalidated").inc()
+        return scrape_cache.touch(entry)["content"]
+    scrape_cache.record("refetched" if entry else "miss")
+
+    # Switch to a pooled Selenium browser if content is too thin or blocked
+    source = "static"
+    with metrics.span("extract_page"):
+        visible_text, blocks = extract_page(html)
+    if needs_browser(visible_text):
+        with metrics.span("scrape_dynamic"):
+            visible_text, blocks = extract_page(scrape_dynamic(url))
+        source = "dynamic"
+    metrics.SCRAPES.labels(source=source).inc()
+
+    content = "\n".join(blocks)
+    scrape_cache.put(url, content, source, etag, last_modified)
+    return content
+
+def scrape_context(urls, description):
+    """
+    Fetch + extract every url concurrently, then fit the job's token budget.
+    Returns the prompt-ready text and the extraction stats.
+    """
+    return assemble_context(urls, fetch_many(urls, scrape_one), description)
+
+def assemble_context(urls, fetched, description):
+    """fetched: scrape_one output (or the Exception it raised) per url, in url order."""
+    pages = [(url, [] if isinstance(content, Exception) else content.split("\n")) for url, content in zip(urls, fetched)]
+    selected, stats = build_context(pages, description)
+
+    # What the old content[:5000]-per-url cut would have sent, for comparison
+    stats["tokens_naive"] = sum(
+        estimate_tokens(content[:5000]) for content in fetched if not isinstance(content, Exception)
+    )
+    print(f"[scraper] {len(urls)} urls, tokens naive={stats['tokens_naive']} "
+          f"extracted={stats['tokens_extracted']} sent={stats['tokens_out']} (budget {stats['budget']})")
+
+    results = []
+    for (url, text), content in zip(selected, fetched):
+        if isinstance(content, Exception):
+            results.append(f"### ERROR SCRAPING {url} ###\n{str(content)}")
+        else:
+            results.append(f"### DATA FROM {url} ###\n{text}")
+    return "\n\n".join(results), stats
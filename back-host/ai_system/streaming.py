@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import time
+
+import requests
+
+import metrics
+from ai_system.model_phase import KEEP_ALIVE
+
+# --- STREAMING GENERATION SETTINGS ---
+STREAM_GENERATION = os.getenv("STREAM_GENERATION", "1") == "1"
+FLUSH_SECONDS = float(os.getenv("PREVIEW_FLUSH_SECONDS", "1.5"))
+FLUSH_CHARS = int(os.getenv("PREVIEW_FLUSH_CHARS", "2000"))
+STREAM_TIMEOUT = float(os.getenv("OLLAMA_STREAM_TIMEOUT", "600"))
+
+
+def add_usage(usage, prompt_tokens=0, completion_tokens=0, calls=1):
+    """Accumulates token counts into a caller-owned dict (no-op when usage is None)."""
+    if usage is None:
+        return
+    usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + (prompt_tokens or 0)
+    usage["completion_tokens"] = usage.get("completion_tokens", 0) + (completion_tokens or 0)
+    usage["calls"] = usage.get("calls", 0) + calls
+
+
+def stream_chat(base_url, model, messages, temperature=0.3, timeout=STREAM_TIMEOUT, usage=None):
+    """Yields content chunks from Ollama's /api/chat token stream."""
+    with requests.post(
+        f"{base_url}/api/chat",
+        json={
+            "model": model, "messages": messages, "stream": True,
+            "options": {"temperature": temperature}, "keep_alive": KEEP_ALIVE,
+        },
+        stream=True,
+        timeout=timeout,
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            piece = chunk.get("message", {}).get("content", "")
+            if piece:
+                yield piece
+            if chunk.get("done"):
+                add_usage(usage, chunk.get("prompt_eval_count"), chunk.get("eval_count"))
+                metrics.record_llm(model, chunk.get("prompt_eval_count"), chunk.get("eval_count"), chunk.get("eval_duration"))
+                break
+
+
+class HtmlStreamExtractor:
+    """
+    Incremental version of worker.extract_html: feed() chunks as they arrive and read
+    .html at any point. Only the new tail is scanned on each feed.
+    """
+
+    FENCE = "```"
+
+    def __init__(self):
+        self.buffer = ""
+        self.fence_at = None  # index of the opening fence, once seen
+        self.start = None     # index where the html body starts (after the fence's info string)
+        self.end = None       # index of the closing fence once seen
+        self._scanned = 0
+
+    def _body_start(self, after, line_end):
+        """Where the body starts, given the text between the opening ``` and its line end."""
+        info = self.buffer[after:line_end]
+        if re.fullmatch(r"\s*[\w.+-]*\s*", info):
+            return line_end + 1  # "```", "```html", "```HTML", "```xml" ...
+        tag = re.match(r"\s*html", info, re.I)
+        return after + tag.end() if tag else after  # "```html<!DOCTYPE ..." on one line
+
+    def feed(self, piece):
+        self.buffer += piece
+        if self.end is not None:
+            return
+        # Back up a few chars so a fence split across chunks is still found
+        from_idx = max(0, self._scanned - len(self.FENCE))
+        if self.fence_at is None:
+            idx = self.buffer.find(self.FENCE, from_idx)
+            if idx != -1:
+                self.fence_at = idx
+                from_idx = idx + len(self.FENCE)
+        if self.fence_at is not None and self.start is None:
+            after = self.fence_at + len(self.FENCE)
+            line_end = self.buffer.find("\n", max(after, from_idx))
+            if line_end == -1 and re.search(r"[^\w.+\-\s]", self.buffer[after:]):
+                line_end = len(self.buffer)  # body already on the fence line ("```html<!DOCTYPE")
+            if line_end != -1:
+                self.start = self._body_start(after, line_end)
+                from_idx = self.start
+        if self.start is not None:
+            idx = self.buffer.find(self.FENCE, max(from_idx, self.start))
+            if idx != -1:
+                self.end = idx
+        self._scanned = len(self.buffer)
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+    @property
+    def html(self):
+        if self.start is None:
+            # No fence: the whole reply is the widget (as extract_html always did);
+            # an opening fence still being written is left out of the preview
+            return (self.buffer if self.fence_at is None else self.buffer[:self.fence_at]).strip()
+        body = self.buffer[self.start:self.end] if self.end is not None else self.buffer[self.start:]
+        return body.rstrip("`").strip()
+
+
+class ThrottledFlush:
+    """Calls flush(html) at most every FLUSH_SECONDS or FLUSH_CHARS of new output."""
+
+    def __init__(self, flush, seconds=FLUSH_SECONDS, chars=FLUSH_CHARS):
+        self.flush = flush
+        self.seconds = seconds
+        self.chars = chars
+        self._last_at = 0.0
+        self._last_len = 0
+
+    def __call__(self, html, force=False):
+        now = time.monotonic()
+        if force or now - self._last_at >= self.seconds or len(html) - self._last_len >= self.chars:
+            if html and len(html) != self._last_len:
+                self.flush(html)
+            self._last_at = now
+            self._last_len = len(html)
+
+
+def stream_html(base_url, model, messages, on_html=None, usage=None):
+    """Streams a generation, reporting partial HTML along the way. Returns the final HTML."""
+    extractor = HtmlStreamExtractor()
+    flush = ThrottledFlush(on_html) if on_html else None
+    calls_before = usage.get("calls", 0) if usage is not None else 0
+
+    for piece in stream_chat(base_url, model, messages, usage=usage):
+        extractor.feed(piece)
+        if flush:
+            flush(extractor.html)
+        if extractor.complete:
+            break  # anything after the closing fence is chatter
+
+    if usage is not None and usage.get("calls", 0) == calls_before:
+        # Stopped before Ollama's final counts arrived: estimate the output (~4 chars/token)
+        add_usage(usage, 0, len(extractor.buffer) // 4)
+
+    if flush:
+        flush(extractor.html, force=True)
+    return extractor.html
@@ -1,42 +1,322 @@
-from celery_config import celery_app
+from celery_config import celery_app, STAGE_RETRY, REFRESH_INTERVAL, REFRESH_BATCH, REFRESH_FRESH_TTL
+from celery import group
+from celery.signals import worker_process_shutdown
+from requests import RequestException
 from sqlalchemy import text
-from db.database import SessionLocal
-from ai_system.crew import run_crewai_process
-import re
+from db.database import SessionLocal, run_transaction
+from db import widget_cache, jobs, job_events, artifacts, retention
+from ai_system.scraping import scrape_one, assemble_context
+from ai_system.fetcher import fetch_many
+from ai_system.extraction import content_hash
+from ai_system.browser_pool import close_pool
+from ai_system.fast_pipeline import run_fast_process, resolve_mode
+from ai_system.streaming import STREAM_GENERATION, HtmlStreamExtractor
+from ai_system import scheduler
+import metrics
+import os
 import json
+import time
 
 def extract_html(ai_string):
-    """Safely extracts HTML from markdown backticks."""
-    match = re.search(r'```html\s*(.*?)\s*```', ai_string, re.DOTALL)
-    return match.group(1).strip() if match else ai_string.strip()
+    """Safely extracts HTML from markdown backticks (any fence, any case; no fence = whole reply)."""
+    extractor = HtmlStreamExtractor()
+    extractor.feed(ai_string)
+    return extractor.html
 
+@worker_process_shutdown.connect
+def shutdown_browsers(pid=None, **kwargs):
+    # Browsers live as long as the worker process; quit them with it
+    close_pool()
+    metrics.process_exited(pid or os.getpid())
+
+def waiting_masks(db, job_id):
+    mask_ids = jobs.job_mask_ids(db, job_id)
+    db.commit()  # don't hold a read transaction open across a long stage
+    return mask_ids
+
+def announce(db, job_id, stage):
+    # Push stage changes to every mask waiting on this job (SSE listeners)
+    for mask_id in waiting_masks(db, job_id):
+        job_events.publish(mask_id, stage, job_id=str(job_id))
+
+def record_stage(db, job_id, stage, **info):
+    with metrics.span("db_write"):
+        run_transaction(db, lambda s: jobs.set_stage(s, job_id, stage, at=time.time(), **info))
+
+def save_timings(db, job_id, timings):
+    run_transaction(db, lambda s: jobs.add_timings(s, job_id, timings))
+
+def fail(db, job_id, error, partial_html=""):
+    db.rollback() # 👈 Prevents the "transaction aborted" lock
+    # Keep whatever HTML was generated before the crash
+    partial_payload = json.dumps({"html_code": partial_html, "partial": True}) if partial_html else None
+    mask_ids = run_transaction(db, lambda s: jobs.fail_job(s, job_id, error, partial_payload))
+    scheduler.release(job_id)
+    for mask_id in mask_ids:
+        job_events.publish(mask_id, "failed", job_id=str(job_id), error=error)
+
+# --- 1. ENTRY POINT: fan out the staged pipeline ---
 @celery_app.task(name="run_mask_processing")
-def run_mask_processing(job_id, title, description, urls):
+def run_mask_processing(job_id, title, description, urls, pipeline_mode=None):
+    """
+    scrape_url (one per url, queue 'scrape') -> extract_context ('extract') -> generate_widget ('llm').
+    Each stage records itself on ai_jobs.stage / stage_state.
+    pipeline_mode picks the generator ('crew' or 'fast'); None means the PIPELINE_MODE default.
+    """
     db = SessionLocal()
     try:
-        # 1. Execute CrewAI
-        ai_result = run_crewai_process(title, description, urls, "104.214.172.38")
+        record_stage(db, job_id, "scrape", urls=len(urls))
+        announce(db, job_id, "scraping")
 
-        # 2. Extract and sanitize the code
-        # We use .raw to get the final agent output
-        raw_html = extract_html(ai_result.raw)
+        tail = extract_context.s(job_id, description, urls) | generate_widget.s(job_id, title, description, urls, pipeline_mode)
+        if urls:
+            (group(scrape_url.s(job_id, url) for url in urls) | tail).apply_async()
+        else:
+            tail.apply_async(args=([],))
+    except Exception as e:
+        fail(db, job_id, str(e))
+    finally:
+        db.close()
 
-        # 3. Store as a structured JSON object
-        # This prevents the 'invalid JSON' error in CockroachDB
-        final_payload = json.dumps({"html_code": raw_html})
+# --- 2. SCRAPE: one url per task, retried on network errors ---
+@celery_app.task(name="scrape_url", bind=True, **STAGE_RETRY["scrape_url"])
+def scrape_url(self, job_id, url):
+    # Span timings ride along with the result; extract_context saves them for the job
+    with metrics.collect() as timings:
+        try:
+            result = {"url": url, "content": scrape_one(url)}
+        except (RequestException, TimeoutError) as e:
+            if self.request.retries < self.max_retries:
+                raise self.retry(exc=e)
+            result = {"url": url, "error": str(e)}
+        except Exception as e:
+            # A bad url shouldn't sink the whole job; the analyst just sees the error
+            result = {"url": url, "error": str(e)}
+    result["timings"] = dict(timings)
+    return result
 
-        db.execute(
-            text("UPDATE ai_jobs SET status = 'completed', result = :res, updated_at = NOW() WHERE id = :jid"),
-            {"res": final_payload, "jid": job_id}
-        )
-        db.commit()
+# --- 3. JOIN + EXTRACT: dedupe and fit the token budget ---
+@celery_app.task(name="extract_context", bind=True, **STAGE_RETRY["extract_context"])
+def extract_context(self, scraped, job_id, description, urls):
+    db = SessionLocal()
+    try:
+        with metrics.collect() as timings:
+            for item in scraped:
+                for name, seconds in item.get("timings", {}).items():
+                    timings.add(name, seconds)  # summed over urls (they ran in parallel)
 
+            by_url = {item["url"]: item for item in scraped}
+            fetched = [
+                Exception(by_url[url]["error"]) if "error" in by_url.get(url, {"error": "not scraped"})
+                else by_url[url]["content"]
+                for url in urls
+            ]
+            with metrics.span("extract"):
+                context, stats = assemble_context(urls, fetched, description)
+            # Baseline for scheduled refresh; copied onto the mask when the job completes
+            source_hashes = {
+                url: content_hash(content) for url, content in zip(urls, fetched) if not isinstance(content, Exception)
+            }
+            record_stage(
+                db, job_id, "extract", failed_urls=sum(isinstance(f, Exception) for f in fetched),
+                source_hashes=source_hashes, **stats
+            )
+        save_timings(db, job_id, timings)
+        return context
     except Exception as e:
-        db.rollback() # 👈 Prevents the "transaction aborted" lock
-        db.execute(
-            text("UPDATE ai_jobs SET status = 'failed', error_message = :err, updated_at = NOW() WHERE id = :jid"),
-            {"err": str(e), "jid": job_id}
-        )
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        fail(db, job_id, str(e))
+        raise
+    finally:
+        db.close()
+
+# --- 4. GENERATE: both LLM passes; a retry reuses the extracted context ---
+@celery_app.task(name="generate_widget", bind=True, **STAGE_RETRY["generate_widget"])
+def generate_widget(self, context, job_id, title, description, urls, pipeline_mode=None):
+    db = SessionLocal()
+    partial = {"html": "", "masks": None}
+    mode = resolve_mode(pipeline_mode)
+    usage = {}
+
+    def preview(html):
+        # Partial HTML while the coder is still streaming; the waiting masks are looked up
+        # on the first flush only, not once per flush
+        partial["html"] = html
+        if partial["masks"] is None:
+            partial["masks"] = waiting_masks(db, job_id)
+        for mask_id in partial["masks"]:
+            job_events.set_preview(mask_id, job_id, html)
+
+    try:
+        with metrics.collect() as timings:
+            try:
+                record_stage(db, job_id, "generate", attempt=self.request.retries + 1, mode=mode)
+
+                # 1. Execute CrewAI (or the fixed-prompt fast path) on the already-extracted context
+                on_scraped = lambda _output: announce(db, job_id, "generating")
+                on_html = preview if STREAM_GENERATION else None
+                with metrics.span("generate"):
+                    if mode == "fast":
+                        ai_output = run_fast_process(
+                            title, description, context,
+                            on_scraped=on_scraped, on_html=on_html, usage=usage
+                        )
+                    else:
+                        # Only 'llm' workers running crew mode pay for importing CrewAI
+                        from ai_system.crew import run_crewai_process
+                        ai_output = run_crewai_process(
+                            title, description, urls,
+                            on_scraped=on_scraped, on_html=on_html,
+                            scraped=context, usage=usage
+                        )
+
+                # 2. Extract and sanitize the code
+                raw_html = extract_html(ai_output)
+
+                # 3. Publish the servable artifact (minified, precompressed) once, here
+                try:
+                    with metrics.span("publish"):
+                        artifact = artifacts.publish(raw_html)
+                except Exception as e:
+                    print(f"[worker] artifact publish failed for job {job_id}: {e}")
+                    artifact = None  # /embed publishes it on first view instead
+
+                # Store as a structured JSON object
+                # This prevents the 'invalid JSON' error in CockroachDB
+                final_payload = json.dumps({"html_code": raw_html, "artifact": artifact})
+
+                # Completes this job plus any identical requests coalesced onto it,
+                # and moves their masks' current_job_id in the same transaction
+                def finish(s):
+                    jobs.set_stage(s, job_id, "done", at=time.time(), mode=mode, **usage)
+                    mask_ids = jobs.complete_job(s, job_id, final_payload)
+                    jobs.save_source_hashes(s, job_id, mask_ids)
+                    return mask_ids
+                with metrics.span("db_write"):
+                    mask_ids = run_transaction(db, finish)
+                save_timings(db, job_id, timings)
+                metrics.JOBS.labels(status="completed", mode=mode).inc()
+                scheduler.release(job_id)
+
+                # 4. Drop cached embeds so the next load picks up the new result
+                for mask_id in mask_ids:
+                    widget_cache.invalidate(mask_id)
+                    job_events.clear_preview(mask_id)
+                    job_events.publish(mask_id, "completed", job_id=str(job_id))
+
+            except Exception as e:
+                if self.request.retries < self.max_retries:
+                    db.rollback()
+                    raise self.retry(exc=e)
+                fail(db, job_id, str(e), partial["html"])
+                save_timings(db, job_id, timings)
+                metrics.JOBS.labels(status="failed", mode=mode).inc()
+    finally:
+        db.close()
+
+# --- 5. SCHEDULED REFRESH: regenerate only masks whose sources changed ---
+@celery_app.task(name="refresh_masks")
+def refresh_masks():
+    """Beat entry point: hands the masks that are due to refresh_mask, one task each."""
+    db = SessionLocal()
+    try:
+        def claim(s):
+            rows = jobs.masks_due_for_refresh(s, REFRESH_INTERVAL, REFRESH_BATCH)
+            for row in rows:
+                jobs.mark_refreshed(s, row.id)  # so the next sweep doesn't pick it up again
+            return [row.id for row in rows]
+        mask_ids = run_transaction(db, claim)
+    finally:
+        db.close()
+
+    for mask_id in mask_ids:
+        refresh_mask.delay(mask_id)
+    return len(mask_ids)
+
+@celery_app.task(name="refresh_mask")
+def refresh_mask(mask_id):
+    """
+    Re-fetches the mask's sources (conditional requests through the scrape cache) and
+    compares content hashes with the last completed run. Enqueues a job only on change.
+    """
+    db = SessionLocal()
+    try:
+        mask = db.execute(text("""
+            SELECT id, user_id, title, description, site_url, source_hashes, pipeline_mode
+            FROM masks WHERE id = :id
+        """), {"id": mask_id}).fetchone()
         db.commit()
+        if not mask:
+            return "missing"
+
+        urls = list(mask.site_url or [])
+        stored = mask.source_hashes or {}
+        fetched = fetch_many(urls, lambda url: scrape_one(url, fresh_ttl=REFRESH_FRESH_TTL))
+
+        current = dict(stored)
+        for url, content in zip(urls, fetched):
+            # An unreachable source is not a change; keep its old hash
+            if not isinstance(content, Exception):
+                current[url] = content_hash(content)
+        current = {url: current[url] for url in urls if url in current}
+        changed = sorted(url for url in urls if url in current and current[url] != stored.get(url))
+
+        if not stored:
+            # First check since this mask was generated: just record the baseline
+            run_transaction(db, lambda s: jobs.mark_refreshed(s, mask_id, current))
+            return "baseline"
+        if not changed and set(stored) <= set(urls):
+            return "unchanged"
+
+        # Committed before dispatch so the pipeline always finds its row
+        job_id, coalesced = run_transaction(db, lambda s: insert_refresh_job(s, mask, urls, changed))
+        if not coalesced:
+            task_id = scheduler.submit(mask.user_id, job_id, {
+                "job_id": job_id, "title": mask.title, "description": mask.description,
+                "urls": urls, "pipeline_mode": mask.pipeline_mode
+            }, priority="bulk")
+            run_transaction(db, lambda s: s.execute(
+                text("UPDATE ai_jobs SET task_id = :tid WHERE id = :jid"), {"tid": task_id, "jid": job_id}
+            ))
+        job_events.publish(mask_id, "queued", job_id=str(job_id))
+        return "changed"
+    finally:
+        db.close()
+
+def insert_refresh_job(db, mask, urls, changed_urls):
+    """
+    Same insert logic as PUT /describing/update, minus result reuse (identical inputs are
+    exactly what a refresh expects to produce a new result for). Returns (job_id, coalesced).
+    """
+    input_hash = jobs.job_fingerprint(mask.title, mask.description, urls, mask.pipeline_mode)
+    dedup_reason, match = jobs.find_duplicate(db, input_hash)
+
+    if dedup_reason == "coalesced":
+        job_id = jobs.insert_job(
+            db, mask.user_id, mask.id, input_hash,
+            task_id=match.task_id, dedup_of=match.id, dedup_reason="coalesced"
+        )
+        return job_id, True
+
+    job_id = jobs.insert_job(db, mask.user_id, mask.id, input_hash)
+    jobs.set_stage(db, job_id, "refresh", at=time.time(), changed=changed_urls)
+    return job_id, False
+
+@celery_app.task(name="pump_scheduler")
+def pump_scheduler():
+    """Beat safety net: releases queued jobs whose pump was missed (lock contention, crashed worker)."""
+    return scheduler.pump()
+
+# --- 6. RETENTION: archive old job history in small chunks ---
+@celery_app.task(name="prune_job_history")
+def prune_job_history():
+    db = SessionLocal()
+    try:
+        report = retention.prune(db)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+    metrics.JOBS_ARCHIVED.inc(report["archived"])
+    print(f"[retention] archived {report['archived']} jobs in {report['chunks']} chunks, "
+          f"{report['raw_bytes']} -> {report['archived_bytes']} bytes, {report['seconds']}s")
+    return report
@@ -0,0 +1,61 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+
+# --- BCRYPT POOL SETTINGS ---
+# Hashing runs in its own processes so ~250 ms of CPU per call never stalls the
+# event loop or a request thread. Past MAX_PENDING queued hashes we shed load with 429.
+HASH_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(HASH_WORKERS * 8)))
+RETRY_AFTER_SECONDS = int(os.getenv("BCRYPT_RETRY_AFTER", "2"))
+
+_pool = None
+_pending = 0  # only touched from the event loop thread
+
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+def _check(password, stored_hash):
+    # bcrypt.checkpw requires bytes, so we encode the input password and the stored hash
+    return bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: forking a threaded uvicorn process is not safe
+        _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many sign-ins in progress, please retry shortly",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password):
+    return await _submit(_hash, password)
+
+
+async def check_password(password, stored_hash):
+    return await _submit(_check, password, stored_hash)
+
+
+def queue_depth():
+    return _pending
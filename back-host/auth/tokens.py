@@ -0,0 +1,59 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from fastapi import Header
+
+# Signed, stateless session tokens: base64(payload).base64(hmac-sha256).
+# SESSION_SECRET (same value on every API replica) is required; the API refuses to start
+# without it. AUTH_DEV_MODE=1 is for local development only: a random secret per process,
+# so sessions don't survive a restart.
+AUTH_DEV_MODE = os.getenv("AUTH_DEV_MODE", "0") == "1"
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+if not SESSION_SECRET:
+    if not AUTH_DEV_MODE:
+        raise RuntimeError("SESSION_SECRET is not set (AUTH_DEV_MODE=1 runs without one, for local development only)")
+    SESSION_SECRET = secrets.token_urlsafe(32)
+SESSION_SECRET = SESSION_SECRET.encode("utf-8")
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(data):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(body):
+    return hmac.new(SESSION_SECRET, body.encode("ascii"), hashlib.sha256).digest()
+
+
+def issue_token(user_id, username, ttl=SESSION_TTL):
+    payload = {"uid": str(user_id), "usr": username, "exp": int(time.time()) + ttl}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_b64(_sign(body))}"
+
+
+def verify_token(token):
+    """Returns the payload dict, or None if the token is malformed, forged or expired."""
+    try:
+        body, signature = token.split(".", 1)
+        if not hmac.compare_digest(_sign(body), _unb64(signature)):
+            return None
+        payload = json.loads(_unb64(body))
+    except Exception:
+        return None
+    return payload if payload.get("exp", 0) > time.time() else None
+
+
+def optional_session(authorization: str = Header(None)):
+    """FastAPI dependency: the verified payload from 'Authorization: Bearer <token>', else None."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    return verify_token(authorization[7:].strip())
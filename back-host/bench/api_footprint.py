@@ -0,0 +1,81 @@
+"""
+Startup time and memory of an API process, and a guard against heavy imports.
+
+    cd back-host && python -m bench.api_footprint --runs 5 --max-seconds 3 --max-rss-mb 150 --json api.json
+
+Imports main (what uvicorn does before serving) in a fresh interpreter --runs times
+and reports import time and peak RSS. Exits non-zero if any of the worker-only
+packages (CrewAI, Selenium, the LLM client stack) got imported, or if the medians
+exceed --max-seconds / --max-rss-mb, so it can run as a CI step. The --json file
+can be diffed with bench.compare.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Only Celery workers may load these
+WORKER_ONLY = ("crewai", "crewai_tools", "selenium", "litellm", "langchain", "openai", "ai_system.worker", "ai_system.crew")
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+prefixes = tuple(json.loads(sys.argv[1]))
+heavy = sorted({name.split(".")[0] if not name.startswith("ai_system") else name
+                for name in sys.modules if name.startswith(prefixes)})
+print(json.dumps({"seconds": elapsed, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "modules": len(sys.modules), "heavy": heavy}))
+"""
+
+
+def probe():
+    back_host = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(WORKER_ONLY)],
+        cwd=back_host, capture_output=True, text=True, check=True,
+        env={"AUTH_DEV_MODE": "1", **os.environ},  # auth.tokens refuses to import without a secret
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, help="fail if median import time is above this")
+    parser.add_argument("--max-rss-mb", type=float, help="fail if median peak RSS is above this")
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    samples = [probe() for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "import_seconds_median": round(statistics.median(s["seconds"] for s in samples), 3),
+        "import_seconds_max": round(max(s["seconds"] for s in samples), 3),
+        "rss_mb_median": round(statistics.median(s["rss_kb"] for s in samples) / 1024, 1),
+        "modules": samples[-1]["modules"],
+        "heavy_imports": samples[-1]["heavy"],
+    }
+    print(f"import main: {result['import_seconds_median']}s median ({result['import_seconds_max']}s max), "
+          f"peak RSS {result['rss_mb_median']} MB, {result['modules']} modules")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    problems = []
+    if result["heavy_imports"]:
+        problems.append(f"worker-only modules imported by the API: {', '.join(result['heavy_imports'])}")
+    if args.max_seconds and result["import_seconds_median"] > args.max_seconds:
+        problems.append(f"import time {result['import_seconds_median']}s > {args.max_seconds}s")
+    if args.max_rss_mb and result["rss_mb_median"] > args.max_rss_mb:
+        problems.append(f"peak RSS {result['rss_mb_median']} MB > {args.max_rss_mb} MB")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
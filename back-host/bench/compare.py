@@ -0,0 +1,47 @@
+"""
+Diff two benchmark result files.
+
+    cd back-host && python -m bench.compare before.json after.json
+
+Every numeric field is matched by its path (list items by their "path"/"name"
+key when present) and printed with the relative change.
+"""
+import json
+import sys
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = item.get("path") or item.get("name") if isinstance(item, dict) else None
+            yield from flatten(item, f"{prefix}[{label or index}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(before, after):
+    old, new = dict(flatten(before)), dict(flatten(after))
+    rows = []
+    for key in sorted(old.keys() | new.keys()):
+        a, b = old.get(key), new.get(key)
+        change = f"{(b - a) / a * 100:+.1f}%" if a not in (None, 0) and b is not None else ""
+        rows.append((key, a, b, change))
+    return rows
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as f:
+        before = json.load(f)
+    with open(sys.argv[2]) as f:
+        after = json.load(f)
+    for key, a, b, change in compare(before, after):
+        print(f"{key:<60} {str(a):>12} {str(b):>12} {change:>9}")
+
+
+if __name__ == "__main__":
+    main()
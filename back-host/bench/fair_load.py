@@ -0,0 +1,147 @@
+"""
+Synthetic multi-tenant load against the fair-share scheduler.
+
+    cd back-host && python -m bench.fair_load --redis redis://127.0.0.1:6379/15 \
+        --users 20 --bulk-user-jobs 400 --workers 8 --json fair.json
+    cd back-host && python -m bench.fair_load --redis redis://127.0.0.1:6379/15 --fifo --json fifo.json
+
+One "bulk" tenant queues --bulk-user-jobs regenerations at t=0 while --users other
+tenants submit interactive jobs at random intervals. Time is simulated (each job
+holds a worker for --service seconds), so a run takes seconds; the queueing state
+lives in the given Redis exactly as in production. Use a scratch database: the
+sched:* keys are wiped first. --fifo replays the same arrivals through one global
+queue (the old Celery behaviour) for comparison. Reports queue wait p50/p99 for the
+interactive tenants and the bulk tenant, plus how many submits were refused (429).
+"""
+import argparse
+import heapq
+import json
+import random
+from collections import deque
+
+import redis
+from fastapi import HTTPException
+
+from ai_system import scheduler
+from bench.http_load import percentile
+
+
+def arrivals(args):
+    rng = random.Random(args.seed)
+    events = [(0.0, "bulk", "bulk") for _ in range(args.bulk_user_jobs)]
+    for user in range(args.users):
+        t = rng.uniform(0, args.service)
+        for _ in range(args.jobs_per_user):
+            events.append((t, f"user{user}", "interactive"))
+            t += rng.expovariate(1 / args.think)
+    return sorted(events, key=lambda e: e[0])
+
+
+def simulate(args, events):
+    now = {"t": 0.0}
+    submitted, started, refused = {}, {}, {}
+    completions = []  # heap of (finish time, job_id)
+
+    def start(job_id):
+        started[job_id] = now["t"]
+        heapq.heappush(completions, (now["t"] + args.service, job_id))
+
+    if args.fifo:
+        queue, running = deque(), set()
+
+        def submit(user, job_id, priority):
+            if len(queue) >= scheduler.MAX_QUEUED:
+                raise HTTPException(status_code=429)
+            queue.append(job_id)
+
+        def release(job_id):
+            running.discard(job_id)
+
+        def pump():
+            while queue and len(running) < scheduler.GLOBAL_INFLIGHT:
+                job_id = queue.popleft()
+                running.add(job_id)
+                start(job_id)
+    else:
+        client = redis.Redis.from_url(args.redis)
+        for key in client.scan_iter(scheduler.PREFIX + "*"):
+            client.delete(key)
+        fair = scheduler.FairScheduler(client, dispatch=lambda item: start(item["job_id"]), clock=lambda: now["t"])
+
+        def submit(user, job_id, priority):
+            fair.admit()
+            fair.submit(user, job_id, {}, priority)
+
+        release, pump = fair.release, fair.pump
+
+    pending = deque(events)
+    next_id = 0
+    while pending or completions:
+        # Next event: an arrival or a worker finishing, whichever comes first
+        if completions and (not pending or completions[0][0] <= pending[0][0]):
+            now["t"], job_id = heapq.heappop(completions)
+            release(job_id)
+        else:
+            now["t"], user, priority = pending.popleft()
+            next_id += 1
+            try:
+                submit(user, next_id, priority)
+                submitted[next_id] = (user, now["t"])
+            except HTTPException:
+                refused[user] = refused.get(user, 0) + 1
+        pump()
+
+    waits = {"interactive": [], "bulk": []}
+    for job_id, (user, at) in submitted.items():
+        waits["bulk" if user == "bulk" else "interactive"].append(started[job_id] - at)
+    groups = [
+        {
+            "name": name,
+            "jobs": len(samples),
+            "wait_p50_s": round(percentile(samples, 50) or 0, 2),
+            "wait_p99_s": round(percentile(samples, 99) or 0, 2),
+            "wait_max_s": round(max(samples, default=0), 2),
+        }
+        for name, samples in waits.items()
+    ]
+    return {
+        "mode": "fifo" if args.fifo else "fair",
+        "makespan_s": round(now["t"], 1),
+        "refused": sum(refused.values()),
+        "refused_by_user": refused,
+        "groups": groups,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis", default="redis://127.0.0.1:6379/15")
+    parser.add_argument("--users", type=int, default=20, help="interactive tenants")
+    parser.add_argument("--jobs-per-user", type=int, default=5)
+    parser.add_argument("--bulk-user-jobs", type=int, default=400)
+    parser.add_argument("--think", type=float, default=60.0, help="mean seconds between one user's submits")
+    parser.add_argument("--service", type=float, default=45.0, help="seconds one job holds a worker")
+    parser.add_argument("--workers", type=int, default=scheduler.GLOBAL_INFLIGHT)
+    parser.add_argument("--user-inflight", type=int, default=scheduler.USER_INFLIGHT)
+    parser.add_argument("--max-queued", type=int, default=scheduler.MAX_QUEUED)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fifo", action="store_true", help="single global queue instead of fair-share")
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    scheduler.GLOBAL_INFLIGHT = args.workers
+    scheduler.USER_INFLIGHT = args.user_inflight
+    scheduler.MAX_QUEUED = args.max_queued
+
+    result = simulate(args, arrivals(args))
+    print(f"{result['mode']}: makespan {result['makespan_s']}s, refused {result['refused']}")
+    for group in result["groups"]:
+        print(f"  {group['name']:<12} jobs={group['jobs']:<5} wait p50={group['wait_p50_s']}s "
+              f"p99={group['wait_p99_s']}s max={group['wait_max_s']}s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Stand-in for an Ollama server, for benchmarks that shouldn't need a GPU.
+
+    cd back-host && python -m bench.fake_ollama --port 11500 --tokens-per-sec 40 --output-tokens 400
+    cd back-host && python -m bench.fake_ollama --max-resident 1 --load-seconds 8   # one GPU, swapping
+
+Serves /api/tags, /api/ps, /api/chat and /api/generate (streaming and not). Output
+is generated at --tokens-per-sec after a prompt-processing delay of
+prompt_tokens / --prompt-tokens-per-sec, and reports prompt_eval_count/eval_count
+like the real server. Coder models answer with a ```html block, others with notes.
+
+With --max-resident, at most that many models are loaded at once: a request for
+another model waits (holding up later requests) for an idle resident one to be
+evicted, then pays --load-seconds.
+keep_alive is honoured (0 unloads, as in an empty generate), /api/ps lists what is
+loaded and GET /stats reports loads/evictions.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["llama3:latest", "deepseek-coder-v2:16b"]
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def parse_keep_alive(value, default):
+    """Ollama keep_alive ('5m', '30s', '1h', seconds, negative = forever) -> seconds."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = re.fullmatch(r"\s*(-?[\d.]+)\s*([smh]?)\s*", str(value))
+        if not match:
+            return default
+        seconds = float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def fake_tokens(model, count):
+    """Token-sized chunks of a plausible answer for model."""
+    if "coder" in model:
+        head = ["```html\n", "<!DOCTYPE html>\n", "<html><head><style>", "body{font-family:sans-serif}",
+                "</style></head><body>\n", "<ul>\n"]
+        tail = ["</ul>\n", "</body></html>\n", "```"]
+        body_count = max(0, count - len(head) - len(tail))
+        return head + [f"<li>item {i}</li>\n" for i in range(body_count)] + tail
+    return [f"- point {i} " for i in range(count)]
+
+
+class FakeOllama:
+    def __init__(self, tokens_per_sec=40.0, prompt_tokens_per_sec=2000.0, output_tokens=400, models=None,
+                 max_resident=None, load_seconds=0.0, keep_alive=300.0):
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.output_tokens = output_tokens
+        self.models = list(models or DEFAULT_MODELS)
+        self.max_resident = max_resident  # None: everything is always loaded
+        self.load_seconds = load_seconds
+        self.keep_alive = keep_alive
+        self.requests = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_time = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._resident = OrderedDict()  # model -> unload deadline, least recently used first
+        self._active = {}
+        self._loading = False
+        self._line = deque()
+        self._tickets = 0
+
+    def resident(self):
+        if self.max_resident is None:
+            return list(self.models)
+        with self._cond:
+            self._expire()
+            return list(self._resident)
+
+    def stats(self):
+        return {"requests": self.requests, "loads": self.loads, "evictions": self.evictions,
+                "load_seconds": round(self.load_time, 2), "resident": self.resident()}
+
+    def _expire(self):
+        now = time.monotonic()
+        for model in [m for m, until in self._resident.items() if until <= now and not self._active.get(m)]:
+            del self._resident[model]
+
+    def acquire(self, model, keep_alive=None):
+        """
+        Makes model resident (evicting/loading as needed) and marks it busy; returns load seconds.
+        Requests are admitted in arrival order, like Ollama's scheduler: one waiting for a
+        swap holds up everything behind it, even requests for the loaded model.
+        """
+        if self.max_resident is None:
+            return 0.0
+        with self._cond:
+            ticket = self._tickets
+            self._tickets += 1
+            self._line.append(ticket)
+            while True:
+                self._expire()
+                if self._line[0] != ticket or self._loading:
+                    self._cond.wait(0.1)
+                elif model in self._resident:
+                    self._resident.move_to_end(model)
+                    self._active[model] = self._active.get(model, 0) + 1
+                    self._line.popleft()
+                    self._cond.notify_all()
+                    return 0.0
+                elif len(self._resident) >= self.max_resident:
+                    # Only an idle model can be evicted, oldest first
+                    victim = next((m for m in self._resident if not self._active.get(m)), None)
+                    if victim is None:
+                        self._cond.wait(0.1)
+                    else:
+                        del self._resident[victim]
+                        self.evictions += 1
+                else:
+                    self._loading = True
+                    self._line.popleft()
+                    break
+        time.sleep(self.load_seconds)
+        with self._cond:
+            self._loading = False
+            self.loads += 1
+            self.load_time += self.load_seconds
+            self._resident[model] = time.monotonic() + parse_keep_alive(keep_alive, self.keep_alive)
+            self._active[model] = self._active.get(model, 0) + 1
+            self._cond.notify_all()
+        return self.load_seconds
+
+    def release(self, model, keep_alive=None):
+        if self.max_resident is None:
+            return
+        with self._cond:
+            self._active[model] -= 1
+            if model in self._resident:
+                self._resident[model] = time.monotonic() + parse_keep_alive(keep_alive, self.keep_alive)
+            self._cond.notify_all()
+
+    def unload(self, model):
+        with self._cond:
+            if self._resident.pop(model, None) is not None:
+                self.evictions += 1
+            self._cond.notify_all()
+
+    def generate(self, model, prompt_text, keep_alive=None):
+        """Yields (piece, done_stats or None); sleeps to simulate loading, prefill and decode."""
+        with self._lock:
+            self.requests += 1
+        loaded = self.acquire(model, keep_alive)
+        try:
+            prompt_tokens = estimate_tokens(prompt_text)
+            time.sleep(prompt_tokens / self.prompt_tokens_per_sec)
+            pieces = fake_tokens(model, self.output_tokens)
+            start = time.perf_counter()
+            for index, piece in enumerate(pieces):
+                # Pace against the wall clock so slow clients don't slow the model down
+                delay = start + (index + 1) / self.tokens_per_sec - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                yield piece, None
+            yield "", {"prompt_eval_count": prompt_tokens, "eval_count": len(pieces),
+                       "eval_duration": int((time.perf_counter() - start) * 1e9),
+                       "load_duration": int(loaded * 1e9)}
+        finally:
+            self.release(model, keep_alive)
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, body, status=200):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json({"models": [{"name": m, "model": m} for m in fake.models]})
+            elif self.path == "/api/ps":
+                self._json({"models": [{"name": m, "model": m} for m in fake.resident()]})
+            elif self.path == "/stats":
+                self._json(fake.stats())
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path not in ("/api/chat", "/api/generate"):
+                return self._json({"error": "not found"}, 404)
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            model = request.get("model", "")
+            chat = self.path == "/api/chat"
+            prompt = (" ".join(m.get("content", "") for m in request.get("messages", []))
+                      if chat else request.get("prompt", ""))
+            keep_alive = request.get("keep_alive")
+
+            if not prompt and not request.get("messages") and parse_keep_alive(keep_alive, 1) == 0:
+                fake.unload(model)
+                return self._json({"model": model, "response": "", "done": True, "done_reason": "unload"})
+
+            def frame(piece, stats):
+                body = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": stats is not None}
+                if chat:
+                    body["message"] = {"role": "assistant", "content": piece}
+                else:
+                    body["response"] = piece
+                body.update(stats or {})
+                return body
+
+            if not request.get("stream", True):
+                text, final = "", None
+                for piece, stats in fake.generate(model, prompt, keep_alive):
+                    text += piece
+                    final = stats or final
+                return self._json(frame(text, final))
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for piece, stats in fake.generate(model, prompt, keep_alive):
+                    line = (json.dumps(frame(piece, stats)) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client stopped reading (e.g. after the closing fence)
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients hanging up mid-stream is normal here
+
+
+def serve(port=11500, host="127.0.0.1", **settings):
+    """Starts the server on a daemon thread; returns (server, fake)."""
+    fake = FakeOllama(**settings)
+    server = QuietServer((host, port), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-sec", type=float, default=40)
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=2000)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--max-resident", type=int, help="models loaded at once (default: unlimited)")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="time to load a model that isn't resident")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="default seconds a model stays loaded when idle")
+    args = parser.parse_args()
+
+    server, _ = serve(args.port, args.host, tokens_per_sec=args.tokens_per_sec,
+                      prompt_tokens_per_sec=args.prompt_tokens_per_sec, output_tokens=args.output_tokens,
+                      max_resident=args.max_resident, load_seconds=args.load_seconds, keep_alive=args.keep_alive)
+    print(f"fake ollama on http://{args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Closed-loop HTTP load generator for the read endpoints.
+
+    cd back-host && python -m bench.http_load --base http://127.0.0.1:8000 \
+        --path /embed/1 --path /jobs/by-mask/1 --path /masks/ \
+        --concurrency 64 --duration 20 --json before.json
+
+Prints requests/sec and p50/p99 latency per path; --json writes the same numbers
+so two runs (e.g. before/after a change) can be compared with bench.compare.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _worker(client, path, deadline, latencies, errors, headers):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def load_path(base, path, concurrency, duration, headers=None):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors = [], []
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[
+            _worker(client, path, deadline, latencies, errors, headers or {})
+            for _ in range(concurrency)
+        ])
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else None,
+    }
+
+
+async def run(base, paths, concurrency, duration, headers=None):
+    results = []
+    for path in paths:
+        results.append(await load_path(base, path, concurrency, duration, headers))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.base, args.path, args.concurrency, args.duration))
+    for r in results:
+        print(f"{r['path']:<30} {r['rps']:>9} req/s  p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"http": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
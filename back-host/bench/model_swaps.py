@@ -0,0 +1,109 @@
+"""
+Model swaps with and without phase batching, against a fake single-GPU Ollama.
+
+    cd back-host && python -m bench.model_swaps --redis redis://127.0.0.1:6379/15 \
+        --jobs 16 --interval 3 --load-seconds 4 --json swaps.json
+
+Starts bench.fake_ollama with room for one resident model and --load-seconds per
+load, then runs --jobs fast-pipeline jobs (llama3 summary, then deepseek HTML),
+arriving every --interval seconds and at most --concurrency at a time, through the
+Ollama router: once without model phases and once with them (phase state in the
+given Redis; use a scratch database). Reports wall time, jobs/hour, model loads and
+job latency per run. The --json file can be diffed with bench.compare.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import redis
+
+from ai_system.fast_pipeline import run_fast_process
+from ai_system.model_phase import ModelPhases, unload_model
+from ai_system.ollama_router import Backend, OllamaRouter
+from bench.fake_ollama import serve
+from bench.http_load import percentile
+
+
+def run(args, phased, client):
+    server, fake = serve(0, max_resident=1, load_seconds=args.load_seconds, tokens_per_sec=args.tokens_per_sec,
+                         output_tokens=args.output_tokens)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    phases = ModelPhases(client, unload=unload_model, max_seconds=args.phase_max_seconds) if phased else None
+    router = OllamaRouter([Backend(url, args.slots)], redis_client=client, phases=phases)
+
+    context = "\n".join(f"fact {i}: some scraped text about the topic" for i in range(args.context_lines))
+    pending = list(range(args.jobs))
+    lock = threading.Lock()
+    latencies = []
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index = pending.pop(0)
+            # Jobs arrive every --interval seconds; a free slot waits for the next one
+            arrival = begin + index * args.interval
+            time.sleep(max(0.0, arrival - time.perf_counter()))
+            start = time.perf_counter()
+            run_fast_process("Widget", "key facts", context, router=router)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    begin = start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    stats = fake.stats()
+    return {
+        "name": "phased" if phased else "unphased",
+        "jobs": args.jobs,
+        "wall_seconds": round(elapsed, 2),
+        "jobs_per_hour": round(args.jobs / elapsed * 3600, 1),
+        "model_loads": stats["loads"],
+        "evictions": stats["evictions"],
+        "load_seconds": stats["load_seconds"],
+        "loads_per_job": round(stats["loads"] / args.jobs, 2),
+        "latency_p50_s": round(percentile(latencies, 50), 2),
+        "latency_p99_s": round(percentile(latencies, 99), 2),
+        "latency_mean_s": round(statistics.fmean(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis", default="redis://127.0.0.1:6379/15")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs in flight (llm worker slots)")
+    parser.add_argument("--interval", type=float, default=3.0, help="seconds between job arrivals")
+    parser.add_argument("--slots", type=int, default=4, help="concurrent requests the Ollama box accepts")
+    parser.add_argument("--load-seconds", type=float, default=4.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--context-lines", type=int, default=200)
+    parser.add_argument("--phase-max-seconds", type=float, default=120.0)
+    parser.add_argument("--mode", choices=("both", "phased", "unphased"), default="both")
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    client = redis.Redis.from_url(args.redis)
+    modes = {"both": (False, True), "phased": (True,), "unphased": (False,)}[args.mode]
+    result = {"runs": [run(args, phased, client) for phased in modes]}
+    for r in result["runs"]:
+        print(f"{r['name']:<9} {r['wall_seconds']}s ({r['jobs_per_hour']} jobs/h), "
+              f"{r['model_loads']} loads ({r['loads_per_job']}/job, {r['load_seconds']}s loading), "
+              f"latency p50={r['latency_p50_s']}s p99={r['latency_p99_s']}s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
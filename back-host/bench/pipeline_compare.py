@@ -0,0 +1,72 @@
+"""
+Latency and token usage of the two generation pipelines on the same inputs.
+
+    cd back-host && python -m bench.pipeline_compare --title "Weather" \
+        --description "today's forecast" --url https://example.com --runs 3 --json pipelines.json
+
+Scrapes + extracts the urls once, then runs the CrewAI path and the fast path
+--runs times each on that context against the configured Ollama backends
+(OLLAMA_BACKENDS). Token counts come from crew.usage_metrics for CrewAI and from
+Ollama's prompt_eval_count/eval_count for the fast path. The --json file can be
+diffed with bench.compare.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from ai_system.crew import run_crewai_process
+from ai_system.scraping import scrape_context
+from ai_system.fast_pipeline import run_fast_process
+
+
+def measure(name, runs, generate):
+    latencies, usages = [], []
+    for _ in range(runs):
+        usage = {}
+        start = time.perf_counter()
+        generate(usage)
+        latencies.append(time.perf_counter() - start)
+        usages.append(usage)
+    mean = lambda key: round(statistics.fmean(u.get(key, 0) for u in usages), 1)
+    return {
+        "name": name,
+        "runs": runs,
+        "latency_mean_s": round(statistics.fmean(latencies), 2),
+        "latency_min_s": round(min(latencies), 2),
+        "latency_max_s": round(max(latencies), 2),
+        "llm_calls": mean("calls"),
+        "prompt_tokens": mean("prompt_tokens"),
+        "completion_tokens": mean("completion_tokens"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--title", required=True)
+    parser.add_argument("--description", required=True)
+    parser.add_argument("--url", action="append", default=[])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    context, stats = scrape_context(args.url, args.description)
+    results = [
+        measure("crew", args.runs, lambda usage: run_crewai_process(
+            args.title, args.description, args.url, scraped=context, usage=usage
+        )),
+        measure("fast", args.runs, lambda usage: run_fast_process(
+            args.title, args.description, context, usage=usage
+        )),
+    ]
+
+    for r in results:
+        print(f"{r['name']:<6} {r['latency_mean_s']:>8} s  calls {r['llm_calls']:>5}  "
+              f"prompt {r['prompt_tokens']:>8}  completion {r['completion_tokens']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"context_tokens": stats["tokens_out"], "pipeline": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
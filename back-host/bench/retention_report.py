@@ -0,0 +1,121 @@
+"""
+Table size and query latency of ai_jobs, before and after a retention pass.
+
+    cd back-host && python -m bench.retention_report --samples 200 --json before.json
+    cd back-host && python -m bench.retention_report --apply --min-age 0 --max-chunks 1000 --json after.json
+
+Measures row counts, stored result bytes (live table and archive) and the latency of
+the queries that read job history: serving a mask's current result, the dedup lookup,
+the refresh sweep and a per-mask history listing. --apply runs db.retention.prune
+between a before and an after measurement and reports both plus the prune report.
+Runs against DATABASE_URL; the two --json files can be diffed with bench.compare.
+"""
+import argparse
+import json
+import random
+import time
+
+from sqlalchemy import text
+
+from bench.http_load import percentile
+from db import jobs, retention
+from db.database import SessionLocal
+
+
+def table_stats(db):
+    by_status = db.execute(text("""
+        SELECT status, count(*) AS n, COALESCE(sum(length(result::STRING)), 0) AS result_bytes
+        FROM ai_jobs GROUP BY status
+    """)).fetchall()
+    archive = db.execute(text("""
+        SELECT count(*) AS n, COALESCE(sum(length(row_gz)), 0) AS bytes FROM ai_jobs_archive
+    """)).fetchone()
+    db.commit()
+    return {
+        "rows": sum(row.n for row in by_status),
+        "result_bytes": sum(row.result_bytes for row in by_status),
+        "rows_by_status": {row.status: row.n for row in by_status},
+        "archive_rows": archive.n,
+        "archive_bytes": archive.bytes,
+    }
+
+
+def time_queries(db, samples, seed):
+    rng = random.Random(seed)
+    mask_ids = [row.id for row in db.execute(text("SELECT id FROM masks WHERE current_job_id IS NOT NULL LIMIT 1000"))]
+    hashes = [row.input_hash for row in db.execute(text(
+        "SELECT DISTINCT input_hash FROM ai_jobs WHERE input_hash IS NOT NULL LIMIT 1000"
+    ))]
+    db.commit()
+    if not mask_ids:
+        return []
+
+    queries = {
+        "serve_current": lambda: db.execute(text("""
+            SELECT j.result FROM masks m JOIN ai_jobs j ON j.id = m.current_job_id
+            WHERE m.id = :id AND j.status = 'completed'
+        """), {"id": rng.choice(mask_ids)}).fetchone(),
+        "find_duplicate": lambda: jobs.find_duplicate(db, rng.choice(hashes or ["0" * 64])),
+        "refresh_due": lambda: jobs.masks_due_for_refresh(db, 0, 200),
+        "mask_history": lambda: db.execute(text("""
+            SELECT id, status, updated_at FROM ai_jobs WHERE mask_id = :id ORDER BY updated_at DESC LIMIT 20
+        """), {"id": rng.choice(mask_ids)}).fetchall(),
+    }
+    results = []
+    for name, query in queries.items():
+        latencies = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            query()
+            db.commit()
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.append({
+            "name": name,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        })
+    return results
+
+
+def measure(db, args):
+    return {"table": table_stats(db), "queries": time_queries(db, args.samples, args.seed)}
+
+
+def show(label, snapshot):
+    table = snapshot["table"]
+    print(f"{label}: {table['rows']} jobs, {table['result_bytes']} result bytes, "
+          f"archive {table['archive_rows']} rows / {table['archive_bytes']} bytes")
+    for query in snapshot["queries"]:
+        print(f"  {query['name']:<16} p50={query['p50_ms']}ms p99={query['p99_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--apply", action="store_true", help="run a retention pass between two measurements")
+    parser.add_argument("--keep", type=int, default=retention.RETENTION_KEEP)
+    parser.add_argument("--min-age", type=int, default=retention.RETENTION_MIN_AGE)
+    parser.add_argument("--max-chunks", type=int, default=retention.RETENTION_MAX_CHUNKS)
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = {"before": measure(db, args)}
+        show("before", result["before"])
+        if args.apply:
+            result["prune"] = retention.prune(db, keep=args.keep, min_age=args.min_age, max_chunks=args.max_chunks)
+            print(f"pruned: {result['prune']}")
+            result["after"] = measure(db, args)
+            show("after", result["after"])
+    finally:
+        db.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+End-to-end benchmark: pipeline stage latency, jobs/hour and read-endpoint throughput
+against local stand-ins for Ollama (bench.fake_ollama), the web (bench.site_farm)
+and the database (any CockroachDB/Postgres reachable through DATABASE_URL).
+
+    # a throwaway store, e.g.
+    #   cockroach start-single-node --insecure --listen-addr=127.0.0.1:26257 --store=type=mem,size=1GiB
+    #   cockroach sql --insecure -e "CREATE DATABASE bench"
+    cd back-host && DATABASE_URL=cockroachdb://root@127.0.0.1:26257/bench?sslmode=disable \
+        python -m bench.run_bench --init-db --masks 20 --workers 2 --json run.json
+
+    cd back-host && python -m bench.compare before.json run.json
+
+Jobs run in-process (Celery eager mode, --workers threads), so the numbers cover the
+worker code itself rather than broker latency. The read endpoints are measured against
+--api, or a uvicorn started here with --serve-api. Everything lands in one JSON file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BACK_HOST = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "p50_s": round(pick(50), 3),
+        "p99_s": round(pick(99), 3),
+        "mean_s": round(statistics.fmean(ordered), 3),
+    }
+
+
+def configure_env(args):
+    """Points the app at the stand-ins; must run before any app module is imported."""
+    os.environ["OLLAMA_BACKENDS"] = args.ollama or f"http://127.0.0.1:{args.ollama_port}|{args.ollama_concurrency}"
+    os.environ.setdefault("CACHE_BACKEND", "local")
+    os.environ.setdefault("AUTH_DEV_MODE", "1")  # auth.tokens refuses to import without a secret
+    os.environ["PIPELINE_MODE"] = args.mode
+    if args.no_stream:
+        os.environ["STREAM_GENERATION"] = "0"
+
+
+def init_db():
+    from sqlalchemy import text
+    from db.database import engine
+    from db.migrate import migrate, split_statements
+
+    with open(os.path.join(BACK_HOST, "sql", "init.sql")) as f:
+        statements = split_statements(f.read())
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        exists = conn.execute(text("SELECT 1 FROM information_schema.tables WHERE table_name = 'masks'")).fetchone()
+        if not exists:
+            for stmt in statements:
+                conn.execute(text(stmt))
+    migrate()
+
+
+def seed(db, site_base, masks, urls_per_mask, js_every, pages):
+    """One bench user plus masks whose site_url point at the site farm. Returns (user_id, mask_ids)."""
+    from sqlalchemy import text
+
+    tag = str(int(time.time()))
+    user_id = db.execute(text("""
+        INSERT INTO users (username, email, password_hash) VALUES (:u, :e, 'x') RETURNING id
+    """), {"u": f"bench_{tag}", "e": f"bench_{tag}@example.com"}).fetchone().id
+
+    mask_ids = []
+    for i in range(masks):
+        urls = []
+        for k in range(urls_per_mask):
+            n = (i * urls_per_mask + k) % pages
+            kind = "js" if js_every and (i * urls_per_mask + k) % js_every == js_every - 1 else "static"
+            urls.append(f"{site_base}/{kind}/{n}")
+        mask_ids.append(db.execute(text("""
+            INSERT INTO masks (user_id, mask_name, title, description, site_url)
+            VALUES (:uid, :name, :title, :desc, :urls) RETURNING id
+        """), {
+            "uid": user_id, "name": f"bench {tag} {i}", "title": f"Bench widget {tag} {i}",
+            "desc": "quarterly revenue and growth by region", "urls": urls,
+        }).fetchone().id)
+    db.commit()
+    return user_id, mask_ids
+
+
+def run_jobs(mask_ids, workers, mode):
+    """Runs one job per mask through the real Celery tasks (eager), --workers at a time."""
+    from sqlalchemy import text
+    from celery_config import celery_app
+    from db.database import SessionLocal
+    from db import jobs
+    from ai_system.worker import run_mask_processing
+
+    celery_app.conf.task_always_eager = True
+    pending = list(mask_ids)
+    lock = threading.Lock()
+    job_ids = []
+
+    def worker():
+        db = SessionLocal()
+        try:
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    mask_id = pending.pop(0)
+                mask = db.execute(text("SELECT id, user_id, title, description, site_url FROM masks WHERE id = :id"),
+                                  {"id": mask_id}).fetchone()
+                urls = list(mask.site_url or [])
+                job_id = jobs.insert_job(db, mask.user_id, mask.id, jobs.job_fingerprint(mask.title, mask.description, urls, mode))
+                db.commit()
+                with lock:
+                    job_ids.append(job_id)
+                run_mask_processing(job_id, mask.title, mask.description, urls, pipeline_mode=mode)
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return job_ids, time.perf_counter() - start
+
+
+def stage_report(job_ids, elapsed, workers):
+    """Per-stage durations from the timestamps each stage records in ai_jobs.stage_state."""
+    from sqlalchemy import text
+    from db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("SELECT id, status, stage_state FROM ai_jobs WHERE id = ANY(:ids)"),
+                          {"ids": job_ids}).fetchall()
+    finally:
+        db.close()
+
+    spans = {"scrape_extract": [], "handoff": [], "generate": [], "total": []}
+    tokens = []
+    for row in rows:
+        state = row.stage_state if isinstance(row.stage_state, dict) else json.loads(row.stage_state or "{}")
+        at = {stage: info.get("at") for stage, info in state.items() if isinstance(info, dict)}
+        if row.status != "completed" or not all(at.get(s) for s in ("scrape", "extract", "generate", "done")):
+            continue
+        spans["scrape_extract"].append(at["extract"] - at["scrape"])
+        spans["handoff"].append(at["generate"] - at["extract"])
+        spans["generate"].append(at["done"] - at["generate"])
+        spans["total"].append(at["done"] - at["scrape"])
+        tokens.append(state["extract"].get("tokens_out", 0))
+
+    completed = len(spans["total"])
+    return {
+        "stages": {name: percentiles(samples) for name, samples in spans.items()},
+        "jobs": {
+            "submitted": len(job_ids),
+            "completed": completed,
+            "failed": sum(1 for row in rows if row.status == "failed"),
+            "elapsed_s": round(elapsed, 2),
+            "jobs_per_hour_per_worker": round(completed / (elapsed / 3600) / workers, 1) if elapsed else 0,
+            "context_tokens_mean": round(statistics.fmean(tokens), 1) if tokens else 0,
+        },
+    }
+
+
+def start_api(port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACK_HOST, env=os.environ.copy(),
+    )
+    import httpx
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not start")
+
+
+def http_report(base, user_id, mask_ids, concurrency, duration):
+    import asyncio
+    from bench.http_load import run
+
+    mask_id = mask_ids[0]
+    paths = {
+        f"/embed/{mask_id}": "/embed/{id}",
+        f"/jobs/by-mask/{mask_id}": "/jobs/by-mask/{id}",
+        f"/masks/?user_id={user_id}": "/masks/?user_id={id}",
+    }
+    results = asyncio.run(run(base, list(paths), concurrency, duration))
+    for r in results:
+        r["path"] = paths[r["path"]]  # ids differ between runs; compare by route
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--init-db", action="store_true", help="create the schema (sql/init.sql + migrations)")
+    parser.add_argument("--masks", type=int, default=10)
+    parser.add_argument("--urls-per-mask", type=int, default=3)
+    parser.add_argument("--js-every", type=int, default=0, help="every Nth url is a JS-rendered page (needs Chrome)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mode", choices=["crew", "fast"], default="fast")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--ollama", help="use these OLLAMA_BACKENDS instead of the fake server")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--ollama-concurrency", type=int, default=4)
+    parser.add_argument("--tokens-per-sec", type=float, default=40)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--site-port", type=int, default=8600)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--site-latency-ms", type=float, default=50)
+    parser.add_argument("--api", help="base url of a running API for the read benchmark")
+    parser.add_argument("--serve-api", type=int, metavar="PORT", help="start uvicorn on PORT for the read benchmark")
+    parser.add_argument("--http-concurrency", type=int, default=32)
+    parser.add_argument("--http-duration", type=float, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    configure_env(args)
+    from bench import fake_ollama, site_farm
+    from db.database import SessionLocal
+
+    if not args.ollama:
+        fake_ollama.serve(args.ollama_port, tokens_per_sec=args.tokens_per_sec, output_tokens=args.output_tokens)
+    site_farm.serve(args.site_port, pages=args.pages, latency_ms=args.site_latency_ms)
+
+    if args.init_db:
+        init_db()
+
+    db = SessionLocal()
+    try:
+        user_id, mask_ids = seed(db, f"http://127.0.0.1:{args.site_port}", args.masks,
+                                 args.urls_per_mask, args.js_every, args.pages)
+    finally:
+        db.close()
+
+    job_ids, elapsed = run_jobs(mask_ids, args.workers, args.mode)
+    report = stage_report(job_ids, elapsed, args.workers)
+
+    api_process = start_api(args.serve_api) if args.serve_api else None
+    try:
+        base = args.api or (f"http://127.0.0.1:{args.serve_api}" if api_process else None)
+        report["http"] = http_report(base, user_id, mask_ids, args.http_concurrency, args.http_duration) if base else []
+    finally:
+        if api_process:
+            api_process.terminate()
+
+    report["config"] = {
+        "mode": args.mode, "masks": args.masks, "urls_per_mask": args.urls_per_mask,
+        "workers": args.workers, "tokens_per_sec": args.tokens_per_sec, "output_tokens": args.output_tokens,
+        "site_latency_ms": args.site_latency_ms, "stream": not args.no_stream,
+    }
+
+    for name, s in report["stages"].items():
+        print(f"{name:<16} p50 {s.get('p50_s')} s  p99 {s.get('p99_s')} s  (n={s['count']})")
+    print(f"jobs/hour/worker {report['jobs']['jobs_per_hour_per_worker']}  "
+          f"completed {report['jobs']['completed']}/{report['jobs']['submitted']}")
+    for r in report["http"]:
+        print(f"{r['path']:<30} {r['rps']:>9} req/s  p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Local pages for the scraper to hit during benchmarks.
+
+    cd back-host && python -m bench.site_farm --port 8600 --pages 50
+
+    /static/<n>  article page with nav/footer boilerplate; honours If-None-Match (304)
+    /js/<n>      near-empty shell filled in by JavaScript (forces the browser path)
+
+--churn makes that fraction of pages change content every --churn-seconds, to
+exercise refresh and revalidation. --latency-ms adds a fixed server delay.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARAGRAPH = (
+    "Section {n}.{i}: the quarterly figures for product line {n} show steady growth in "
+    "the {region} region, with revenue of {value} units and {pct}% month over month change."
+)
+REGIONS = ["north", "south", "east", "west"]
+
+
+class SiteFarm:
+    def __init__(self, pages=50, churn=0.0, churn_seconds=60.0, latency_ms=0.0):
+        self.pages = pages
+        self.churn = churn
+        self.churn_seconds = churn_seconds
+        self.latency_ms = latency_ms
+        self.started = time.time()
+
+    def version(self, n):
+        # The first churn * pages pages move to a new version every churn_seconds
+        if n < int(self.pages * self.churn):
+            return int((time.time() - self.started) // self.churn_seconds)
+        return 0
+
+    def article(self, n):
+        v = self.version(n)
+        paragraphs = "\n".join(
+            f"<p>{PARAGRAPH.format(n=n, i=i, region=REGIONS[(n + i) % 4], value=100 * n + i + v, pct=(i * 7 + v) % 30)}</p>"
+            for i in range(12)
+        )
+        return f"""<!DOCTYPE html>
+<html><head><title>Page {n}</title><style>body{{font-family:sans-serif}}</style></head>
+<body>
+<header class="site-header"><nav class="navbar"><a href="/">Home</a> <a href="/about">About</a></nav></header>
+<main><article><h1>Report {n}</h1>
+{paragraphs}
+<table><tr><th>Metric</th><th>Value</th></tr><tr><td>Users</td><td>{1000 + n + v}</td></tr></table>
+</article></main>
+<aside class="sidebar"><ul><li>Related 1</li><li>Related 2</li></ul></aside>
+<footer class="footer">Copyright Example Corp. Subscribe to our newsletter.</footer>
+<script>window.analytics = true;</script>
+</body></html>"""
+
+    def js_shell(self, n):
+        main = self.article(n).split("<main>")[1].split("</main>")[0]
+        return f"""<!DOCTYPE html>
+<html><head><title>App {n}</title></head>
+<body><div id="root">Loading...</div>
+<script>
+document.getElementById("root").innerHTML = {json.dumps(main)};
+</script></body></html>"""
+
+
+def make_handler(farm):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if farm.latency_ms:
+                time.sleep(farm.latency_ms / 1000)
+            kind, _, number = self.path.strip("/").partition("/")
+            if kind not in ("static", "js") or not number.isdigit() or int(number) >= farm.pages:
+                return self._send(404, b"not found")
+
+            n = int(number)
+            html = farm.article(n) if kind == "static" else farm.js_shell(n)
+            etag = '"' + hashlib.sha1(html.encode("utf-8")).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", etag)
+            self._send(200, html.encode("utf-8"), etag)
+
+        def _send(self, status, body, etag=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def serve(port=8600, host="127.0.0.1", **settings):
+    """Starts the farm on a daemon thread; returns (server, farm)."""
+    farm = SiteFarm(**settings)
+    server = ThreadingHTTPServer((host, port), make_handler(farm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, farm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--churn", type=float, default=0.0)
+    parser.add_argument("--churn-seconds", type=float, default=60)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    server, _ = serve(args.port, args.host, pages=args.pages, churn=args.churn,
+                      churn_seconds=args.churn_seconds, latency_ms=args.latency_ms)
+    print(f"site farm on http://{args.host}:{args.port} ({args.pages} pages)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
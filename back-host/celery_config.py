@@ -1,8 +1,73 @@
+import os
 from celery import Celery
+from kombu import Queue
+from db.redis_client import REDIS_URL
+
+# --- SCHEDULED REFRESH ---
+# refresh_masks wakes every REFRESH_SWEEP_SECONDS and checks masks whose sources were
+# last checked more than REFRESH_INTERVAL seconds ago, at most REFRESH_BATCH per sweep.
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", "21600"))
+REFRESH_SWEEP_SECONDS = int(os.getenv("REFRESH_SWEEP_SECONDS", "300"))
+REFRESH_BATCH = int(os.getenv("REFRESH_BATCH", "200"))
+# A source another mask's check fetched this recently is taken from the scrape cache
+REFRESH_FRESH_TTL = int(os.getenv("REFRESH_FRESH_TTL", "300"))
+
+# Fair-share scheduler (ai_system/scheduler.py) is pumped on every job start/finish;
+# the beat pump only catches what those missed.
+SCHED_PUMP_SECONDS = int(os.getenv("SCHED_PUMP_SECONDS", "10"))
+
+# Job-history retention (db/retention.py holds the keep/age/chunk settings)
+RETENTION_SWEEP_SECONDS = int(os.getenv("RETENTION_SWEEP_SECONDS", "3600"))
 
 
 celery_app=Celery(
     "worker",
-    broker="redis://127.0.0.1:6379/0",
-    backend="redis://127.0.0.1:6379/0"
-)
\ No newline at end of file
+    broker=REDIS_URL,
+    backend=REDIS_URL,
+    include=["ai_system.worker"]  # task code is loaded by workers only; the API sends by name
+)
+
+# --- STAGED PIPELINE QUEUES ---
+# run_mask_processing fans out into: scrape_url (one per url) -> extract_context -> generate_widget.
+# Each stage has its own queue so scraper boxes and LLM boxes scale independently, e.g.
+#   celery -A celery_config worker -Q celery,extract -c 4  -n dispatch@%h
+#   celery -A celery_config worker -Q scrape         -c 16 -n scrape@%h
+#   celery -A celery_config worker -Q llm            -c 2  -n llm@%h
+#   celery -A celery_config beat                                        (one per deployment)
+celery_app.conf.update(
+    task_queues=[Queue("celery"), Queue("scrape"), Queue("extract"), Queue("llm")],
+    task_default_queue="celery",
+    task_routes={
+        "run_mask_processing": {"queue": "celery"},
+        "scrape_url": {"queue": "scrape"},
+        "extract_context": {"queue": "extract"},
+        "generate_widget": {"queue": "llm"},
+        "refresh_masks": {"queue": "celery"},
+        "refresh_mask": {"queue": "scrape"},
+        "pump_scheduler": {"queue": "celery"},
+        "prune_job_history": {"queue": "celery"},
+    },
+    beat_schedule={
+        "refresh-masks": {"task": "refresh_masks", "schedule": REFRESH_SWEEP_SECONDS},
+        "pump-scheduler": {"task": "pump_scheduler", "schedule": SCHED_PUMP_SECONDS},
+        "prune-job-history": {"task": "prune_job_history", "schedule": RETENTION_SWEEP_SECONDS},
+    },
+    # A stage is only acked once it finished, and workers take one long job at a time
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_annotations={
+        "scrape_url": {"time_limit": 180, "soft_time_limit": 150},
+        "extract_context": {"time_limit": 120, "soft_time_limit": 100},
+        "generate_widget": {"time_limit": 1800, "soft_time_limit": 1700},
+        "refresh_mask": {"time_limit": 300, "soft_time_limit": 270},
+        "prune_job_history": {"time_limit": 900, "soft_time_limit": 840},
+    },
+)
+
+# Retry policy per stage (passed to the task decorators in ai_system/worker.py)
+STAGE_RETRY = {
+    "scrape_url": {"max_retries": 2, "default_retry_delay": 5},
+    "extract_context": {"max_retries": 1, "default_retry_delay": 5},
+    "generate_widget": {"max_retries": 2, "default_retry_delay": 30},
+}
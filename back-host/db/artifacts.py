@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import importlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip/identity variants are published
+    brotli = None
+
+# --- WIDGET ARTIFACTS ---
+# Each completed widget is post-processed once and stored under the hash of its bytes,
+# with .gz/.br variants precomputed. Serving is then a key lookup plus a file read.
+# The API and the workers must see the same store: a shared volume for the default
+# FilesystemStore, or ARTIFACT_STORE="module:Class" for another blob store (put/get/exists).
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "db.artifacts:FilesystemStore")
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artifacts"))
+ARTIFACT_PUBLIC_URL = os.getenv("ARTIFACT_PUBLIC_URL")  # e.g. a CDN in front of ARTIFACT_DIR; enables redirects
+MEMORY_CACHE_SIZE = int(os.getenv("ARTIFACT_MEMORY_CACHE", "256"))
+
+# Served-as-is encodings, best first
+ENCODINGS = ("br", "gzip", "identity") if brotli else ("gzip", "identity")
+SUFFIX = {"identity": ".html", "gzip": ".html.gz", "br": ".html.br"}
+KEY_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_PRESERVE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.I | re.S)
+_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+_HEAD = re.compile(r"<head\b[^>]*>", re.I)
+_HTML = re.compile(r"<html\b[^>]*>", re.I)
+_DOCTYPE = re.compile(r"^\s*<!doctype\b[^>]*>", re.I)
+
+
+class FilesystemStore:
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def put(self, name, data):
+        path = self._path(name)
+        if os.path.exists(path):
+            return  # content-addressed: same name, same bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write + rename so a reader never sees half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        module, _, cls = ARTIFACT_STORE.partition(":")
+        _store = getattr(importlib.import_module(module), cls)()
+    return _store
+
+
+def _minify(html):
+    """Conservative: drops comments and collapses whitespace, except inside pre/textarea/script/style."""
+    parts = _PRESERVE.split(html)
+    out = []
+    # split() with two groups yields [text, whole_match, tag_name, text, ...]
+    for i in range(0, len(parts), 3):
+        text = _COMMENT.sub("", parts[i])
+        text = re.sub(r">\s+<", "> <", text)
+        out.append(re.sub(r"\s{2,}", " ", text))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+def postprocess(html):
+    # Links inside the iframe open in a new tab. Without a <head> the tag goes after <html>
+    # or the doctype: anything before <!DOCTYPE> would put the page in quirks mode.
+    for anchor in (_HEAD, _HTML, _DOCTYPE):
+        if anchor.search(html):
+            html = anchor.sub(lambda m: m.group(0) + "<base target='_blank'>", html, count=1)
+            break
+    else:
+        html = "<base target='_blank'>" + html
+    return _minify(html)
+
+
+def publish(html):
+    """Stores the processed widget and its compressed variants; returns the artifact key."""
+    body = postprocess(html).encode("utf-8")
+    key = hashlib.sha256(body).hexdigest()[:32]
+    store = get_store()
+    if not store.exists(key + SUFFIX["identity"]):
+        variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli:
+            variants["br"] = brotli.compress(body, quality=11)
+        for encoding, data in variants.items():
+            store.put(key + SUFFIX[encoding], data)
+        store.put(key + SUFFIX["identity"], body)  # written last: its presence means all variants exist
+    return key
+
+
+def exists(key):
+    return bool(key) and get_store().exists(key + SUFFIX["identity"])
+
+
+def negotiate(accept_encoding):
+    """Best precomputed encoding the client accepts (q=0 excluded)."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in ENCODINGS:
+        if encoding == "identity" or accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def read(key, encoding="identity"):
+    """Artifact bytes (None if missing); kept in memory since a key never changes content."""
+    name = key + SUFFIX[encoding]
+    with _memory_lock:
+        if name in _memory:
+            _memory.move_to_end(name)
+            return _memory[name]
+    data = get_store().get(name)
+    if data is not None:
+        with _memory_lock:
+            _memory[name] = data
+            while len(_memory) > MEMORY_CACHE_SIZE:
+                _memory.popitem(last=False)
+    return data
+
+
+def public_url(key, encoding="identity"):
+    return f"{ARTIFACT_PUBLIC_URL.rstrip('/')}/{key[:2]}/{key}{SUFFIX[encoding]}" if ARTIFACT_PUBLIC_URL else None
@@ -1,13 +1,97 @@
+import asyncio
+import os
+import random
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "cockroachdb://root@localhost:26257/defaultdb?sslmode=disable"
-engine = create_engine(DATABASE_URL)
+# --- CONNECTION SETTINGS (all overridable through env) ---
+DATABASE_URL = os.getenv("DATABASE_URL", "cockroachdb://root@localhost:26257/defaultdb?sslmode=disable")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "cockroachdb+asyncpg://root@localhost:26257/defaultdb")
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "10000"))  # API requests only
+RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "5"))
+
+POOL_ARGS = dict(
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_pre_ping=POOL_PRE_PING,
+    pool_recycle=POOL_RECYCLE,
+)
+
+# Sync engine: Celery worker, migrations and scripts. No statement timeout: retention
+# passes and bulk statements legitimately run longer than any request should.
+engine = create_engine(DATABASE_URL, **POOL_ARGS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sync engine for write routes: a stuck request gives up after STATEMENT_TIMEOUT_MS.
+# Pools connect lazily, so each process only opens connections on the engine it uses.
+api_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"},
+    **POOL_ARGS
+)
+ApiSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=api_engine)
+
+# Async engine: hot read routes, no threadpool slot held during the round-trip
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}},
+    **POOL_ARGS
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
-    db = SessionLocal()
+    db = ApiSessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def is_retryable(error):
+    """CockroachDB asks clients to retry serialization conflicts with SQLSTATE 40001."""
+    orig = getattr(error, "orig", None)
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return code == "40001" or "restart transaction" in str(error)
+
+def _backoff(attempt):
+    return min(1.0, 0.05 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+def run_transaction(db, fn, attempts=RETRY_ATTEMPTS):
+    """Runs fn(db) and commits, retrying the whole unit on CockroachDB retry errors."""
+    for attempt in range(attempts):
+        try:
+            result = fn(db)
+            db.commit()
+            return result
+        except DBAPIError as e:
+            db.rollback()
+            if not is_retryable(e) or attempt == attempts - 1:
+                raise
+            time.sleep(_backoff(attempt))
+
+async def run_async_transaction(db, fn, attempts=RETRY_ATTEMPTS):
+    """Async counterpart of run_transaction; fn is an async callable taking the session."""
+    for attempt in range(attempts):
+        try:
+            result = await fn(db)
+            await db.commit()
+            return result
+        except DBAPIError as e:
+            await db.rollback()
+            if not is_retryable(e) or attempt == attempts - 1:
+                raise
+            await asyncio.sleep(_backoff(attempt))
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+
+from db.redis_client import get_redis, get_async_redis
+
+# Per-mask channel the worker publishes job stage transitions to.
+# The last event is also kept under STATE_PREFIX so a late subscriber
+# learns the current stage without touching the database.
+CHANNEL_PREFIX = "mask:events:"
+STATE_PREFIX = "mask:state:"
+PREVIEW_PREFIX = "mask:preview:"
+STATE_TTL = 6 * 3600
+HEARTBEAT_SECONDS = 15
+
+
+def publish(mask_id, event, **data):
+    """event is one of queued / scraping / generating / preview / completed / failed."""
+    message = json.dumps({"event": event, "mask_id": str(mask_id), "ts": time.time(), **data})
+    try:
+        r = get_redis()
+        r.set(STATE_PREFIX + str(mask_id), message, ex=STATE_TTL)
+        r.publish(CHANNEL_PREFIX + str(mask_id), message)
+    except Exception:
+        pass  # progress is best-effort; the job itself must not fail on it
+
+
+def set_preview(mask_id, job_id, html):
+    """Partial HTML from a generation still in progress, plus a 'preview' nudge to listeners."""
+    try:
+        get_redis().set(PREVIEW_PREFIX + str(mask_id), json.dumps({"job_id": str(job_id), "html_code": html}), ex=STATE_TTL)
+    except Exception:
+        return
+    publish(mask_id, "preview", job_id=str(job_id), length=len(html))
+
+
+def get_preview(mask_id):
+    raw = get_redis().get(PREVIEW_PREFIX + str(mask_id))
+    return json.loads(raw) if raw else None
+
+
+def clear_preview(mask_id):
+    try:
+        get_redis().delete(PREVIEW_PREFIX + str(mask_id))
+    except Exception:
+        pass
+
+
+def _sse(message):
+    payload = json.loads(message)
+    return f"event: {payload['event']}\ndata: {message if isinstance(message, str) else message.decode()}\n\n"
+
+
+async def sse_stream(mask_id, request):
+    """Server-Sent Events for one mask: current state first, then every transition."""
+    client = get_async_redis()
+    if client is None:
+        yield "event: unavailable\ndata: {}\n\n"
+        return
+
+    pubsub = client.pubsub()
+    await pubsub.subscribe(CHANNEL_PREFIX + str(mask_id))
+    try:
+        # Read state after subscribing so a transition can't slip between the two
+        last = await client.get(STATE_PREFIX + str(mask_id))
+        if last:
+            yield _sse(last)
+
+        while not await request.is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": ping\n\n"
+                continue
+            yield _sse(message["data"])
+            if json.loads(message["data"])["event"] in ("completed", "failed"):
+                break
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+
+from sqlalchemy import text
+
+from ai_system.fast_pipeline import resolve_mode
+
+# --- DEDUP SETTINGS ---
+# A completed job is reused for identical inputs for DEDUP_REUSE_WINDOW seconds;
+# a pending one is only joined if it was created within DEDUP_INFLIGHT_WINDOW
+# (older pending rows are most likely orphaned by a dead worker).
+DEDUP_REUSE_WINDOW = int(os.getenv("DEDUP_REUSE_WINDOW", "86400"))
+DEDUP_INFLIGHT_WINDOW = int(os.getenv("DEDUP_INFLIGHT_WINDOW", "3600"))
+
+# Bump when prompts/models change so old results stop matching
+FINGERPRINT_VERSION = "2"
+
+
+def _norm(value):
+    return " ".join((value or "").split())
+
+
+def job_fingerprint(title, description, urls, pipeline_mode=None):
+    """Stable hash over everything that shapes a job's output (pipeline_mode as the mask stores it)."""
+    canonical = json.dumps({
+        "v": FINGERPRINT_VERSION,
+        "mode": resolve_mode(pipeline_mode),
+        "title": _norm(title),
+        "description": _norm(description),
+        "urls": [u.strip() for u in (urls or []) if u and u.strip()],
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def find_duplicate(db, input_hash):
+    """
+    Returns ('coalesced', row) for an identical in-flight job, ('reused', row)
+    for a recent identical completed job, else (None, None).
+    Only jobs that really ran (dedup_of IS NULL) are matched.
+    """
+    inflight = db.execute(text("""
+        SELECT id, task_id FROM ai_jobs
+        WHERE input_hash = :h AND status = 'pending' AND dedup_of IS NULL
+          AND created_at > NOW() - (:win * INTERVAL '1 second')
+        ORDER BY created_at DESC
+        LIMIT 1
+    """), {"h": input_hash, "win": DEDUP_INFLIGHT_WINDOW}).fetchone()
+    if inflight:
+        return "coalesced", inflight
+
+    completed = db.execute(text("""
+        SELECT id, task_id FROM ai_jobs
+        WHERE input_hash = :h AND status = 'completed' AND dedup_of IS NULL
+          AND updated_at > NOW() - (:win * INTERVAL '1 second')
+        ORDER BY updated_at DESC
+        LIMIT 1
+    """), {"h": input_hash, "win": DEDUP_REUSE_WINDOW}).fetchone()
+    if completed:
+        return "reused", completed
+
+    return None, None
+
+
+def insert_job(db, user_id, mask_id, input_hash, task_id="initializing", dedup_of=None, dedup_reason=None):
+    # Note: 'initializing' is a placeholder until the Celery task id is known
+    row = db.execute(text("""
+        INSERT INTO ai_jobs (user_id, mask_id, task_id, status, input_hash, dedup_of, dedup_reason)
+        VALUES (:uid, :mid, :tid, 'pending', :h, :src, :why)
+        RETURNING id
+    """), {
+        "uid": user_id, "mid": mask_id, "tid": task_id,
+        "h": input_hash, "src": dedup_of, "why": dedup_reason
+    }).fetchone()
+    return row.id
+
+
+def insert_reused_job(db, user_id, mask_id, source_id):
+    """Records a completed job that copies source_id's result instead of running a crew."""
+    row = db.execute(text("""
+        INSERT INTO ai_jobs (user_id, mask_id, task_id, status, result, input_hash, dedup_of, dedup_reason)
+        SELECT :uid, :mid, task_id, 'completed', result, input_hash, id, 'reused'
+        FROM ai_jobs WHERE id = :src
+        RETURNING id
+    """), {"uid": user_id, "mid": mask_id, "src": source_id}).fetchone()
+    set_current_job(db, mask_id, row.id)
+    return row.id
+
+
+def set_current_job(db, mask_id, job_id):
+    # Never move the pointer back to an older job
+    db.execute(text("""
+        UPDATE masks SET current_job_id = :jid
+        WHERE id = :mid AND (current_job_id IS NULL OR current_job_id < :jid)
+    """), {"jid": job_id, "mid": mask_id})
+
+
+def complete_job(db, job_id, payload):
+    """
+    Marks job_id and every request coalesced onto it completed, and points their
+    masks at them. Returns the affected mask ids. Caller commits.
+    """
+    rows = db.execute(text("""
+        UPDATE ai_jobs SET status = 'completed', result = :res, updated_at = NOW()
+        WHERE id = :jid OR (dedup_of = :jid AND status = 'pending')
+        RETURNING id, mask_id
+    """), {"res": payload, "jid": job_id}).fetchall()
+
+    for row in rows:
+        set_current_job(db, row.mask_id, row.id)
+    return {row.mask_id for row in rows}
+
+
+def fail_job(db, job_id, error, partial_payload=None):
+    """partial_payload keeps HTML streamed before the failure (readers only serve 'completed')."""
+    rows = db.execute(text("""
+        UPDATE ai_jobs SET status = 'failed', error_message = :err, result = COALESCE(:res, result), updated_at = NOW()
+        WHERE id = :jid OR (dedup_of = :jid AND status = 'pending')
+        RETURNING mask_id
+    """), {"err": error, "res": partial_payload, "jid": job_id}).fetchall()
+    return {row.mask_id for row in rows}
+
+
+def job_mask_ids(db, job_id):
+    """Masks waiting on job_id: its own plus any coalesced onto it."""
+    rows = db.execute(text("""
+        SELECT DISTINCT mask_id FROM ai_jobs
+        WHERE id = :jid OR (dedup_of = :jid AND status = 'pending')
+    """), {"jid": job_id}).fetchall()
+    return {row.mask_id for row in rows}
+
+
+def set_stage(db, job_id, stage, **info):
+    """Records the pipeline stage on the job row, merging info under stage_state[stage]."""
+    db.execute(text("""
+        UPDATE ai_jobs
+        SET stage = :stage,
+            stage_state = COALESCE(stage_state, '{}'::JSONB) || jsonb_build_object(:stage, CAST(:info AS JSONB)),
+            updated_at = NOW()
+        WHERE id = :jid
+    """), {"stage": stage, "info": json.dumps(info), "jid": job_id})
+
+
+def save_source_hashes(db, job_id, mask_ids):
+    """Copies the hashes extract_context recorded on job_id onto its masks (refresh baseline)."""
+    if not mask_ids:
+        return
+    db.execute(text("""
+        UPDATE masks SET
+            source_hashes = COALESCE(
+                (SELECT stage_state->'extract'->'source_hashes' FROM ai_jobs WHERE id = :jid),
+                source_hashes
+            ),
+            refreshed_at = NOW()
+        WHERE id = ANY(:mids)
+    """), {"jid": job_id, "mids": list(mask_ids)})
+
+
+def masks_due_for_refresh(db, older_than, limit):
+    """Masks with a served result, sources to watch, no job in flight and not checked for older_than seconds."""
+    return db.execute(text("""
+        SELECT m.id FROM masks m
+        WHERE m.current_job_id IS NOT NULL
+          AND cardinality(m.site_url) > 0
+          AND (m.refreshed_at IS NULL OR m.refreshed_at < NOW() - (:age * INTERVAL '1 second'))
+          AND NOT EXISTS (
+              SELECT 1 FROM ai_jobs j WHERE j.mask_id = m.id AND j.status = 'pending'
+          )
+        ORDER BY m.refreshed_at NULLS FIRST
+        LIMIT :lim
+    """), {"age": older_than, "lim": limit}).fetchall()
+
+
+def mark_refreshed(db, mask_id, source_hashes=None):
+    """Records a source check; source_hashes replaces the stored ones when given."""
+    db.execute(text("""
+        UPDATE masks SET refreshed_at = NOW(), source_hashes = COALESCE(CAST(:h AS JSONB), source_hashes)
+        WHERE id = :mid
+    """), {"h": json.dumps(source_hashes) if source_hashes is not None else None, "mid": mask_id})
+
+
+def add_timings(db, job_id, timings):
+    """Merges span durations (seconds) into ai_jobs.timings; a retried stage overwrites its own keys."""
+    if not timings:
+        return
+    db.execute(text("""
+        UPDATE ai_jobs SET timings = COALESCE(timings, '{}'::JSONB) || CAST(:t AS JSONB)
+        WHERE id = :jid
+    """), {"t": json.dumps(timings), "jid": job_id})
+
+
+def insert_batch_jobs(db, batch_id, masks, input_hashes):
+    """One INSERT for a whole batch; returns {mask_id: job_id}."""
+    rows = db.execute(text("""
+        INSERT INTO ai_jobs (user_id, mask_id, task_id, status, input_hash, batch_id)
+        SELECT u.uid, u.mid, 'initializing', 'pending', u.h, :b
+        FROM unnest(CAST(:uids AS INT[]), CAST(:mids AS INT[]), CAST(:hashes AS TEXT[])) AS u(uid, mid, h)
+        RETURNING id, mask_id
+    """), {
+        "b": batch_id,
+        "uids": [m.user_id for m in masks],
+        "mids": [m.id for m in masks],
+        "hashes": input_hashes,
+    }).fetchall()
+    return {row.mask_id: row.id for row in rows}
+
+
+def set_task_ids(db, job_ids, task_ids):
+    """Writes Celery task ids back for many jobs in one UPDATE."""
+    db.execute(text("""
+        UPDATE ai_jobs SET task_id = u.tid
+        FROM unnest(CAST(:jids AS INT[]), CAST(:tids AS TEXT[])) AS u(jid, tid)
+        WHERE ai_jobs.id = u.jid
+    """), {"jids": list(job_ids), "tids": list(task_ids)})
+
+
+def batch_progress(db, batch_id):
+    """(total, {status: count}) for a batch, or (None, {}) if it doesn't exist."""
+    batch = db.execute(text("SELECT total FROM job_batches WHERE id = :b"), {"b": batch_id}).fetchone()
+    if not batch:
+        return None, {}
+    rows = db.execute(text("""
+        SELECT status, count(*) AS n FROM ai_jobs WHERE batch_id = :b GROUP BY status
+    """), {"b": batch_id}).fetchall()
+    return batch.total, {row.status: row.n for row in rows}
@@ -0,0 +1,67 @@
+"""
+Tiny forward-only migration runner.
+
+    cd back-host && python -m db.migrate           # apply pending migrations
+    cd back-host && python -m db.migrate --status  # list applied / pending
+
+Migrations are the numbered .sql files in db/migrations, applied in name order on
+top of sql/init.sql. Each applied file is recorded in schema_migrations.
+"""
+import os
+import sys
+
+from sqlalchemy import text
+from db.database import engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def split_statements(sql):
+    # Our migrations never put ';' inside literals, so a plain split is enough
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def migration_files():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith(".sql"))
+
+
+def applied_versions(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(200) PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    return {row.version for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate():
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        done = applied_versions(conn)
+
+        for name in migration_files():
+            if name in done:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                statements = split_statements(f.read())
+
+            # CockroachDB runs schema changes best one statement at a time,
+            # so every statement is written to be safe to re-run.
+            for stmt in statements:
+                conn.execute(text(stmt))
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": name})
+            print(f"applied {name}")
+
+
+def status():
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+    for name in migration_files():
+        print(f"{'applied' if name in done else 'pending'}  {name}")
+
+
+if __name__ == "__main__":
+    status() if "--status" in sys.argv else migrate()
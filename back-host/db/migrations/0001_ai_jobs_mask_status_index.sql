@@ -0,0 +1,3 @@
+-- Latest-result lookups filter on (mask_id, status) and sort by updated_at
+CREATE INDEX IF NOT EXISTS ai_jobs_mask_status_updated_idx
+    ON ai_jobs (mask_id, status, updated_at DESC);
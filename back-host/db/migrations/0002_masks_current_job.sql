@@ -0,0 +1,12 @@
+-- Pointer to the job whose result a mask currently serves.
+-- The worker sets it in the same transaction that marks the job completed.
+ALTER TABLE masks ADD COLUMN IF NOT EXISTS current_job_id INT REFERENCES ai_jobs(id) ON DELETE SET NULL;
+
+-- Backfill from existing history
+UPDATE masks SET current_job_id = (
+    SELECT j.id FROM ai_jobs j
+    WHERE j.mask_id = masks.id AND j.status = 'completed'
+    ORDER BY j.updated_at DESC
+    LIMIT 1
+)
+WHERE current_job_id IS NULL;
@@ -0,0 +1,9 @@
+-- Canonical fingerprint of a job's inputs, and how a request was deduplicated:
+-- dedup_reason is 'coalesced' (attached to in-flight job dedup_of) or 'reused'
+-- (copied the result of completed job dedup_of). NULL means a crew actually ran.
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS input_hash VARCHAR(64);
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS dedup_of INT;
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS dedup_reason VARCHAR(20);
+
+CREATE INDEX IF NOT EXISTS ai_jobs_input_hash_idx ON ai_jobs (input_hash, status, updated_at DESC);
+CREATE INDEX IF NOT EXISTS ai_jobs_dedup_of_idx ON ai_jobs (dedup_of) WHERE dedup_of IS NOT NULL;
@@ -0,0 +1,4 @@
+-- Keyset pagination for GET /masks/ walks (created_at, id) newest first,
+-- optionally within one user's masks
+CREATE INDEX IF NOT EXISTS masks_created_id_idx ON masks (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS masks_user_created_id_idx ON masks (user_id, created_at DESC, id DESC);
@@ -0,0 +1,4 @@
+-- Staged pipeline bookkeeping: the stage a job is in (scrape / extract / generate / done)
+-- and per-stage details (timestamps, attempts, counts) keyed by stage name.
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS stage VARCHAR(20);
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS stage_state JSONB;
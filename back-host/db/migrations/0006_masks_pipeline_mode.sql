@@ -0,0 +1,3 @@
+-- Per-mask generation pipeline: 'crew' (CrewAI agents) or 'fast' (two direct Ollama calls).
+-- NULL follows the PIPELINE_MODE env default.
+ALTER TABLE masks ADD COLUMN IF NOT EXISTS pipeline_mode VARCHAR(10);
@@ -0,0 +1,6 @@
+-- Change detection for scheduled refresh: normalized content hash per source url
+-- ({url: sha256}) as of the last completed job, and when the sources were last checked.
+ALTER TABLE masks ADD COLUMN IF NOT EXISTS source_hashes JSONB;
+ALTER TABLE masks ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS masks_refreshed_at_idx ON masks (refreshed_at);
@@ -0,0 +1,3 @@
+-- Seconds spent per span for a job (scrape_static, scrape_dynamic, llm_llama3, db_write, ...),
+-- summed across the stage tasks that ran it.
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS timings JSONB;
@@ -0,0 +1,13 @@
+-- Bulk regeneration: one row per POST /describing/regenerate, its jobs point back at it.
+CREATE TABLE IF NOT EXISTS job_batches (
+    id SERIAL PRIMARY KEY,
+    user_id INT REFERENCES users(id) ON DELETE SET NULL,
+    total INT NOT NULL,
+    group_id VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS batch_id INT REFERENCES job_batches(id) ON DELETE SET NULL;
+
+-- Progress is a GROUP BY status over one batch
+CREATE INDEX IF NOT EXISTS ai_jobs_batch_status_idx ON ai_jobs (batch_id, status);
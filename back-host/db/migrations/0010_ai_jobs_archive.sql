@@ -0,0 +1,19 @@
+-- Cold storage for ai_jobs rows pruned by the retention task (db/retention.py):
+-- the whole row as gzipped JSON, plus the columns needed to find it again.
+-- No foreign keys: the archive outlives the masks and users it refers to.
+CREATE TABLE IF NOT EXISTS ai_jobs_archive (
+    id INT PRIMARY KEY,
+    user_id INT,
+    mask_id INT,
+    status VARCHAR(20),
+    input_hash VARCHAR(64),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    row_gz BYTEA NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ai_jobs_archive_mask_idx ON ai_jobs_archive (mask_id, id DESC);
+
+-- Retention never prunes a job a mask currently serves
+CREATE INDEX IF NOT EXISTS masks_current_job_idx ON masks (current_job_id);
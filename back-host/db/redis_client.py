@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+# Same Redis the Celery broker uses unless told otherwise
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis")  # "redis" or "local"
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the handful of Redis commands the caches use.
+    Good for a single process (dev, benchmarks); nothing is shared between workers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        exp = self._expires.get(key)
+        if exp is not None and exp <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key) if self._alive(key) else None
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._data.get(k) if self._alive(k) else None for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = value if isinstance(value, bytes) else str(value).encode()
+            if ex:
+                self._expires[key] = time.monotonic() + ex
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._data[key]) + amount if self._alive(key) else amount
+            self._data[key] = str(value).encode()
+            return value
+
+    def publish(self, channel, message):
+        return 0  # no subscribers outside this process; push needs real Redis
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """Shared client for caches and counters (returns bytes, like redis-py)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LocalRedis() if CACHE_BACKEND == "local" else redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+_async_client = None
+
+
+def get_async_redis():
+    """Asyncio client for the API's long-lived pub/sub listeners (None on the local backend)."""
+    global _async_client
+    if CACHE_BACKEND == "local":
+        return None
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(REDIS_URL)
+    return _async_client
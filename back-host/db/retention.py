@@ -0,0 +1,107 @@
+import gzip
+import json
+import os
+import time
+
+from sqlalchemy import text
+
+from db.database import run_transaction
+
+# --- RETENTION SETTINGS ---
+# Per mask the RETENTION_KEEP newest completed jobs stay in ai_jobs, as does anything
+# pending, anything a mask currently serves and anything younger than RETENTION_MIN_AGE
+# seconds (so dedup reuse and batch progress never lose rows they still read).
+# Everything else is copied, gzipped, to ai_jobs_archive and deleted, RETENTION_CHUNK
+# rows per transaction with RETENTION_PAUSE seconds between chunks.
+RETENTION_KEEP = int(os.getenv("RETENTION_KEEP", "5"))
+RETENTION_MIN_AGE = int(os.getenv("RETENTION_MIN_AGE", str(7 * 86400)))
+RETENTION_CHUNK = int(os.getenv("RETENTION_CHUNK", "200"))
+RETENTION_MAX_CHUNKS = int(os.getenv("RETENTION_MAX_CHUNKS", "50"))  # per run; the next sweep continues
+RETENTION_PAUSE = float(os.getenv("RETENTION_PAUSE", "0.2"))
+
+
+def prunable_job_ids(db, after_id, limit, keep=RETENTION_KEEP, min_age=RETENTION_MIN_AGE):
+    """Next ids (ascending, > after_id) that retention may archive."""
+    rows = db.execute(text("""
+        SELECT j.id FROM ai_jobs j
+        WHERE j.id > :after
+          AND j.status IN ('completed', 'failed')
+          AND j.updated_at < NOW() - (:age * INTERVAL '1 second')
+          AND NOT EXISTS (SELECT 1 FROM masks m WHERE m.current_job_id = j.id)
+          AND NOT EXISTS (SELECT 1 FROM ai_jobs d WHERE d.dedup_of = j.id AND d.status = 'pending')
+          AND (
+              j.status = 'failed' OR (
+                  SELECT count(*) FROM ai_jobs k
+                  WHERE k.mask_id = j.mask_id AND k.status = 'completed' AND k.id > j.id
+              ) >= :keep
+          )
+        ORDER BY j.id
+        LIMIT :lim
+    """), {"after": after_id, "age": min_age, "keep": keep, "lim": limit}).fetchall()
+    return [row.id for row in rows]
+
+
+def archive_jobs(db, job_ids):
+    """
+    Copies job_ids to ai_jobs_archive and deletes them, skipping any that became a
+    mask's current job meanwhile. Returns (archived, raw_bytes, packed_bytes). Caller commits.
+    """
+    rows = db.execute(text("""
+        SELECT * FROM ai_jobs j
+        WHERE j.id = ANY(:ids) AND j.status IN ('completed', 'failed')
+          AND NOT EXISTS (SELECT 1 FROM masks m WHERE m.current_job_id = j.id)
+    """), {"ids": list(job_ids)}).fetchall()
+    if not rows:
+        return 0, 0, 0
+
+    encoded = [json.dumps(dict(row._mapping), default=str).encode("utf-8") for row in rows]
+    packed = [gzip.compress(data, mtime=0) for data in encoded]
+    db.execute(text("""
+        INSERT INTO ai_jobs_archive (id, user_id, mask_id, status, input_hash, created_at, updated_at, row_gz)
+        SELECT * FROM unnest(
+            CAST(:ids AS INT[]), CAST(:uids AS INT[]), CAST(:mids AS INT[]), CAST(:statuses AS TEXT[]),
+            CAST(:hashes AS TEXT[]), CAST(:created AS TIMESTAMP[]), CAST(:updated AS TIMESTAMP[]),
+            CAST(:packed AS BYTEA[])
+        )
+        ON CONFLICT (id) DO NOTHING
+    """), {
+        "ids": [row.id for row in rows],
+        "uids": [row.user_id for row in rows],
+        "mids": [row.mask_id for row in rows],
+        "statuses": [row.status for row in rows],
+        "hashes": [row.input_hash for row in rows],
+        "created": [row.created_at for row in rows],
+        "updated": [row.updated_at for row in rows],
+        "packed": packed,
+    })
+    db.execute(text("DELETE FROM ai_jobs WHERE id = ANY(:ids)"), {"ids": [row.id for row in rows]})
+    return len(rows), sum(len(data) for data in encoded), sum(len(data) for data in packed)
+
+
+def prune(db, keep=RETENTION_KEEP, min_age=RETENTION_MIN_AGE, chunk=RETENTION_CHUNK,
+          max_chunks=RETENTION_MAX_CHUNKS, pause=RETENTION_PAUSE):
+    """Archives prunable jobs oldest first, one small transaction per chunk. Returns a report dict."""
+    report = {"archived": 0, "raw_bytes": 0, "archived_bytes": 0, "chunks": 0}
+    start = time.perf_counter()
+    after_id = 0
+    while report["chunks"] < max_chunks:
+        job_ids = prunable_job_ids(db, after_id, chunk, keep, min_age)
+        db.commit()
+        if not job_ids:
+            break
+        archived, raw, packed = run_transaction(db, lambda s: archive_jobs(s, job_ids))
+        report["archived"] += archived
+        report["raw_bytes"] += raw
+        report["archived_bytes"] += packed
+        report["chunks"] += 1
+        after_id = job_ids[-1]
+        if pause:
+            time.sleep(pause)  # let foreground writes to the same ranges through
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    return report
+
+
+def load_archived(db, job_id):
+    """The archived ai_jobs row as a dict (datetimes as strings), or None."""
+    row = db.execute(text("SELECT row_gz FROM ai_jobs_archive WHERE id = :id"), {"id": job_id}).fetchone()
+    return json.loads(gzip.decompress(bytes(row.row_gz))) if row else None
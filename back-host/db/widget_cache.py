@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db.redis_client import get_redis, get_async_redis, CACHE_BACKEND
+import metrics
+
+# --- WIDGET CACHE SETTINGS ---
+# Rendered /embed and /jobs/by-mask bodies, keyed by (kind, mask_id).
+# The worker bumps a per-mask version in Redis when a job completes; any cached
+# body carrying an older version is treated as a miss.
+MAX_ENTRIES = int(os.getenv("WIDGET_CACHE_SIZE", "2048"))
+MAX_AGE = int(os.getenv("WIDGET_CACHE_MAX_AGE", "3600"))
+# "No completed job yet" when the version can't be trusted (Redis down, or CACHE_BACKEND=local
+# where the worker's bump never reaches the API process): nothing would clear it on completion
+UNVERSIONED_MISSING_MAX_AGE = int(os.getenv("WIDGET_CACHE_UNVERSIONED_MISSING_MAX_AGE", "5"))
+USE_REDIS_TIER = os.getenv("WIDGET_CACHE_REDIS", "1") == "1"
+BROWSER_MAX_AGE = int(os.getenv("WIDGET_BROWSER_MAX_AGE", "30"))
+REVALIDATE = f"public, max-age={BROWSER_MAX_AGE}, must-revalidate"
+
+VERSION_PREFIX = "widget:ver:"
+BODY_PREFIX = "widget:body:"
+MISSING = b"\x00missing"  # cached "no completed job yet"
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hit": 0, "miss": 0}
+
+
+def make_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Strong comparison against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_headers(etag):
+    return {"ETag": etag, "Cache-Control": REVALIDATE}
+
+
+async def _redis(method, *args, **kwargs):
+    """Async Redis call, or the in-process stand-in when CACHE_BACKEND=local."""
+    client = get_async_redis()
+    if client is None:
+        return getattr(get_redis(), method)(*args, **kwargs)
+    return await getattr(client, method)(*args, **kwargs)
+
+
+async def _version(mask_id):
+    try:
+        value = await _redis("get", VERSION_PREFIX + str(mask_id))
+        return value.decode() if value else "0"
+    except Exception:
+        return "?"  # Redis unreachable: fall back to MAX_AGE expiry only
+
+
+def _lru_get(key, version):
+    with _lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        entry_version, stored_at, max_age, body, etag = entry
+        if entry_version != version or time.monotonic() - stored_at > max_age:
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return body, etag
+
+
+def _lru_put(key, version, body, etag, max_age=MAX_AGE):
+    with _lock:
+        _lru[key] = (version, time.monotonic(), max_age, body, etag)
+        _lru.move_to_end(key)
+        while len(_lru) > MAX_ENTRIES:
+            _lru.popitem(last=False)
+
+
+async def _redis_get(key, version):
+    if not USE_REDIS_TIER or version == "?":
+        return None
+    try:
+        return await _redis("get", BODY_PREFIX + f"{key[0]}:{key[1]}:{version}")
+    except Exception:
+        return None
+
+
+async def _redis_put(key, version, raw):
+    if not USE_REDIS_TIER or version == "?":
+        return
+    try:
+        await _redis("set", BODY_PREFIX + f"{key[0]}:{key[1]}:{version}", raw, ex=MAX_AGE)
+    except Exception:
+        pass
+
+
+async def get_or_render(kind, mask_id, render):
+    """
+    Returns (body, etag) for this mask, awaiting render() only on a miss.
+    render() returns bytes, or None when there is no completed job yet; that
+    answer is cached too and is returned here as (None, None).
+    """
+    key = (kind, mask_id)
+    version = await _version(mask_id)
+
+    cached = _lru_get(key, version)
+    if cached is None:
+        raw = await _redis_get(key, version)
+        if raw is not None:
+            cached = (None, None) if raw == MISSING else (raw, make_etag(raw))
+            _lru_put(key, version, *cached)
+
+    if cached is not None:
+        _stats["hit"] += 1
+        metrics.record_cache("widget", "hit")
+        return cached
+
+    _stats["miss"] += 1
+    metrics.record_cache("widget", "miss")
+    body = await render()
+    etag = make_etag(body) if body is not None else None
+    if body is None and (version == "?" or CACHE_BACKEND == "local"):
+        _lru_put(key, version, body, etag, UNVERSIONED_MISSING_MAX_AGE)
+        return body, etag  # never in the Redis tier either
+    _lru_put(key, version, body, etag)
+    await _redis_put(key, version, MISSING if body is None else body)
+    return body, etag
+
+
+def invalidate(mask_id):
+    """Called by the worker after a job for this mask commits."""
+    try:
+        get_redis().incr(VERSION_PREFIX + str(mask_id))
+    except Exception:
+        pass
+    with _lock:
+        for key in [k for k in _lru if k[1] == mask_id]:
+            del _lru[key]
+
+
+def stats():
+    total = _stats["hit"] + _stats["miss"]
+    return {**_stats, "entries": len(_lru), "hit_rate": round(_stats["hit"] / total, 4) if total else 0.0}
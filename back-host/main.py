@@ -1,10 +1,12 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from routes import login 
 from fastapi.middleware.cors import CORSMiddleware
 from routes import mask
 from routes import describing
 from routes import whatchlist
 from routes import live
+import metrics
 app = FastAPI()
 app.include_router(login.router)
 app.include_router(mask.router)
@@ -26,8 +28,29 @@ app.add_middleware(
     allow_credentials=True,      
     allow_methods=["*"],         
     allow_headers=["*"],  
+    expose_headers=["X-Next-Cursor", "Link", "ETag"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/embed/{mask_id}), not the raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.labels(
+            method=request.method, route=getattr(route, "path", "unmatched"), status=str(status)
+        ).observe(time.perf_counter() - start)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
 @app.get("/")
 async def read_root():
      sam="hello from back-host"
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# --- PROMETHEUS METRICS ---
+# Uvicorn workers and Celery worker processes each hold their own counters. Point
+# PROMETHEUS_MULTIPROC_DIR at a shared, empty directory (wiped on deploy) and /metrics
+# on the API aggregates every process on the host, workers included.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+CELERY_QUEUES = ("celery", "scrape", "extract", "llm")
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+HTTP_LATENCY = Histogram(
+    "http_request_seconds", "API request latency (until response headers)", ["method", "route", "status"],
+)
+STAGE_SECONDS = Histogram(
+    "job_stage_seconds", "Time spent per pipeline stage/span", ["stage"], buckets=STAGE_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens processed by Ollama", ["model", "kind"])
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second", "Generation speed per Ollama call", ["model"],
+    buckets=(1, 2, 5, 10, 20, 30, 40, 60, 80, 120, 200),
+)
+MODEL_SWITCHES = Counter("ollama_model_switches_total", "Ollama phase switches (one load each)", ["model"])
+SCRAPES = Counter("scrape_pages_total", "Pages scraped, by how they were obtained", ["source"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups", ["cache", "result"])
+JOBS = Counter("jobs_finished_total", "Jobs finished by the worker", ["status", "mode"])
+JOBS_ARCHIVED = Counter("jobs_archived_total", "ai_jobs rows moved to ai_jobs_archive by retention")
+
+_timings = ContextVar("job_timings", default=None)
+
+
+class Timings(dict):
+    """Seconds per span name for one job stage; safe to add to from helper threads."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self[name] = round(self.get(name, 0.0) + seconds, 4)
+
+
+@contextmanager
+def collect():
+    """Spans inside this block are also summed into the yielded Timings (saved on ai_jobs.timings)."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def record_llm(model, prompt_tokens, completion_tokens, eval_duration_ns=None):
+    """Token counts from an Ollama response (prompt_eval_count / eval_count / eval_duration)."""
+    LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens or 0)
+    LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens or 0)
+    if completion_tokens and eval_duration_ns:
+        LLM_TOKENS_PER_SECOND.labels(model=model).observe(completion_tokens / (eval_duration_ns / 1e9))
+
+
+def record_cache(cache, result):
+    CACHE_LOOKUPS.labels(cache=cache, result=result).inc()
+
+
+class BacklogCollector:
+    """Read at scrape time: Celery queue depths (Redis LLEN), scrape-cache counters, scheduler backlog."""
+
+    def collect(self):
+        from db.redis_client import get_redis
+        from ai_system import scrape_cache
+
+        depth = GaugeMetricFamily("celery_queue_depth", "Messages waiting per Celery queue", labels=["queue"])
+        try:
+            redis = get_redis()
+            for queue in CELERY_QUEUES:
+                depth.add_metric([queue], redis.llen(queue))
+        except Exception:
+            pass  # no broker (or the local stand-in): leave the family empty
+        yield depth
+
+        hit_rate = GaugeMetricFamily("scrape_cache_hit_rate", "Scrape cache hits (incl. 304s) / lookups, all workers")
+        try:
+            hit_rate.add_metric([], scrape_cache.stats()["hit_rate"])
+        except Exception:
+            pass
+        yield hit_rate
+
+        scheduled = GaugeMetricFamily("scheduler_jobs", "Jobs held by the fair-share scheduler", labels=["state"])
+        try:
+            from ai_system import scheduler
+            if scheduler.ENABLED:
+                stats = scheduler.get_scheduler().stats()
+                scheduled.add_metric(["queued"], stats["queued"])
+                scheduled.add_metric(["inflight"], stats["inflight"])
+        except Exception:
+            pass
+        yield scheduled
+
+
+def render():
+    """Body for GET /metrics."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(registry)
+
+    extra = CollectorRegistry()
+    extra.register(BacklogCollector())
+    return output + generate_latest(extra), CONTENT_TYPE_LATEST
+
+
+def process_exited(pid):
+    """Celery worker_process_shutdown hook: drop the dead process's live gauges."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -1,17 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import List, Optional # 👈 Added imports for type hinting
-from db.database import get_db
-from ai_system.worker import run_mask_processing
+from db.database import get_db, get_async_db, run_transaction
+from db import jobs, widget_cache, job_events
+from ai_system.dispatch import mask_processing
+from ai_system.fast_pipeline import PIPELINE_MODES
+from ai_system import scheduler
+from celery import group
+import os
 
 router = APIRouter(prefix="/describing", tags=["describing"])
 
+# --- BULK REGENERATION ---
+# Jobs of one batch are released BULK_DISPATCH_RATE per second (Celery countdown),
+# so a big batch doesn't land on the scrape queue all at once.
+BULK_MAX_MASKS = int(os.getenv("BULK_MAX_MASKS", "1000"))
+BULK_DISPATCH_RATE = float(os.getenv("BULK_DISPATCH_RATE", "2"))
+
 # 1️⃣ GET SINGLE MASK
 @router.get("/{mask_id}")
-def get_mask(mask_id: int, db: Session = Depends(get_db)):
+async def get_mask(mask_id: int, db: AsyncSession = Depends(get_async_db)):
     query = text("SELECT * FROM masks WHERE id = :id")
-    result = db.execute(query, {"id": mask_id}).fetchone()
+    result = (await db.execute(query, {"id": mask_id})).fetchone()
     
     if not result:
         raise HTTPException(status_code=404, detail="Mask not found")
@@ -22,6 +34,7 @@ def get_mask(mask_id: int, db: Session = Depends(get_db)):
         "title": result.title,              
         "description": result.description,
         "site_url": result.site_url if result.site_url is not None else [],
+        "pipeline_mode": result.pipeline_mode,
         "created_at": result.created_at
     }
 
@@ -32,8 +45,12 @@ def update_mask(
     title: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     site_url: List[str] = Form([]), 
+    pipeline_mode: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
+    if pipeline_mode and pipeline_mode not in PIPELINE_MODES:
+        raise HTTPException(status_code=422, detail=f"pipeline_mode must be one of {', '.join(PIPELINE_MODES)}")
+
     # 1. Check existence and get user_id
     mask_check = db.execute(
         text("SELECT user_id FROM masks WHERE id = :id"), 
@@ -47,61 +64,186 @@ def update_mask(
         # 2. Update Mask and return values
         query = text("""
             UPDATE masks 
-            SET title = :ti, api_key = :key, description = :desc, site_url = :urls
+            SET title = :ti, api_key = :key, description = :desc, site_url = :urls,
+                pipeline_mode = COALESCE(:mode, pipeline_mode)
             WHERE id = :id
-            RETURNING id, user_id, title
-        """)
-        
-        result = db.execute(query, {
-            "ti": title, "key": api_keys, "desc": description, "urls": site_url, "id": mask_id
-        }).fetchone()
-
-        # 3. Create the AI Job record
-        # Note: we use 'initializing' as a placeholder for task_id
-        insert_job_query = text("""
-            INSERT INTO ai_jobs (user_id, mask_id, task_id, status)
-            VALUES (:uid, :mid, 'initializing', 'pending')
-            RETURNING id
+            RETURNING id, user_id, title, pipeline_mode
         """)
-        
-        job_row = db.execute(insert_job_query, {
-            "uid": mask_check.user_id, 
-            "mid": mask_id
-        }).fetchone()
-        
-        # Capture IDs as variables
-        job_id = job_row.id
-
-        # 4. Trigger Celery (passing IDs as ints is fine for Python)
-        
-        celery_task = run_mask_processing.delay(
-            job_id=job_id,
-            title=title,
-            description=description,
-            urls=site_url
-        )
-
-        # 5. Update with real Celery Task ID (Task ID is a string already)
-        db.execute(
-            text("UPDATE ai_jobs SET task_id = :tid WHERE id = :jid"),
-            {"tid": celery_task.id, "jid": job_id}
-        )
-        
-        db.commit()
+
+        def save(s):
+            result = s.execute(query, {
+                "ti": title, "key": api_keys, "desc": description, "urls": site_url,
+                "mode": pipeline_mode or None, "id": mask_id
+            }).fetchone()
+
+            # 3. Deduplicate against identical jobs before paying for a crew run
+            input_hash = jobs.job_fingerprint(title, description, site_url, result.pipeline_mode)
+            dedup_reason, match = jobs.find_duplicate(s, input_hash)
+
+            if dedup_reason == "coalesced":
+                # Same inputs already running: attach to it, the worker completes us with it
+                job_id = jobs.insert_job(
+                    s, mask_check.user_id, mask_id, input_hash,
+                    task_id=match.task_id, dedup_of=match.id, dedup_reason="coalesced"
+                )
+            elif dedup_reason == "reused":
+                # Same inputs finished recently: copy the result, no crew at all
+                job_id = jobs.insert_reused_job(s, mask_check.user_id, mask_id, match.id)
+            else:
+                # Only new work counts against the backlog; 429 rolls back the mask update too
+                scheduler.admit()
+
+                # 4. Create the AI Job record
+                job_id = jobs.insert_job(s, mask_check.user_id, mask_id, input_hash)
+            return result, dedup_reason, match, job_id
+
+        # Committed (and retried on 40001) before any worker can see the task
+        result, dedup_reason, match, job_id = run_transaction(db, save)
+
+        if dedup_reason:
+            task_id = match.task_id
+        else:
+            # Queued behind this user's other jobs, released fairly across users
+            task_id = scheduler.submit(mask_check.user_id, job_id, {
+                "job_id": job_id,
+                "title": title,
+                "description": description,
+                "urls": site_url,
+                "pipeline_mode": result.pipeline_mode
+            }, priority="interactive")
+
+            # 5. Update with real Celery Task ID (Task ID is a string already)
+            run_transaction(db, lambda s: s.execute(
+                text("UPDATE ai_jobs SET task_id = :tid WHERE id = :jid"),
+                {"tid": task_id, "jid": job_id}
+            ))
+
+        if dedup_reason == "reused":
+            widget_cache.invalidate(mask_id)
+            job_events.publish(mask_id, "completed", job_id=str(job_id))
+        else:
+            job_events.publish(mask_id, "queued", job_id=str(job_id))
 
         # 6. RETURN EVERYTHING AS STRINGS to prevent rounding in JS
         return {
-            "status": "Job Triggered",
+            "status": {"coalesced": "Job Coalesced", "reused": "Result Reused"}.get(dedup_reason, "Job Triggered"),
             "job_id": str(job_id), 
-            "celery_task_id": str(celery_task.id),
+            "celery_task_id": str(task_id),
+            "dedup": dedup_reason,
+            "dedup_of": str(match.id) if match else None,
             "mask_details": {
                 "id": str(result.id),
                 "user_id": str(result.user_id),
-                "title": result.title
+                "title": result.title,
+                "pipeline_mode": result.pipeline_mode
             }
         }
 
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         print(f"Update Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Flow failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Flow failed: {str(e)}")
+
+# 2️⃣ BULK REGENERATE (explicit mask ids and/or every mask of a user)
+@router.post("/regenerate")
+def regenerate_masks(
+    mask_ids: List[int] = Form([]),
+    user_id: Optional[int] = Form(None),
+    pipeline_mode: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    if not mask_ids and user_id is None:
+        raise HTTPException(status_code=422, detail="Pass mask_ids and/or user_id")
+    if pipeline_mode and pipeline_mode not in PIPELINE_MODES:
+        raise HTTPException(status_code=422, detail=f"pipeline_mode must be one of {', '.join(PIPELINE_MODES)}")
+
+    masks = db.execute(text("""
+        SELECT id, user_id, title, description, site_url, pipeline_mode FROM masks
+        WHERE id = ANY(CAST(:ids AS INT[])) OR (CAST(:uid AS INT) IS NOT NULL AND user_id = :uid)
+        ORDER BY id
+        LIMIT :lim
+    """), {"ids": mask_ids, "uid": user_id, "lim": BULK_MAX_MASKS + 1}).fetchall()
+    if not masks:
+        raise HTTPException(status_code=404, detail="No matching masks")
+    if len(masks) > BULK_MAX_MASKS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_MASKS} masks per batch")
+    # No dedup here, so every mask is new work: shed load before writing anything
+    scheduler.admit()
+
+    try:
+        # 1. Batch row + every job row, one statement each (no dedup: a regenerate means "run again")
+        hashes = [jobs.job_fingerprint(m.title, m.description, m.site_url, pipeline_mode or m.pipeline_mode)
+                  for m in masks]
+
+        def insert_batch(s):
+            batch_id = s.execute(
+                text("INSERT INTO job_batches (user_id, total) VALUES (:uid, :n) RETURNING id"),
+                {"uid": user_id, "n": len(masks)}
+            ).fetchone().id
+            return batch_id, jobs.insert_batch_jobs(s, batch_id, masks, hashes)
+
+        batch_id, job_ids = run_transaction(db, insert_batch)  # rows exist before any task can pick them up
+
+        ordered_jobs = [job_ids[m.id] for m in masks]
+        kwargs = [{
+            "job_id": job_ids[m.id], "title": m.title, "description": m.description,
+            "urls": list(m.site_url or []), "pipeline_mode": pipeline_mode or m.pipeline_mode,
+        } for m in masks]
+
+        group_id = None
+        if scheduler.ENABLED:
+            # 2. Bulk class in the fair-share queue: drains behind interactive work, per owner
+            task_ids = scheduler.submit_many(
+                [(m.user_id, job_ids[m.id], kw) for m, kw in zip(masks, kwargs)], priority="bulk"
+            )
+        else:
+            # 2. One group, staggered by countdown
+            tasks = group(
+                mask_processing(**kw).set(countdown=index / BULK_DISPATCH_RATE)
+                for index, kw in enumerate(kwargs)
+            ).apply_async()
+            task_ids = [r.id for r in tasks.results]
+            group_id = tasks.id
+
+        # 3. Task ids back in one UPDATE
+        def save_task_ids(s):
+            if group_id:
+                s.execute(text("UPDATE job_batches SET group_id = :g WHERE id = :b"), {"g": group_id, "b": batch_id})
+            jobs.set_task_ids(s, ordered_jobs, task_ids)
+
+        run_transaction(db, save_task_ids)
+    except Exception as e:
+        db.rollback()
+        print(f"Regenerate Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Flow failed: {str(e)}")
+
+    for m in masks:
+        job_events.publish(m.id, "queued", job_id=str(job_ids[m.id]))
+
+    return {
+        "status": "Batch Triggered",
+        "batch_id": str(batch_id),
+        "total": len(masks),
+        "jobs": {str(m.id): str(job_ids[m.id]) for m in masks},
+    }
+
+# 3️⃣ BATCH PROGRESS (one indexed GROUP BY)
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: int, db: AsyncSession = Depends(get_async_db)):
+    total, counts = await db.run_sync(lambda s: jobs.batch_progress(s, batch_id))
+    if total is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    finished = counts.get("completed", 0) + counts.get("failed", 0)
+    return {
+        "batch_id": str(batch_id),
+        "total": total,
+        "pending": counts.get("pending", 0),
+        "completed": counts.get("completed", 0),
+        "failed": counts.get("failed", 0),
+        "progress": round(finished / total, 4) if total else 1.0,
+        "done": finished >= total,
+    }
@@ -1,26 +1,63 @@
 # routes/render.py (Add to your FastAPI app)
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from db.database import get_db
+from db.database import get_async_db, run_async_transaction
+from db import widget_cache, job_events
 import json
 
 router = APIRouter()
 
-@router.get("/jobs/by-mask/{mask_id}")
-def get_job_by_mask(mask_id: int, db: Session = Depends(get_db)):
-    # Fetch the latest completed job for this mask_id
+async def _fetch_one(db, query, params):
+    return (await db.execute(query, params)).fetchone()
+
+async def render_job_result(mask_id, db):
+    # Fetch the mask's current completed job (primary-key lookups only)
     query = text("""
-        SELECT result 
-        FROM ai_jobs 
-        WHERE mask_id = :mid AND status = 'completed' 
-        ORDER BY updated_at DESC 
-        LIMIT 1
+        SELECT j.result 
+        FROM masks m 
+        JOIN ai_jobs j ON j.id = m.current_job_id 
+        WHERE m.id = :mid
     """)
-    job = db.execute(query, {"mid": mask_id}).fetchone()
+    job = await run_async_transaction(db, lambda s: _fetch_one(s, query, {"mid": mask_id}))
 
     if not job:
-        raise HTTPException(status_code=404, detail="No completed job found for this mask")
+        return None
 
     # Return the result JSON directly
-    return job.result if isinstance(job.result, dict) else json.loads(job.result)
\ No newline at end of file
+    result = job.result if isinstance(job.result, dict) else json.loads(job.result)
+    return json.dumps(result).encode("utf-8")
+
+@router.get("/jobs/by-mask/{mask_id}")
+async def get_job_by_mask(mask_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    body, etag = await widget_cache.get_or_render("job", mask_id, lambda: render_job_result(mask_id, db))
+
+    if body is None:
+        raise HTTPException(status_code=404, detail="No completed job found for this mask")
+
+    headers = widget_cache.cache_headers(etag)
+    if widget_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/jobs/stream/{mask_id}")
+async def stream_job_events(mask_id: int, request: Request):
+    """
+    Server-Sent Events: queued / scraping / generating / completed / failed for this mask.
+    Pushed by the worker through Redis pub/sub, so waiting clients never poll.
+    """
+    return StreamingResponse(
+        job_events.sse_stream(mask_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/jobs/preview/{mask_id}")
+def get_job_preview(mask_id: int):
+    """Partial HTML of the generation in progress (state 'preview'); served from Redis only."""
+    preview = job_events.get_preview(mask_id)
+    if not preview:
+        raise HTTPException(status_code=404, detail="No generation in progress for this mask")
+    return {"state": "preview", **preview}
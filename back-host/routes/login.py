@@ -1,74 +1,78 @@
 from fastapi import APIRouter, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from db.database import get_db
-import bcrypt
+from typing import Optional
+from db.database import get_async_db, run_async_transaction
+from auth.passwords import hash_password, check_password
+from auth.tokens import issue_token, optional_session
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.post("/signup/")
-def signup(
+async def signup(
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 1️⃣ Check if username/email exists
     check_query = text("SELECT id FROM users WHERE username = :u OR email = :e")
-    existing_user = db.execute(check_query, {"u": username, "e": email}).fetchone()
-    
+    existing_user = (await db.execute(check_query, {"u": username, "e": email})).fetchone()
+
     if existing_user:
         raise HTTPException(status_code=400, detail="Username or email already exists")
-    
-    # 2️⃣ Hash the password
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    
-    try:
-        # 3️⃣ Insert new user
-        insert_user_query = text("""
-            INSERT INTO users (username, email, password_hash)
-            VALUES (:u, :e, :p)
-            RETURNING id, username, email, created_at
-        """)
-        new_user = db.execute(insert_user_query, {
-            "u": username, 
-            "e": email, 
+
+    # 2️⃣ Hash the password (bcrypt process pool, 429 when saturated)
+    password_hash = await hash_password(password)
+
+    # 3️⃣ Insert new user
+    insert_user_query = text("""
+        INSERT INTO users (username, email, password_hash)
+        VALUES (:u, :e, :p)
+        RETURNING id, username, email, created_at
+    """)
+    # 4️⃣ Insert the default mask
+    # Since api_key is NULL (optional) in your new table, we don't need to pass it.
+    # It will default to NULL automatically.
+    insert_mask_query = text("""
+        INSERT INTO masks (user_id, mask_name)
+        VALUES (:uid, :mname)
+    """)
+
+    async def create(s):
+        new_user = (await s.execute(insert_user_query, {
+            "u": username,
+            "e": email,
             "p": password_hash
-        }).fetchone()
-        
-        # 4️⃣ Insert the default mask
-        # Since api_key is NULL (optional) in your new table, we don't need to pass it.
-        # It will default to NULL automatically.
+        })).fetchone()
         if new_user:
-            insert_mask_query = text("""
-                INSERT INTO masks (user_id, mask_name) 
-                VALUES (:uid, :mname)
-            """)
-            db.execute(insert_mask_query, {
-                "uid": new_user.id, 
+            await s.execute(insert_mask_query, {
+                "uid": new_user.id,
                 "mname": "Default Mask"
             })
+        return new_user
 
-        # 5️⃣ Commit EVERYTHING at once
+    try:
+        # 5️⃣ Commit EVERYTHING at once (retried as a unit on 40001)
         # This guarantees that you never have a User without a Mask.
-        db.commit()
-        
+        new_user = await run_async_transaction(db, create)
+
         return dict(new_user._mapping)
 
     except Exception as e:
-        db.rollback() # Undo the user insert if the mask insert fails
+        await db.rollback() # Undo the user insert if the mask insert fails
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/login/")
-def login_user(
-    username: str = Form(...), 
-    password: str = Form(...), 
-    db: Session = Depends(get_db)
+async def login_user(
+    username: str = Form(...),
+    password: str = Form(...),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 1. Find the user by Username
     query = text("SELECT id, username, password_hash FROM users WHERE username = :u")
-    user = db.execute(query, {"u": username}).fetchone()
+    user = (await db.execute(query, {"u": username})).fetchone()
 
     # 2. If user doesn't exist
     if not user:
@@ -78,27 +82,37 @@ def login_user(
     # Convert the row to a dictionary to access fields safely
     user_dict = user._mapping
     stored_hash = user_dict["password_hash"]
-    
-    # bcrypt.checkpw requires bytes, so we encode the input password and the stored hash
-    if not bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
+
+    if not await check_password(password, stored_hash):
         raise HTTPException(status_code=400, detail="Invalid username or password")
 
-    # 4. Success! Return the User ID (and eventually a JWT token)
+    # 4. Success! Return the User ID and a signed session token
     return {
-        "message": "Login successful", 
+        "message": "Login successful",
         "user_id": str(user_dict["id"]),
-        "username": user_dict["username"]
+        "username": user_dict["username"],
+        "token": issue_token(user_dict["id"], user_dict["username"])
     }
 
 @router.get("/profile/")
-def get_profile(
-    user_id: str,  # <--- FastAPI looks for ?user_id=... automatically
-    db: Session = Depends(get_db)
+async def get_profile(
+    user_id: Optional[str] = None,  # <--- legacy ?user_id=... lookup
+    session: Optional[dict] = Depends(optional_session),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # Fast path: a valid session token already carries who the user is
+    if session:
+        return {"id": session["uid"], "username": session["usr"]}
+
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if not user_id.isdigit():
+        raise HTTPException(status_code=404, detail="User not found")
+
     query = text("SELECT username FROM users WHERE id = :id")
-    user = db.execute(query, {"id": user_id}).fetchone()
-    
+    user = (await db.execute(query, {"id": int(user_id)})).fetchone()
+
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    return dict(user._mapping)
\ No newline at end of file
+
+    return dict(user._mapping)
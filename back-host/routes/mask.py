@@ -1,45 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import List, Optional
-from db.database import get_db
+from db.database import get_db, get_async_db, run_transaction
+from datetime import datetime
+import base64
+import json
 
 router = APIRouter(prefix="/masks", tags=["masks"])
 
-# 1️⃣ READ ALL (Get Every Column)
+# 1️⃣ READ ALL (Keyset-paginated, projected, streamed)
 
+# Columns a client may ask for with ?fields=, and how each is serialized
+MASK_FIELDS = {
+    "id": str,                # 🟢 FIX: Convert to string for frontend
+    "user_id": str,           # 🟢 FIX: Convert to string for frontend
+    "mask_name": None,
+    "api_key": None,
+    "title": None,
+    "description": None,
+    "site_url": None,
+    "created_at": lambda v: v.isoformat() if v is not None else None,
+}
+DEFAULT_FIELDS = ["id", "user_id", "mask_name", "title", "site_url", "created_at"]
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_ROWS = 100
+
+def encode_cursor(created_at, mask_id):
+    # created_at is nullable: such rows sort last (NULL is smallest) and page by id alone
+    raw = json.dumps([created_at.isoformat() if created_at is not None else None, str(mask_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        created_at, mask_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at) if created_at is not None else None, int(mask_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cursor_condition(c_at):
+    """Rows after the cursor in ORDER BY created_at DESC, id DESC (NULL created_at last)."""
+    if c_at is None:
+        return "(created_at IS NULL AND id < :c_id)"
+    return "((created_at, id) < (:c_at, :c_id) OR created_at IS NULL)"
+
+def stream_json_rows(rows, fields):
+    """Encodes the page as a JSON array a chunk of rows at a time."""
+    yield "["
+    for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+        chunk = rows[start:start + STREAM_CHUNK_ROWS]
+        encoded = ",".join(
+            json.dumps({
+                f: (MASK_FIELDS[f](getattr(row, f)) if MASK_FIELDS[f] and getattr(row, f) is not None else getattr(row, f))
+                for f in fields
+            })
+            for row in chunk
+        )
+        yield ("," if start else "") + encoded
+    yield "]"
 
 @router.get("/")
-def get_masks(db: Session = Depends(get_db)):
-    # We fetch EVERYTHING so you can use this data anywhere
-    query = text("""
-        SELECT 
-            id, 
-            user_id, 
-            mask_name, 
-            api_key, 
-            title, 
-            description, 
-            site_url, 
-            created_at 
+async def get_masks(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Newest masks first, one page at a time. The body stays a plain JSON array;
+    the next page's cursor comes back in X-Next-Cursor (and a Link header).
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(DEFAULT_FIELDS)
+    unknown = [f for f in selected if f not in MASK_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # Keyset columns are always read; only the requested ones are returned
+    columns = list(dict.fromkeys(selected + ["id", "created_at"]))
+    where, params = [], {"lim": limit + 1}
+    if user_id is not None:
+        where.append("user_id = :uid")
+        params["uid"] = user_id
+    if cursor:
+        params["c_at"], params["c_id"] = decode_cursor(cursor)
+        where.append(cursor_condition(params["c_at"]))
+
+    query = text(f"""
+        SELECT {", ".join(columns)}
         FROM masks 
-        ORDER BY created_at DESC
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY created_at DESC, id DESC
+        LIMIT :lim
     """)
-    results = db.execute(query).fetchall()
-    
-    return [
-        {
-            "id": str(row.id),          # 🟢 FIX: Convert to string for frontend
-            "user_id": str(row.user_id), # 🟢 FIX: Convert to string for frontend
-            "mask_name": row.mask_name,
-            "api_key": row.api_key,
-            "title": row.title,
-            "description": row.description,
-            "site_url": row.site_url,
-            "created_at": row.created_at
-        } 
-        for row in results
-    ]
+    rows = (await db.execute(query, params)).fetchall()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+
+    return StreamingResponse(stream_json_rows(rows, selected), media_type="application/json", headers=headers)
 
 # 2️⃣ CREATE (Supports All Columns)
 @router.post("/add/")
@@ -59,16 +125,14 @@ def add_mask(
             RETURNING *
         """)
         
-        new_mask = db.execute(insert_query, {
+        new_mask = run_transaction(db, lambda s: s.execute(insert_query, {
             "uid": user_id, 
             "nm": mask_name, 
             "ti": title,
             "desc": description,
             "key": api_key,
             "urls": [] # Default empty list for site_url
-        }).fetchone()
-        
-        db.commit()
+        }).fetchone())
         
         # 🟢 FIX: Convert IDs to string in response
         result = dict(new_mask._mapping)
@@ -106,15 +170,13 @@ def update_mask(
             RETURNING *
         """)
         
-        updated_mask = db.execute(update_query, {
+        updated_mask = run_transaction(db, lambda s: s.execute(update_query, {
             "nm": mask_name, 
             "ti": title, 
             "desc": description, 
             "key": api_key,
             "id": mask_id
-        }).fetchone()
-        
-        db.commit()
+        }).fetchone())
 
         # 🟢 FIX: Convert IDs to string in response
         result = dict(updated_mask._mapping)
@@ -135,8 +197,7 @@ def delete_mask(mask_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Mask not found")
 
     try:
-        db.execute(text("DELETE FROM masks WHERE id = :id"), {"id": mask_id})
-        db.commit()
+        run_transaction(db, lambda s: s.execute(text("DELETE FROM masks WHERE id = :id"), {"id": mask_id}))
         # 🟢 FIX: Return ID as string
         return {"message": "Mask deleted successfully", "id": str(mask_id)}
     except Exception as e:
@@ -1,53 +1,121 @@
-from fastapi import APIRouter, HTTPException, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Response, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from db.database import get_db
+from db.database import get_async_db, run_async_transaction
+from db import widget_cache, artifacts
 from fastapi import Depends
+from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 import json
+import os
+
+# Send /embed hits to the immutable /widgets/{key} url (or ARTIFACT_PUBLIC_URL) instead of the bytes
+EMBED_REDIRECT = os.getenv("EMBED_REDIRECT", "0") == "1"
+IMMUTABLE = "public, max-age=31536000, immutable"
 
 router = APIRouter()
 
-router.get("/embed/{mask_id}")
-def serve_widget(mask_id: int, db: Session = Depends(get_db)):
+async def _fetch_one(db, query, params):
+    return (await db.execute(query, params)).fetchone()
+
+async def resolve_artifact(mask_id, db):
+    """Artifact key (as bytes) of the mask's current widget, or None if no job has completed yet."""
+    # 1. Get the mask's current completed job (primary-key lookups only)
+    query = text("""
+        SELECT j.result 
+        FROM masks m 
+        JOIN ai_jobs j ON j.id = m.current_job_id 
+        WHERE m.id = :mid
+    """)
+    job = await run_async_transaction(db, lambda s: _fetch_one(s, query, {"mid": mask_id}))
+    if not job:
+        return None
+
+    # 2. The worker published it at completion; older results are published on first view
+    try:
+        data = job.result if isinstance(job.result, dict) else json.loads(job.result)
+        key = data.get("artifact")
+        if not artifacts.exists(key):
+            key = await run_in_threadpool(artifacts.publish, data.get("html_code", "<h1>Error: Invalid Data</h1>"))
+    except Exception as e:
+        key = await run_in_threadpool(artifacts.publish, f"<h1>System Error</h1><p>{str(e)}</p>")
+
+    return key.encode("ascii")
+
+def artifact_response(request, key, cache_control, extra_headers=None):
+    """Precompressed bytes in the best encoding the client accepts; 304 on a matching ETag."""
+    encoding = artifacts.negotiate(request.headers.get("accept-encoding"))
+    etag = f'"{key}"' if encoding == "identity" else f'"{key}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding", **(extra_headers or {})}
+    if widget_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = artifacts.read(key, encoding)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Widget artifact not found")
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="text/html", headers=headers)
+
+@router.get("/embed/{mask_id}")
+async def serve_widget(mask_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     This is the Public API Endpoint.
     It returns raw HTML to be loaded inside an iframe 'src'.
+    The mask -> artifact key lookup is cached per mask until a job completes; the
+    bytes themselves were minified and compressed by the worker when it published them.
     """
-    # 1. Get the latest successful job for this mask
-    query = text("""
-        SELECT result 
-        FROM ai_jobs 
-        WHERE mask_id = :mid AND status = 'completed' 
-        ORDER BY updated_at DESC 
-        LIMIT 1
-    """)
-    job = db.execute(query, {"mid": mask_id}).fetchone()
+    body, _ = await widget_cache.get_or_render("artifact", mask_id, lambda: resolve_artifact(mask_id, db))
 
-    # 2. Fallback HTML if processing or failed
-    if not job:
+    # Fallback HTML if processing or failed
+    if body is None:
         html_fallback = """
         <html>
             <body style="font-family: sans-serif; display: flex; justify-content: center; align-items: center; height: 100vh; background: #f8fafc;">
                 <div style="text-align: center; color: #64748b;">
                     <h2>Widget Generating...</h2>
-                    <p>Please check back in a moment.</p>
+                    <p id="stage">Please check back in a moment.</p>
                 </div>
-                <script>setTimeout(function(){ location.reload(); }, 5000);</script>
+                <iframe id="preview" style="display: none; position: fixed; inset: 0; width: 100%; height: 100%; border: none; background: #fff;"></iframe>
+                <script>
+                    // Wait for the worker to push the result instead of polling
+                    var stage = document.getElementById("stage");
+                    var labels = {queued: "Queued...", scraping: "Reading sources...", generating: "Building widget..."};
+                    if (window.EventSource) {
+                        var es = new EventSource("/jobs/stream/__MASK_ID__");
+                        Object.keys(labels).forEach(function(name) {
+                            es.addEventListener(name, function() { stage.textContent = labels[name]; });
+                        });
+                        es.addEventListener("preview", function() {
+                            // Show the half-built widget while generation streams in
+                            fetch("/jobs/preview/__MASK_ID__").then(function(r) { return r.ok ? r.json() : null; }).then(function(p) {
+                                if (!p) return;
+                                var frame = document.getElementById("preview");
+                                frame.style.display = "block";
+                                frame.srcdoc = p.html_code;
+                            });
+                        });
+                        es.addEventListener("completed", function() { es.close(); location.reload(); });
+                        es.addEventListener("failed", function() { es.close(); stage.textContent = "Generation failed."; });
+                        es.addEventListener("unavailable", function() { es.close(); setTimeout(function(){ location.reload(); }, 30000); });
+                    } else {
+                        setTimeout(function(){ location.reload(); }, 30000);
+                    }
+                </script>
             </body>
         </html>
-        """
-        return Response(content=html_fallback, media_type="text/html")
+        """.replace("__MASK_ID__", str(mask_id))
+        return Response(content=html_fallback, media_type="text/html", headers={"Cache-Control": "no-store"})
 
-    # 3. Extract and Serve the AI HTML
-    try:
-        data = job.result if isinstance(job.result, dict) else json.loads(job.result)
-        html_content = data.get("html_code", "<h1>Error: Invalid Data</h1>")
-        
-        # Add a base target so links open in new tabs (optional but recommended for iframes)
-        if "<head>" in html_content:
-            html_content = html_content.replace("<head>", "<head><base target='_blank'>")
-            
-        return Response(content=html_content, media_type="text/html")
-        
-    except Exception as e:
-        return Response(content=f"<h1>System Error</h1><p>{str(e)}</p>", media_type="text/html")
+    key = body.decode("ascii")
+    if EMBED_REDIRECT:
+        target = artifacts.public_url(key) or f"/widgets/{key}"
+        return RedirectResponse(target, status_code=302, headers={"Cache-Control": widget_cache.REVALIDATE})
+    return artifact_response(request, key, widget_cache.REVALIDATE)
+
+@router.get("/widgets/{key}")
+async def serve_artifact(key: str, request: Request):
+    """Content-addressed widget bytes: never change, so cached for good."""
+    if not artifacts.KEY_RE.match(key):
+        raise HTTPException(status_code=404, detail="Widget artifact not found")
+    return artifact_response(request, key, IMMUTABLE)
@@ -0,0 +1,8 @@
+from bench.api_footprint import WORKER_ONLY, probe
+
+
+def test_api_process_does_not_import_worker_packages():
+    # Fresh interpreter: this test process may already have the worker loaded
+    result = probe()
+    assert {"crewai", "selenium", "litellm"} <= set(WORKER_ONLY)
+    assert result["heavy"] == []
@@ -0,0 +1,17 @@
+import pytest
+
+from db.artifacts import postprocess
+
+BASE = "<base target='_blank'>"
+
+
+@pytest.mark.parametrize("html, expected", [
+    ("<!DOCTYPE html><html><head><title>t</title></head><body>x</body></html>",
+     "<!DOCTYPE html><html><head>" + BASE + "<title>t</title></head><body>x</body></html>"),
+    ("<!DOCTYPE html><html lang='en'><body>x</body></html>",
+     "<!DOCTYPE html><html lang='en'>" + BASE + "<body>x</body></html>"),
+    ("<!doctype html>\n<div>x</div>", "<!doctype html>" + BASE + " <div>x</div>"),
+    ("<div>x</div>", BASE + "<div>x</div>"),
+])
+def test_base_tag_never_precedes_the_doctype(html, expected):
+    assert postprocess(html) == expected
@@ -0,0 +1,136 @@
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.request import urlopen
+
+import pytest
+
+from ai_system.browser_pool import BrowserPool
+
+
+class PageHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/crash":
+            self.send_error(500)
+            return
+        body = f"<html><body><p>page {self.path}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+class HttpDriver:
+    """Just enough of a WebDriver to load pages from the test server."""
+
+    def __init__(self):
+        self.page_source = ""
+        self.alive = True
+        self.quit_called = False
+        self.service = SimpleNamespace(process=SimpleNamespace(pid=os.getpid()))
+
+    def get(self, url):
+        if url == "about:blank":
+            self.page_source = ""
+            return
+        try:
+            self.page_source = urlopen(url, timeout=5).read().decode()
+        except Exception:
+            self.alive = False  # a crashed tab takes the session with it
+            raise
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("session deleted")
+        return 1
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def drivers():
+    created = []
+
+    def factory():
+        created.append(HttpDriver())
+        return created[-1]
+
+    return created, factory
+
+
+def load(pool, url):
+    with pool.checkout(timeout=1) as driver:
+        driver.get(url)
+        return driver.page_source
+
+
+def test_driver_is_reused_between_pages(server, drivers):
+    created, factory = drivers
+    pool = BrowserPool(size=1, factory=factory, max_pages=10, max_rss_mb=10 ** 6)
+
+    assert "page /a" in load(pool, server + "/a")
+    assert "page /b" in load(pool, server + "/b")
+    assert len(created) == 1
+
+
+def test_driver_is_recycled_after_the_page_limit(server, drivers):
+    created, factory = drivers
+    pool = BrowserPool(size=1, factory=factory, max_pages=2, max_rss_mb=10 ** 6)
+
+    for path in ("/a", "/b", "/c"):
+        load(pool, server + path)
+    assert len(created) == 2
+    assert created[0].quit_called and not created[1].quit_called
+
+
+def test_broken_driver_is_quit_and_its_slot_released(server, drivers):
+    created, factory = drivers
+    pool = BrowserPool(size=1, factory=factory, max_pages=10, max_rss_mb=10 ** 6)
+
+    with pytest.raises(Exception):
+        load(pool, server + "/crash")
+    assert created[0].quit_called
+
+    # The single slot is free again and gets a fresh driver
+    assert "page /a" in load(pool, server + "/a")
+    assert len(created) == 2
+
+
+def test_healthy_driver_survives_an_error_in_the_caller(server, drivers):
+    created, factory = drivers
+    pool = BrowserPool(size=1, factory=factory, max_pages=10, max_rss_mb=10 ** 6)
+
+    with pytest.raises(ValueError):
+        with pool.checkout(timeout=1) as driver:
+            driver.get(server + "/a")
+            raise ValueError("parse failed")
+    load(pool, server + "/b")
+    assert len(created) == 1
+
+
+def test_driver_is_recycled_over_the_memory_ceiling(server, drivers):
+    pytest.importorskip("psutil")
+    created, factory = drivers
+    # The fake driver's "browser process" is this test process, well over 1 MB
+    pool = BrowserPool(size=1, factory=factory, max_pages=10, max_rss_mb=1)
+
+    load(pool, server + "/a")
+    load(pool, server + "/b")
+    assert len(created) == 2
+    assert created[0].quit_called
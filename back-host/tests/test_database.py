@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from db import database
+
+
+class Conflict(Exception):
+    pgcode = "40001"
+
+
+class Session:
+    def __init__(self):
+        self.commits = self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(database.time, "sleep", lambda seconds: None)
+
+
+def test_serialization_conflict_reruns_the_whole_unit():
+    session, attempts = Session(), []
+
+    def unit(s):
+        attempts.append(s)
+        if len(attempts) < 3:
+            raise DBAPIError("UPDATE masks", {}, Conflict("restart transaction"))
+        return "saved"
+
+    assert database.run_transaction(session, unit) == "saved"
+    assert len(attempts) == 3
+    assert (session.commits, session.rollbacks) == (1, 2)
+
+
+def test_other_errors_are_not_retried():
+    session = Session()
+
+    def unit(s):
+        raise DBAPIError("UPDATE masks", {}, Exception("syntax error"))
+
+    with pytest.raises(DBAPIError):
+        database.run_transaction(session, unit)
+    assert session.rollbacks == 1
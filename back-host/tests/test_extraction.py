@@ -0,0 +1,36 @@
+from ai_system.extraction import extract_page
+
+ARTICLE = " ".join(f"Sentence {i} of the article body about tides and moon phases." for i in range(20))
+
+
+def page(body_attrs="", wrapper_class="content"):
+    return f"""
+    <html><body {body_attrs}>
+      <div class="{wrapper_class}">
+        <div class="sidebar"><ul><li>Sidebar link one</li><li>Sidebar link two</li></ul></div>
+        <div class="post"><h1>Tide tables</h1><p>{ARTICLE}</p></div>
+        <div class="cookie-banner"><p>We use cookies</p></div>
+      </div>
+    </body></html>
+    """
+
+
+def test_noise_regions_are_dropped():
+    _, blocks = extract_page(page())
+    assert blocks == ["Tide tables", ARTICLE]
+
+
+def test_body_class_with_noise_hint_keeps_the_document():
+    _, blocks = extract_page(page(body_attrs='class="page has-sidebar"'))
+    assert blocks == ["Tide tables", ARTICLE]
+
+
+def test_wrapper_with_noise_hint_keeps_its_content_but_not_its_noisy_children():
+    _, blocks = extract_page(page(wrapper_class="site-wrapper menu-open"))
+    assert blocks == ["Tide tables", ARTICLE]
+
+
+def test_main_with_noise_hint_is_never_dropped():
+    html = f'<html><body><main class="main menu-open"><p>{ARTICLE}</p></main></body></html>'
+    _, blocks = extract_page(html)
+    assert blocks == [ARTICLE]
@@ -0,0 +1,13 @@
+from db import jobs
+
+
+def test_fingerprint_depends_on_pipeline_mode():
+    crew = jobs.job_fingerprint("Widget", "facts", ["https://a.example"], "crew")
+    fast = jobs.job_fingerprint("Widget", "facts", ["https://a.example"], "fast")
+    assert crew != fast
+
+
+def test_fingerprint_uses_the_effective_mode(monkeypatch):
+    monkeypatch.setattr("ai_system.fast_pipeline.PIPELINE_MODE", "fast")
+    assert jobs.job_fingerprint("Widget", "facts", [], None) == jobs.job_fingerprint("Widget", "facts", [], "fast")
+    assert jobs.job_fingerprint("Widget", "facts", [], "bogus") == jobs.job_fingerprint("Widget", "facts", [], "crew")
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from routes.mask import cursor_condition, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips():
+    created = datetime(2026, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created, 981234567890123456)) == (created, 981234567890123456)
+
+
+def test_null_created_at_pages_by_id():
+    assert decode_cursor(encode_cursor(None, 42)) == (None, 42)
+    assert cursor_condition(None) == "(created_at IS NULL AND id < :c_id)"
+    # Rows without created_at sort last, so every dated page must still lead to them
+    assert "created_at IS NULL" in cursor_condition(datetime(2026, 5, 1))
@@ -0,0 +1,46 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from ai_system.model_phase import ModelPhases
+
+URL = "http://ollama:11434"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def phases():
+    clock, unloaded = Clock(), []
+    phases = ModelPhases(fakeredis.FakeRedis(), unload=lambda url, model: unloaded.append(model),
+                         min_batch=2, max_wait=15, clock=clock)
+    return phases, clock, unloaded
+
+
+def test_single_job_switches_models_without_waiting(phases):
+    phases, clock, unloaded = phases
+    assert phases.try_enter(URL, "llama3", "job")
+    phases.leave(URL, "llama3", "job")
+
+    clock.now += 1
+    assert phases.try_enter(URL, "deepseek", "job")
+    assert phases.current(URL)[0] == "deepseek"
+    assert unloaded == ["llama3"]
+
+
+def test_contended_switch_still_waits_for_a_batch(phases):
+    phases, clock, _ = phases
+    assert phases.try_enter(URL, "llama3", "a")
+    assert not phases.try_enter(URL, "deepseek", "b")  # llama3 still holds the box
+    phases.leave(URL, "llama3", "a")
+
+    # deepseek and qwen both waiting with one call each: neither is worth a load yet
+    assert not phases.try_enter(URL, "qwen", "c")
+    clock.now += 16
+    assert phases.try_enter(URL, "qwen", "c")
@@ -0,0 +1,39 @@
+from collections import Counter
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from ai_system import scheduler
+
+
+@pytest.fixture
+def fair(monkeypatch):
+    monkeypatch.setattr(scheduler, "GLOBAL_INFLIGHT", 4)
+    monkeypatch.setattr(scheduler, "USER_INFLIGHT", 4)
+    sent = []
+    return scheduler.FairScheduler(fakeredis.FakeRedis(), dispatch=sent.append), sent
+
+
+def test_weights_hold_while_the_deployment_is_full(fair):
+    sched, sent = fair
+    for i in range(200):
+        sched.submit("a", f"i{i}", {}, priority="interactive", pump=False)
+        sched.submit("b", f"b{i}", {}, priority="bulk", pump=False)
+    sched.pump()
+    assert len(sent) == scheduler.GLOBAL_INFLIGHT
+
+    # Saturated: every finished job frees exactly one slot
+    for _ in range(90):
+        sched.release(sent[-scheduler.GLOBAL_INFLIGHT]["job_id"])
+    released = Counter(item["job_id"][0] for item in sent[scheduler.GLOBAL_INFLIGHT:])
+    assert released == {"i": 80, "b": 10}
+
+
+def test_submit_during_retire_is_not_stranded(fair):
+    sched, sent = fair
+    sched.submit("a", 1, {}, pump=False)
+    sched.pump()
+    sched.submit("a", 2, {})
+    assert [item["job_id"] for item in sent] == [1, 2]
+    assert sched.stats()["queued"] == 0
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from ai_system import scrape_cache, scraping
+
+SHELL = "<html><body><div id='root'></div></body></html>"
+RENDERED = "<html><body><main>" + "<p>Rendered paragraph with plenty of words in it.</p>" * 40 + "</main></body></html>"
+
+
+@pytest.fixture
+def site(monkeypatch):
+    store, calls = {}, {"static": 0, "dynamic": 0}
+
+    def save(entry):
+        store[entry["url"]] = entry
+        return entry
+
+    monkeypatch.setattr(scrape_cache, "get", lambda url: store.get(url))
+    monkeypatch.setattr(scrape_cache, "_store", save)
+    monkeypatch.setattr(scrape_cache, "record", lambda stat: None)
+
+    def fetch_page(url, etag=None, last_modified=None):
+        calls["static"] += 1
+        return 200, SHELL, '"v1"', None
+
+    def scrape_dynamic(url):
+        calls["dynamic"] += 1
+        return RENDERED
+
+    monkeypatch.setattr(scraping, "fetch_page", fetch_page)
+    monkeypatch.setattr(scraping, "scrape_dynamic", scrape_dynamic)
+    return store, calls
+
+
+def test_js_page_is_cached_as_dynamic(site):
+    store, calls = site
+    content = scraping.scrape_one("https://spa.example")
+    assert "Rendered paragraph" in content
+    assert store["https://spa.example"]["source"] == "dynamic"
+    assert calls == {"static": 1, "dynamic": 1}
+
+
+def test_stale_dynamic_entry_goes_straight_to_the_browser(site):
+    store, calls = site
+    scraping.scrape_one("https://spa.example")
+    store["https://spa.example"]["fetched_at"] = time.time() - scrape_cache.DYNAMIC_FRESH_TTL - 1
+
+    assert "Rendered paragraph" in scraping.scrape_one("https://spa.example")
+    assert calls == {"static": 1, "dynamic": 2}
+
+
+def test_dynamic_entry_uses_its_own_ttl(site):
+    store, calls = site
+    scraping.scrape_one("https://spa.example")
+    store["https://spa.example"]["fetched_at"] = time.time() - scrape_cache.FRESH_TTL - 1
+
+    scraping.scrape_one("https://spa.example")
+    assert calls == {"static": 1, "dynamic": 1}
@@ -0,0 +1,50 @@
+import pytest
+
+from ai_system.streaming import HtmlStreamExtractor
+
+WIDGET = "<html><body><ul><li>a</li></ul></body></html>"
+
+
+def extract(reply, chunk=None):
+    extractor = HtmlStreamExtractor()
+    step = chunk or len(reply) or 1
+    for i in range(0, len(reply), step):
+        extractor.feed(reply[i:i + step])
+    return extractor
+
+
+@pytest.mark.parametrize("chunk", [None, 1, 3, 7])
+@pytest.mark.parametrize("reply", [
+    f"```html\n{WIDGET}\n```\nHope this helps!",
+    f"Here is the widget:\n```HTML\n{WIDGET}\n```",
+    f"Here is the widget:\n```\n{WIDGET}\n```",
+    f"```html{WIDGET}```",
+])
+def test_fenced_reply_yields_only_the_fenced_html(reply, chunk):
+    extractor = extract(reply, chunk)
+    assert extractor.complete
+    assert extractor.html == WIDGET
+
+
+@pytest.mark.parametrize("chunk", [None, 1, 5])
+def test_reply_without_fence_is_kept_whole(chunk):
+    reply = f"Here is the widget:\n{WIDGET}\n"
+    extractor = extract(reply, chunk)
+    assert not extractor.complete
+    assert extractor.html == reply.strip()
+
+
+def test_preview_while_streaming_leaves_out_a_half_written_fence():
+    extractor = HtmlStreamExtractor()
+    extractor.feed("Here is the widget:\n``")
+    assert extractor.html == "Here is the widget:\n``"
+    extractor.feed("`ht")
+    assert extractor.html == "Here is the widget:"
+    extractor.feed("ml\n<html><bo")
+    assert extractor.html == "<html><bo"
+
+
+def test_worker_extract_html_uses_the_same_rules():
+    worker = pytest.importorskip("ai_system.worker", exc_type=ImportError)
+    assert worker.extract_html(f"Here is the widget:\n```\n{WIDGET}\n```") == WIDGET
+    assert worker.extract_html(f"  {WIDGET}  ") == WIDGET
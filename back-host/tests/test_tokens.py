@@ -0,0 +1,31 @@
+import importlib
+import sys
+
+import pytest
+
+
+def _import_tokens(monkeypatch, **env):
+    for name in ("SESSION_SECRET", "AUTH_DEV_MODE"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delitem(sys.modules, "auth.tokens", raising=False)
+    return importlib.import_module("auth.tokens")
+
+
+def test_missing_secret_fails_at_import(monkeypatch):
+    with pytest.raises(RuntimeError, match="SESSION_SECRET"):
+        _import_tokens(monkeypatch)
+
+
+def test_dev_mode_uses_a_random_secret(monkeypatch):
+    tokens = _import_tokens(monkeypatch, AUTH_DEV_MODE="1")
+    assert tokens.verify_token(tokens.issue_token(7, "ada"))["uid"] == "7"
+    assert tokens.SESSION_SECRET != _import_tokens(monkeypatch, AUTH_DEV_MODE="1").SESSION_SECRET
+
+
+def test_forged_token_is_rejected(monkeypatch):
+    tokens = _import_tokens(monkeypatch, SESSION_SECRET="a")
+    token = tokens.issue_token(7, "ada")
+    other = _import_tokens(monkeypatch, SESSION_SECRET="b")
+    assert other.verify_token(token) is None
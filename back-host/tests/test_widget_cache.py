@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from db import widget_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(widget_cache, "USE_REDIS_TIER", False)
+    monkeypatch.setattr(widget_cache, "_lru", widget_cache.OrderedDict())
+    renders = []
+
+    def serve(version, result):
+        async def _version(mask_id):
+            return version
+
+        async def render():
+            renders.append(result)
+            return result
+
+        monkeypatch.setattr(widget_cache, "_version", _version)
+        return asyncio.run(widget_cache.get_or_render("embed", 7, render))
+
+    return serve, renders
+
+
+def test_missing_is_cached_while_the_version_is_known(cache):
+    serve, renders = cache
+    assert serve("3", None) == (None, None)
+    assert serve("3", b"<div>done</div>") == (None, None)
+    assert len(renders) == 1
+
+
+def test_missing_expires_quickly_without_a_version(cache, monkeypatch):
+    monkeypatch.setattr(widget_cache, "UNVERSIONED_MISSING_MAX_AGE", 0)
+    serve, renders = cache
+    assert serve("?", None) == (None, None)
+    body, etag = serve("?", b"<div>done</div>")
+    assert body == b"<div>done</div>" and etag
+    assert len(renders) == 2
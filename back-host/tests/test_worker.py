@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from requests import RequestException
+
+from celery_config import celery_app
+from ai_system import worker
+
+
+class FakeSession:
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Runs the staged chain eagerly, with the DB, Redis and network replaced by recorders."""
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+
+    calls = {"stages": [], "completed": [], "failed": [], "scraped": [], "generated": 0}
+    monkeypatch.setattr(worker, "SessionLocal", FakeSession)
+    monkeypatch.setattr(worker, "run_transaction", lambda db, fn: fn(db))
+    monkeypatch.setattr(worker.jobs, "job_mask_ids", lambda db, job_id: [11])
+    monkeypatch.setattr(worker.jobs, "set_stage", lambda db, job_id, stage, **info: calls["stages"].append(stage))
+    monkeypatch.setattr(worker.jobs, "add_timings", lambda db, job_id, timings: None)
+    monkeypatch.setattr(worker.jobs, "complete_job",
+                        lambda db, job_id, payload: calls["completed"].append(json.loads(payload)) or [11])
+    monkeypatch.setattr(worker.jobs, "save_source_hashes", lambda db, job_id, mask_ids: None)
+    monkeypatch.setattr(worker.jobs, "fail_job",
+                        lambda db, job_id, error, partial: calls["failed"].append(error) or [11])
+    monkeypatch.setattr(worker.artifacts, "publish", lambda html: "artifact-key")
+    monkeypatch.setattr(worker.widget_cache, "invalidate", lambda mask_id: None)
+    for name in ("publish", "set_preview", "clear_preview"):
+        monkeypatch.setattr(worker.job_events, name, lambda *args, **kwargs: None)
+    monkeypatch.setattr(worker.scheduler, "release", lambda job_id: None)
+
+    def scrape_one(url):
+        calls["scraped"].append(url)
+        if "down" in url:
+            raise RequestException("connection refused")
+        return f"<html><body><p>Facts about {url}.</p></body></html>"
+
+    monkeypatch.setattr(worker, "scrape_one", scrape_one)
+    return calls
+
+
+def generate_with(monkeypatch, calls, reply):
+    def run_fast_process(title, description, context, **kwargs):
+        calls["generated"] += 1
+        calls["context"] = context
+        return reply(calls["generated"])
+
+    monkeypatch.setattr(worker, "run_fast_process", run_fast_process)
+
+
+def test_chain_scrapes_extracts_and_generates(pipeline, monkeypatch):
+    generate_with(monkeypatch, pipeline, lambda attempt: "```html\n<div>widget</div>\n```")
+
+    worker.run_mask_processing(1, "Widget", "facts", ["https://a.example", "https://b.example"], "fast")
+
+    assert sorted(pipeline["scraped"]) == ["https://a.example", "https://b.example"]
+    assert pipeline["stages"] == ["scrape", "extract", "generate", "done"]
+    assert "Facts about https://a.example" in pipeline["context"]
+    assert pipeline["completed"] == [{"html_code": "<div>widget</div>", "artifact": "artifact-key"}]
+    assert pipeline["failed"] == []
+
+
+def test_unreachable_url_is_retried_then_reported_to_the_next_stage(pipeline, monkeypatch):
+    generate_with(monkeypatch, pipeline, lambda attempt: "<div>widget</div>")
+
+    worker.run_mask_processing(1, "Widget", "facts", ["https://down.example", "https://b.example"], "fast")
+
+    retries = worker.scrape_url.max_retries
+    assert pipeline["scraped"].count("https://down.example") == retries + 1
+    assert pipeline["stages"][-1] == "done"
+    assert pipeline["completed"][0]["html_code"] == "<div>widget</div>"
+
+
+def test_failing_generate_stage_retries_then_fails_the_job(pipeline, monkeypatch):
+    def reply(attempt):
+        raise RuntimeError(f"ollama down (attempt {attempt})")
+
+    generate_with(monkeypatch, pipeline, reply)
+
+    worker.run_mask_processing(1, "Widget", "facts", ["https://a.example"], "fast")
+
+    attempts = worker.generate_widget.max_retries + 1
+    assert pipeline["generated"] == attempts
+    assert pipeline["stages"] == ["scrape", "extract"] + ["generate"] * attempts
+    assert pipeline["completed"] == []
+    assert pipeline["failed"] == [f"ollama down (attempt {attempts})"]
+
+
+def test_preview_flushes_look_up_waiting_masks_once(pipeline, monkeypatch):
+    lookups, previews = [], []
+    monkeypatch.setattr(worker.jobs, "job_mask_ids", lambda db, job_id: lookups.append(job_id) or [11, 12])
+    monkeypatch.setattr(worker.job_events, "set_preview", lambda mask_id, job_id, html: previews.append(mask_id))
+    monkeypatch.setattr(worker, "STREAM_GENERATION", True)
+
+    def run_fast_process(title, description, context, on_scraped=None, on_html=None, **kwargs):
+        for i in range(5):
+            on_html(f"<div>{i}")
+        return "<div>done</div>"
+
+    monkeypatch.setattr(worker, "run_fast_process", run_fast_process)
+    worker.generate_widget.apply(args=("context", 1, "Widget", "facts", [], "fast"))
+
+    assert previews == [11, 12] * 5
+    assert len(lookups) == 1
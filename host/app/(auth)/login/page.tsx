@@ -51,6 +51,7 @@ export default function LoginPage() {
       // 3. Save User Data (You can switch to Context/Cookies later)
       localStorage.setItem("user_id", data.user_id);
       localStorage.setItem("username", data.username);
+      localStorage.setItem("token", data.token);
       // 4. Redirect to Dashboard
       router.push("/work");
 
@@ -15,7 +15,11 @@ export default function AdminHeader() {
 
       try {
         // 2. Use GET and pass user_id in the URL (?)
-        const response = await fetch(`http://localhost:8000/users/profile/?user_id=${userId}`);
+        // Signed session token lets the API answer without a DB lookup
+        const token = localStorage.getItem("token");
+        const response = await fetch(`http://localhost:8000/users/profile/?user_id=${userId}`, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
 
         if (!response.ok) {
           router.push("/login");
@@ -44,7 +44,10 @@ export default function AdminSidebar() {
     }
 
     try {
-      const response = await fetch(`http://localhost:8000/users/profile/?user_id=${storedId}`);
+      const token = localStorage.getItem("token");
+      const response = await fetch(`http://localhost:8000/users/profile/?user_id=${storedId}`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
 
       if (!response.ok) return;
 
@@ -60,19 +63,30 @@ export default function AdminSidebar() {
   // --- 2. Fetch Masks ---
   const fetchMasks = async () => {
     try {
-      const response = await fetch(`${API_URL}/`);
-      if (response.ok) {
+      // Only this user's masks, and only the columns the sidebar shows.
+      // Pages are followed through X-Next-Cursor until the server stops sending one.
+      const storedId = localStorage.getItem("user_id");
+      const collected: Mask[] = [];
+      let cursor: string | null = null;
+      do {
+        const query = new URLSearchParams({ limit: "200", fields: "id,user_id,mask_name,created_at" });
+        if (storedId) query.set("user_id", storedId);
+        if (cursor) query.set("cursor", cursor);
+        const response = await fetch(`${API_URL}/?${query}`);
+        if (!response.ok) {
+          console.error("Failed to fetch masks");
+          break;
+        }
         const data = await response.json();
         // Ensure all IDs are strings immediately upon receiving
-        const safeData = data.map((item: any) => ({
+        collected.push(...data.map((item: any) => ({
             ...item,
             id: String(item.id),
             user_id: String(item.user_id)
-        }));
-        setMasks(safeData);
-      } else {
-        console.error("Failed to fetch masks");
-      }
+        })));
+        cursor = response.headers.get("X-Next-Cursor");
+      } while (cursor);
+      setMasks(collected);
     } catch (error) {
       console.error("Error connecting to server:", error);
     } finally {
@@ -92,7 +92,7 @@ export default function CreateComponentPage() {
           
           if (!response.ok) {
             if (response.status === 404) {
-              setPreviewHtml("<div style='display: flex; align-items: center; justify-content: center; height: 100%; font-family: system-ui; color: #64748b;'><p>Job is still processing... Refresh to check.</p></div>");
+              setPreviewHtml("<div style='display: flex; align-items: center; justify-content: center; height: 100%; font-family: system-ui; color: #64748b;'><p>Job is still processing... This preview updates automatically.</p></div>");
               return;
             }
             throw new Error("Failed to fetch preview");
@@ -115,9 +115,18 @@ export default function CreateComponentPage() {
 
       fetchPreview();
       
-      // Optional: Poll every 5 seconds to check if job completed
-      const interval = setInterval(fetchPreview, 5000);
-      return () => clearInterval(interval);
+      // Refresh the preview when the worker pushes a completed job (no polling)
+      const events = new EventSource(`http://localhost:8000/jobs/stream/${maskId}`);
+      events.addEventListener("completed", () => fetchPreview());
+      events.addEventListener("preview", async () => {
+        // Partial HTML while the widget is still being generated
+        const response = await fetch(`http://localhost:8000/jobs/preview/${maskId}`);
+        if (response.ok) {
+          const data = await response.json();
+          if (data.html_code) setPreviewHtml(data.html_code);
+        }
+      });
+      return () => events.close();
     }
   }, [maskId, isEditMode]);
 